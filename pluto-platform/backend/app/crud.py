@@ -1,5 +1,7 @@
+from sqlalchemy import case, func, tuple_, update
 from sqlalchemy.orm import Session, joinedload
 from . import models, schemas, auth
+from .pagination import decode_cursor, encode_cursor, utc_naive
 import uuid
 
 # User CRUD
@@ -20,22 +22,54 @@ def get_psychologists(db: Session):
     return db.query(models.User).filter(models.User.role == 'psychologist').all()
 
 # Drawing / Assessment CRUD
-def get_assessments_for_facilitator(db: Session):
-    return db.query(models.Drawing).options(
+def get_assessments_page(query, filters: schemas.AssessmentFilters):
+    """
+    Newest-first keyset page of a Drawing query: rows after the cursor's
+    (submitted_at, id), so every page costs the same however deep it is.
+    """
+    if filters.status:
+        query = query.filter(models.Drawing.status.in_(filters.status))
+    if filters.psychologist_id:
+        query = query.filter(models.Drawing.psychologist_id == filters.psychologist_id)
+    if filters.student_id:
+        query = query.filter(models.Drawing.student_id == filters.student_id)
+    if filters.submitted_from:
+        query = query.filter(models.Drawing.submitted_at >= utc_naive(filters.submitted_from))
+    if filters.submitted_to:
+        query = query.filter(models.Drawing.submitted_at < utc_naive(filters.submitted_to))
+    if filters.cursor:
+        submitted_at, drawing_id = decode_cursor(filters.cursor)
+        query = query.filter(tuple_(models.Drawing.submitted_at, models.Drawing.id) < tuple_(submitted_at, drawing_id))
+    rows = query.order_by(models.Drawing.submitted_at.desc(), models.Drawing.id.desc()).limit(filters.limit + 1).all()
+    next_cursor = None
+    if len(rows) > filters.limit:
+        rows = rows[:filters.limit]
+        next_cursor = encode_cursor(rows[-1].submitted_at, rows[-1].id)
+    return {"items": rows, "next_cursor": next_cursor}
+
+def get_assessments_for_facilitator(db: Session, filters: schemas.AssessmentFilters):
+    query = db.query(models.Drawing).options(
         joinedload(models.Drawing.student),
         joinedload(models.Drawing.psychologist),
-    ).order_by(models.Drawing.submitted_at.desc()).all()
+    )
+    return get_assessments_page(query, filters)
 
-def get_assessments_for_psychologist(db: Session, psychologist_id: uuid.UUID):
-    return db.query(models.Drawing).filter(models.Drawing.psychologist_id == psychologist_id).options(
+def get_assessments_for_psychologist(db: Session, psychologist_id: uuid.UUID, filters: schemas.AssessmentFilters):
+    query = db.query(models.Drawing).filter(models.Drawing.psychologist_id == psychologist_id).options(
         joinedload(models.Drawing.student),
         joinedload(models.Drawing.ai_analysis),
-    ).order_by(models.Drawing.submitted_at.desc()).all()
+    )
+    return get_assessments_page(query, filters)
 
-def get_assessments_for_student(db: Session, student_id: uuid.UUID):
-    return db.query(models.Drawing).filter(models.Drawing.student_id == student_id).options(
+def get_assessments_for_student(db: Session, student_id: uuid.UUID, filters: schemas.AssessmentFilters):
+    query = db.query(models.Drawing).filter(models.Drawing.student_id == student_id).options(
         joinedload(models.Drawing.evaluation)
-    ).order_by(models.Drawing.submitted_at.desc()).all()
+    )
+    return get_assessments_page(query, filters)
+
+def get_assessment_stats(db: Session):
+    counts = dict(db.query(models.Drawing.status, func.count()).group_by(models.Drawing.status).all())
+    return {"total": sum(counts.values()), "by_status": counts}
 
 def create_drawing(db: Session, student_id: uuid.UUID, file_path: str):
     db_drawing = models.Drawing(student_id=student_id, file_path=file_path, status="submitted")
@@ -52,15 +86,37 @@ def update_drawing_status(db: Session, drawing_id: uuid.UUID, status: str):
         db.refresh(db_drawing)
     return db_drawing
 
-def assign_drawing(db: Session, drawing_id: uuid.UUID, psychologist_id: uuid.UUID):
+def assign_drawing(db: Session, drawing_id: uuid.UUID, psychologist_id: uuid.UUID, commit: bool = True):
     db_drawing = db.query(models.Drawing).filter(models.Drawing.id == drawing_id).first()
     if db_drawing:
         db_drawing.psychologist_id = psychologist_id
         db_drawing.status = "processing"
-        db.commit()
-        db.refresh(db_drawing)
+        if commit:
+            db.commit()
+            db.refresh(db_drawing)
     return db_drawing
 
+def assign_drawings(db: Session, assignments: dict):
+    """
+    Assign many drawings ({drawing_id: psychologist_id}) with a single
+    UPDATE ... RETURNING. Does not commit, so the caller can enqueue the
+    analyses in the same transaction. Returns (id, file_path) of the
+    drawings that exist.
+    """
+    stmt = update(models.Drawing).where(models.Drawing.id.in_(list(assignments))).values(
+        psychologist_id=case(assignments, value=models.Drawing.id),
+        status="processing",
+    ).returning(models.Drawing.id, models.Drawing.file_path).execution_options(synchronize_session=False)
+    return db.execute(stmt).all()
+
+def get_assessments_by_ids(db: Session, drawing_ids: list):
+    return db.query(models.Drawing).filter(models.Drawing.id.in_(drawing_ids)).options(
+        joinedload(models.Drawing.student),
+        joinedload(models.Drawing.psychologist),
+        joinedload(models.Drawing.ai_analysis),
+        joinedload(models.Drawing.evaluation),
+    ).order_by(models.Drawing.submitted_at.desc()).all()
+
 # AI Analysis CRUD
 def create_ai_analysis(db: Session, drawing_id: uuid.UUID, analysis_data: dict):
     db_analysis = models.AIAnalysis(drawing_id=drawing_id, analysis_data=analysis_data)
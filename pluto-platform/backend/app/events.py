@@ -0,0 +1,180 @@
+# backend/app/events.py
+# Relay of analysis events from worker processes to the API processes over
+# Postgres LISTEN/NOTIFY, so the SSE endpoint streams analyses that run in
+# `python worker.py` and not only those of the embedded worker.
+import json
+import queue
+import select
+import threading
+import uuid
+from typing import List, Optional
+
+from loguru import logger
+
+CHANNEL = "analysis_events"
+# NOTIFY payloads must stay below 8000 bytes; larger messages are split
+MAX_PAYLOAD = 7000
+
+
+def encode_message(key: str, kind: str, event: dict = None, message_id: str = None) -> List[str]:
+    """
+    NOTIFY payloads of one hub call ("open", "publish" or "close"): `<id> <part>
+    <parts> <chunk>`, where the chunks joined in order are the JSON message.
+    """
+    message_id = message_id or uuid.uuid4().hex
+    # ASCII only, so a chunk of MAX_PAYLOAD characters is at most MAX_PAYLOAD bytes
+    data = json.dumps({"key": key, "kind": kind, "event": event}, ensure_ascii=True, default=str)
+    chunks = [data[i:i + MAX_PAYLOAD] for i in range(0, len(data), MAX_PAYLOAD)] or [""]
+    return [f"{message_id} {n} {len(chunks)} {chunk}" for n, chunk in enumerate(chunks)]
+
+
+class MessageDecoder(object):
+    """Reassembles the payloads of `encode_message`; `feed` returns a message once its last part arrives."""
+
+    def __init__(self, max_pending: int = 1000):
+        self.max_pending = max_pending
+        self._pending = {}
+
+    def feed(self, payload: str) -> Optional[dict]:
+        message_id, part, parts, chunk = payload.split(" ", 3)
+        part, parts = int(part), int(parts)
+        if parts == 1:
+            return json.loads(chunk)
+        chunks = self._pending.setdefault(message_id, {})
+        chunks[part] = chunk
+        if len(chunks) < parts:
+            if len(self._pending) > self.max_pending:
+                # parts of a message whose publisher died never complete
+                self._pending.pop(next(iter(self._pending)))
+            return None
+        del self._pending[message_id]
+        return json.loads("".join(chunks[n] for n in range(parts)))
+
+    def reset(self):
+        self._pending.clear()
+
+
+def _connect(engine):
+    """A dedicated autocommit DBAPI connection, taken out of the SQLAlchemy pool."""
+    connection = engine.raw_connection()
+    connection.detach()
+    dbapi_connection = connection.dbapi_connection
+    dbapi_connection.autocommit = True
+    return dbapi_connection
+
+
+class NotifyPublisher(object):
+    """
+    EventHub stand-in for worker processes: `open` / `publish` / `close` are
+    sent with pg_notify from a background thread, so the event loop never
+    waits on the database. Events that cannot be sent are dropped; the
+    stored result stays authoritative.
+    """
+
+    def __init__(self, engine, channel: str = CHANNEL):
+        self.engine = engine
+        self.channel = channel
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._send_loop, name="analysis-event-publisher", daemon=True)
+        self._thread.start()
+
+    def open(self, key: str):
+        self._queue.put((key, "open", None))
+
+    def publish(self, key: str, event: dict):
+        self._queue.put((key, "publish", event))
+
+    def close(self, key: str):
+        self._queue.put((key, "close", None))
+
+    def _send_loop(self):
+        conn = None
+        while True:
+            key, kind, event = self._queue.get()
+            try:
+                conn = conn or _connect(self.engine)
+                with conn.cursor() as cursor:
+                    for payload in encode_message(key, kind, event):
+                        cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+            except Exception as e:
+                logger.warning(f"Could not relay analysis event for {key}: {e}")
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                conn = None
+
+
+class EventRelay(object):
+    """
+    Feeds the events NOTIFYed by worker processes into this process' EventHub.
+
+    A background thread LISTENs on `channel` and hands each reassembled
+    message to the hub on `loop`; it reconnects with backoff when the
+    connection drops.
+    """
+
+    def __init__(self, engine, hub, loop, channel: str = CHANNEL, max_backoff: float = 30.0):
+        self.engine = engine
+        self.hub = hub
+        self.loop = loop
+        self.channel = channel
+        self.max_backoff = max_backoff
+        self.decoder = MessageDecoder()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._listen_loop, name="analysis-event-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def dispatch(self, message: dict):
+        """Apply one relayed hub call; must run on the hub's event loop."""
+        key, kind = message["key"], message["kind"]
+        if kind == "open":
+            self.hub.open(key)
+        elif kind == "publish":
+            self.hub.publish(key, message["event"])
+        elif kind == "close":
+            self.hub.close(key)
+
+    def receive(self, payload: str):
+        message = self.decoder.feed(payload)
+        if message is not None:
+            self.loop.call_soon_threadsafe(self.dispatch, message)
+
+    def _listen_loop(self):
+        errors = 0
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = _connect(self.engine)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                logger.info(f"Relaying analysis events from channel '{self.channel}'.")
+                errors = 0
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.receive(conn.notifies.pop(0).payload)
+            except Exception as e:
+                errors += 1
+                delay = min(self.max_backoff, 2 ** min(errors, 10))
+                logger.warning(f"Analysis event relay failed ({e}); reconnecting in {delay}s.")
+                # messages split across the reconnect can no longer complete
+                self.decoder.reset()
+                self._stop.wait(delay)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
@@ -0,0 +1,23 @@
+# backend/app/inference.py
+import os
+
+from src.inference_client import LocalInference, RemoteInference
+
+
+def create_inference():
+    """
+    INFERENCE_MODE "local" runs the LangChain workflows in this process;
+    "remote" calls the inference service (src/app/server.py) at INFERENCE_URL
+    so it can scale on its own.
+    """
+    if os.getenv("INFERENCE_MODE", "local").lower() == "remote":
+        return RemoteInference(
+            os.getenv("INFERENCE_URL", "http://localhost:8001"),
+            timeout=float(os.getenv("INFERENCE_TIMEOUT", "600")),
+            connect_timeout=float(os.getenv("INFERENCE_CONNECT_TIMEOUT", "5")),
+            retries=int(os.getenv("INFERENCE_RETRIES", "2")),
+            max_concurrency=int(os.getenv("INFERENCE_MAX_CONCURRENCY", "16")),
+        )
+    # the LangChain/Gemini stack is only imported when analyses run locally
+    from src.app.server import build_model
+    return LocalInference(build_model())
@@ -0,0 +1,207 @@
+# backend/app/jobs.py
+# Durable analysis queue on top of the analysis_jobs table.
+import datetime
+import random
+import uuid
+from typing import List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from . import models
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+DEAD = "dead"
+LIVE = (QUEUED, RUNNING)
+
+
+def _now():
+    return datetime.datetime.utcnow()
+
+
+def retry_delay(attempt: int, base: float = 30.0, cap: float = 1800.0) -> float:
+    """Jittered exponential backoff in seconds after failed attempt number `attempt` (1-based)."""
+    return random.uniform(base / 2, min(cap, base * (2 ** (attempt - 1))))
+
+
+def enqueue_analysis(db: Session, drawing_id: uuid.UUID, image_path: str, max_attempts: int = 5,
+                     commit: bool = True) -> models.AnalysisJob:
+    """Queue an analysis of the drawing unless one is already queued or running."""
+    job = db.query(models.AnalysisJob).filter(
+        models.AnalysisJob.drawing_id == drawing_id,
+        models.AnalysisJob.status.in_(LIVE),
+    ).first()
+    if job is None:
+        job = models.AnalysisJob(drawing_id=drawing_id, image_path=image_path, status=QUEUED,
+                                 max_attempts=max_attempts, run_after=_now())
+        db.add(job)
+    if commit:
+        db.commit()
+    return job
+
+
+def enqueue_analyses(db: Session, drawings: List[Tuple[uuid.UUID, str]], max_attempts: int = 5,
+                     commit: bool = True) -> int:
+    """
+    Batched `enqueue_analysis` for (drawing_id, image_path) pairs: one query for
+    the live jobs and one flush for the new ones. Returns the number queued.
+    """
+    ids = [drawing_id for drawing_id, _ in drawings]
+    live = {row.drawing_id for row in db.query(models.AnalysisJob.drawing_id).filter(
+        models.AnalysisJob.drawing_id.in_(ids),
+        models.AnalysisJob.status.in_(LIVE),
+    )}
+    now = _now()
+    new = [models.AnalysisJob(drawing_id=drawing_id, image_path=image_path, status=QUEUED,
+                              max_attempts=max_attempts, run_after=now)
+           for drawing_id, image_path in drawings if drawing_id not in live]
+    db.add_all(new)
+    if commit:
+        db.commit()
+    return len(new)
+
+
+def claim_jobs(db: Session, worker_id: str, limit: int, lease_seconds: float) -> List[models.AnalysisJob]:
+    """
+    Lease up to `limit` due jobs to `worker_id`: queued jobs whose backoff has
+    passed, and running jobs whose lease expired (their worker died).
+    SKIP LOCKED lets any number of workers claim concurrently.
+    """
+    now = _now()
+    jobs = db.query(models.AnalysisJob).filter(or_(
+        (models.AnalysisJob.status == QUEUED) & (models.AnalysisJob.run_after <= now),
+        (models.AnalysisJob.status == RUNNING) & (models.AnalysisJob.lease_expires_at < now),
+    )).order_by(models.AnalysisJob.run_after).limit(limit).with_for_update(skip_locked=True).all()
+    claimed = []
+    for job in jobs:
+        if job.status == RUNNING and job.attempts >= job.max_attempts:
+            # a job whose worker keeps dying is dead-lettered instead of retried forever
+            job.status = DEAD
+            job.last_error = f"Lease of {job.leased_by} expired on the last attempt."
+            job.leased_by = None
+            job.lease_expires_at = None
+            job.drawing.status = "failed"
+            continue
+        job.status = RUNNING
+        job.leased_by = worker_id
+        job.lease_expires_at = now + datetime.timedelta(seconds=lease_seconds)
+        job.attempts += 1
+        claimed.append(job)
+    db.commit()
+    return claimed
+
+
+def extend_lease(db: Session, job_id: uuid.UUID, worker_id: str, lease_seconds: float) -> bool:
+    """Heartbeat of a running job; False when the lease was lost to another worker."""
+    updated = db.query(models.AnalysisJob).filter(
+        models.AnalysisJob.id == job_id,
+        models.AnalysisJob.status == RUNNING,
+        models.AnalysisJob.leased_by == worker_id,
+    ).update({"lease_expires_at": _now() + datetime.timedelta(seconds=lease_seconds)}, synchronize_session=False)
+    db.commit()
+    return updated == 1
+
+
+def _owned(db: Session, job_id: uuid.UUID, worker_id: str) -> Optional[models.AnalysisJob]:
+    return db.query(models.AnalysisJob).filter(
+        models.AnalysisJob.id == job_id,
+        models.AnalysisJob.status == RUNNING,
+        models.AnalysisJob.leased_by == worker_id,
+    ).with_for_update().first()
+
+
+def complete_job(db: Session, job_id: uuid.UUID, worker_id: str, analysis_data: dict) -> bool:
+    """Store the analysis and finish the job in one transaction; False when the lease was lost."""
+    job = _owned(db, job_id, worker_id)
+    if job is None:
+        db.rollback()
+        return False
+    analysis = db.query(models.AIAnalysis).filter(models.AIAnalysis.drawing_id == job.drawing_id).first()
+    if analysis is None:
+        db.add(models.AIAnalysis(drawing_id=job.drawing_id, analysis_data=analysis_data))
+    else:
+        analysis.analysis_data = analysis_data
+    job.drawing.status = "in_review"
+    job.status = SUCCEEDED
+    job.leased_by = None
+    job.lease_expires_at = None
+    job.last_error = None
+    db.commit()
+    return True
+
+
+def fail_job(db: Session, job_id: uuid.UUID, worker_id: str, error: str) -> Optional[str]:
+    """
+    Record a failed attempt: requeue with backoff, or dead-letter the job and
+    mark the drawing failed once `max_attempts` is used up. Returns the new
+    job status, None when the lease was lost.
+    """
+    job = _owned(db, job_id, worker_id)
+    if job is None:
+        db.rollback()
+        return None
+    job.last_error = error[:4000]
+    job.leased_by = None
+    job.lease_expires_at = None
+    if job.attempts >= job.max_attempts:
+        job.status = DEAD
+        job.drawing.status = "failed"
+    else:
+        job.status = QUEUED
+        job.run_after = _now() + datetime.timedelta(seconds=retry_delay(job.attempts))
+    db.commit()
+    return job.status
+
+
+def release_job(db: Session, job_id: uuid.UUID, worker_id: str) -> bool:
+    """Hand an unfinished job back on graceful shutdown without using up an attempt."""
+    job = _owned(db, job_id, worker_id)
+    if job is None:
+        db.rollback()
+        return False
+    job.status = QUEUED
+    job.attempts = max(0, job.attempts - 1)
+    job.run_after = _now()
+    job.leased_by = None
+    job.lease_expires_at = None
+    db.commit()
+    return True
+
+
+def recover_orphans(db: Session, max_attempts: int = 5) -> int:
+    """
+    Re-enqueue drawings stuck in "processing" without a live job, e.g. assigned
+    before the queue existed or lost to a crash between assignment and enqueue.
+    """
+    live = db.query(models.AnalysisJob.drawing_id).filter(models.AnalysisJob.status.in_(LIVE))
+    drawings = db.query(models.Drawing).filter(
+        models.Drawing.status == "processing",
+        ~models.Drawing.id.in_(live),
+    ).all()
+    for drawing in drawings:
+        db.add(models.AnalysisJob(drawing_id=drawing.id, image_path=drawing.file_path, status=QUEUED,
+                                  max_attempts=max_attempts, run_after=_now()))
+    db.commit()
+    return len(drawings)
+
+
+def requeue_dead(db: Session, job_id: uuid.UUID) -> Optional[models.AnalysisJob]:
+    """Give a dead-lettered job a fresh set of attempts."""
+    job = db.query(models.AnalysisJob).filter(
+        models.AnalysisJob.id == job_id, models.AnalysisJob.status == DEAD
+    ).first()
+    if job is None:
+        return None
+    live = db.query(models.AnalysisJob).filter(
+        models.AnalysisJob.drawing_id == job.drawing_id, models.AnalysisJob.status.in_(LIVE)
+    ).first()
+    if live is not None:
+        return live
+    job.status = QUEUED
+    job.attempts = 0
+    job.run_after = _now()
+    job.drawing.status = "processing"
+    db.commit()
+    return job
@@ -1,5 +1,5 @@
 # backend/app/models.py
-from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Enum as SQLAlchemyEnum, Text
+from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Enum as SQLAlchemyEnum, Text, Integer, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 import uuid
@@ -35,6 +35,14 @@ class Drawing(Base):
     ai_analysis = relationship("AIAnalysis", back_populates="drawing", uselist=False, cascade="all, delete-orphan")
     evaluation = relationship("Evaluation", back_populates="drawing", uselist=False, cascade="all, delete-orphan")
 
+    # newest-first keyset pagination of the assessment lists (crud.get_assessments_page)
+    __table_args__ = (
+        Index("drawings_submitted", "submitted_at", "id"),
+        Index("drawings_psychologist_submitted", "psychologist_id", "submitted_at", "id"),
+        Index("drawings_student_submitted", "student_id", "submitted_at", "id"),
+        Index("drawings_status_submitted", "status", "submitted_at", "id"),
+    )
+
 class AIAnalysis(Base):
     __tablename__ = "ai_analysis"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -50,4 +58,30 @@ class Evaluation(Base):
     psychologist_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
-    drawing = relationship("Drawing", back_populates="evaluation")
\ No newline at end of file
+    drawing = relationship("Drawing", back_populates="evaluation")
+
+class AnalysisJob(Base):
+    """Durable AI analysis queue; rows in status "dead" are the dead-letter queue."""
+    __tablename__ = "analysis_jobs"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    drawing_id = Column(UUID(as_uuid=True), ForeignKey("drawings.id"), nullable=False, index=True)
+    image_path = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued") # queued -> running -> succeeded | queued (retry) | dead
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    leased_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    drawing = relationship("Drawing")
+
+    __table_args__ = (
+        # the claim query scans live jobs by due time
+        Index("analysis_jobs_due", "status", "run_after"),
+        # at most one live job per drawing
+        Index("analysis_jobs_live_drawing", "drawing_id", unique=True,
+              postgresql_where=text("status IN ('queued', 'running')"),
+              sqlite_where=text("status IN ('queued', 'running')")),
+    )
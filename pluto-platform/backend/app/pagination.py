@@ -0,0 +1,28 @@
+# backend/app/pagination.py
+# Opaque cursors for lists ordered newest first by (submitted_at, id).
+import base64
+import datetime
+import uuid
+from typing import Tuple
+
+
+def encode_cursor(submitted_at: datetime.datetime, drawing_id: uuid.UUID) -> str:
+    raw = f"{submitted_at.isoformat()}|{drawing_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, uuid.UUID]:
+    """Position encoded by `encode_cursor`; raises ValueError for anything else."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        submitted_at, drawing_id = raw.split("|")
+        return datetime.datetime.fromisoformat(submitted_at), uuid.UUID(drawing_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor.")
+
+
+def utc_naive(value: datetime.datetime) -> datetime.datetime:
+    """Timestamps are stored as naive UTC; aware query values are converted to match."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
@@ -1,9 +1,10 @@
 # backend/app/schemas.py
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, field_validator
 import uuid
 from datetime import datetime
-from typing import Optional, Any
+from typing import Optional, Any, Dict, List
 from .models import RoleEnum
+from .pagination import decode_cursor
 
 # Base Schemas
 class UserBase(BaseModel):
@@ -35,6 +36,13 @@ class AIAnalysis(BaseModel):
     class Config:
         from_attributes = True
 
+# Assignment Schemas
+class DrawingAssignment(BaseModel):
+    drawing_id: uuid.UUID
+    psychologist_id: uuid.UUID
+class BulkAssignment(BaseModel):
+    assignments: List[DrawingAssignment] = Field(..., min_length=1, max_length=1000)
+
 # User Response Schemas
 class User(UserBase):
     id: uuid.UUID
@@ -54,7 +62,30 @@ class Assessment(BaseModel):
     evaluation: Optional[Evaluation] = None
     class Config:
         from_attributes = True
-        
+
+# Assessment List Schemas
+class AssessmentFilters(BaseModel):
+    status: Optional[List[str]] = None
+    psychologist_id: Optional[uuid.UUID] = None
+    student_id: Optional[uuid.UUID] = None
+    submitted_from: Optional[datetime] = None
+    submitted_to: Optional[datetime] = None
+    cursor: Optional[str] = None
+    limit: int = Field(50, ge=1, le=200)
+
+    @field_validator("cursor")
+    @classmethod
+    def check_cursor(cls, v):
+        if v is not None:
+            decode_cursor(v)
+        return v
+class AssessmentPage(BaseModel):
+    items: List[Assessment]
+    next_cursor: Optional[str] = None
+class AssessmentStats(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+
 Token.update_forward_refs()
 
 
@@ -0,0 +1,189 @@
+# backend/app/worker.py
+import asyncio
+import os
+import socket
+import uuid
+
+from loguru import logger
+
+from . import jobs
+from .database import SessionLocal
+
+
+def _in_session(fn, *args):
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class AnalysisWorker(object):
+    """
+    Pulls analysis jobs from the analysis_jobs table and runs them.
+
+    Up to `concurrency` jobs run at once; each is leased for `lease_seconds`
+    and the lease is renewed while the analysis runs, so a crashed worker's
+    jobs become claimable again once their lease expires (a stopped worker
+    releases them immediately). Failed attempts are
+    retried with backoff and dead-lettered after `max_attempts`. On start,
+    and every `sweep_interval` seconds, drawings left in "processing"
+    without a live job are re-enqueued. Database errors while polling are
+    logged and retried with backoff (up to `max_backoff` seconds). When the
+    worker runs inside the API process, workflow events are published to the
+    `events` EventHub.
+    """
+
+    def __init__(self, inference, concurrency: int = 4, lease_seconds: float = 600.0, poll_interval: float = 2.0,
+                 sweep_interval: float = 300.0, max_attempts: int = 5, worker_id: str = None,
+                 events=None, max_backoff: float = 60.0):
+        self.inference = inference
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.sweep_interval = sweep_interval
+        self.max_attempts = max_attempts
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.events = events
+        self.max_backoff = max_backoff
+        self._running = set()
+
+    @classmethod
+    def from_env(cls, inference, **kwargs) -> "AnalysisWorker":
+        return cls(
+            inference,
+            concurrency=int(os.getenv("ANALYSIS_WORKER_CONCURRENCY", "4")),
+            lease_seconds=float(os.getenv("ANALYSIS_LEASE_SECONDS", "600")),
+            poll_interval=float(os.getenv("ANALYSIS_POLL_INTERVAL", "2")),
+            max_attempts=int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "5")),
+            **kwargs
+        )
+
+    async def sweep(self):
+        recovered = await asyncio.to_thread(_in_session, jobs.recover_orphans, self.max_attempts)
+        if recovered:
+            logger.warning(f"Re-enqueued {recovered} orphaned 'processing' drawings.")
+
+    async def run(self, stop: asyncio.Event = None):
+        stop = stop or asyncio.Event()
+        logger.info(f"Analysis worker {self.worker_id} started (concurrency {self.concurrency}).")
+        loop = asyncio.get_running_loop()
+        next_sweep = loop.time()
+        errors = 0
+        try:
+            while not stop.is_set():
+                claimed = []
+                try:
+                    if loop.time() >= next_sweep:
+                        await self.sweep()
+                        next_sweep = loop.time() + self.sweep_interval
+                    free = self.concurrency - len(self._running)
+                    if free > 0:
+                        claimed = await asyncio.to_thread(_in_session, self._claim, free)
+                except Exception:
+                    # e.g. a dropped connection, or a concurrent sweep hitting the live-job index
+                    errors += 1
+                    delay = min(self.max_backoff, self.poll_interval * 2 ** min(errors, 10))
+                    logger.exception(f"Analysis worker {self.worker_id} poll failed; retrying in {delay:.0f}s.")
+                    try:
+                        await asyncio.wait_for(stop.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                errors = 0
+                for job in claimed:
+                    task = asyncio.ensure_future(self._process(*job))
+                    self._running.add(task)
+                    task.add_done_callback(self._running.discard)
+                if not claimed or len(self._running) >= self.concurrency:
+                    # wake up early when a slot frees or a stop is requested
+                    waiters = [asyncio.ensure_future(stop.wait())] + list(self._running)
+                    await asyncio.wait(waiters, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+                    waiters[0].cancel()
+        finally:
+            # running jobs are released back to the queue (see _attempt)
+            for task in list(self._running):
+                task.cancel()
+            if self._running:
+                await asyncio.gather(*self._running, return_exceptions=True)
+            logger.info(f"Analysis worker {self.worker_id} stopped.")
+
+    def _claim(self, db, limit: int):
+        # detach plain values; the ORM rows must not outlive the session
+        return [(job.id, str(job.drawing_id), job.image_path, job.attempts)
+                for job in jobs.claim_jobs(db, self.worker_id, limit, self.lease_seconds)]
+
+    async def _heartbeat(self, job_id, task: asyncio.Task):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not await asyncio.to_thread(_in_session, jobs.extend_lease, job_id, self.worker_id, self.lease_seconds):
+                logger.warning(f"Lost the lease on job {job_id}; abandoning it.")
+                task.cancel()
+                return
+
+    async def _process(self, job_id, drawing_id: str, image_path: str, attempt: int):
+        logger.info(f"Starting AI analysis for drawing_id: {drawing_id} (attempt {attempt})")
+        if self.events is not None:
+            self.events.open(drawing_id)
+        try:
+            await self._attempt(job_id, drawing_id, attempt, image_path)
+        except Exception:
+            # the job's lease runs out and it is claimed again
+            logger.exception(f"Could not record the outcome of job {job_id} (drawing_id {drawing_id}).")
+        finally:
+            if self.events is not None:
+                self.events.close(drawing_id)
+
+    async def _attempt(self, job_id, drawing_id: str, attempt: int, image_path: str):
+        analysis = asyncio.ensure_future(self._analyze(drawing_id, image_path))
+        heartbeat = asyncio.ensure_future(self._heartbeat(job_id, analysis))
+        try:
+            analysis_result = await analysis
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                # worker shutdown: hand the job back so another worker picks it up right away
+                analysis.cancel()
+                await asyncio.gather(analysis, return_exceptions=True)
+                await asyncio.to_thread(_in_session, jobs.release_job, job_id, self.worker_id)
+                raise
+            # the heartbeat lost the lease and cancelled the analysis
+            return
+        except Exception as e:
+            status = await asyncio.to_thread(_in_session, jobs.fail_job, job_id, self.worker_id, str(e))
+            if status == jobs.DEAD:
+                self._publish(drawing_id, {"event": "error", "status": "failed", "detail": str(e)})
+                logger.error(f"AI Analysis FAILED for drawing_id {drawing_id} after {attempt} attempts: {e}")
+            else:
+                logger.warning(f"AI analysis attempt {attempt} for drawing_id {drawing_id} failed ({e}); job {status}.")
+            return
+        finally:
+            heartbeat.cancel()
+
+        if await asyncio.to_thread(_in_session, jobs.complete_job, job_id, self.worker_id, analysis_result):
+            self._publish(drawing_id, {"event": "status", "status": "in_review"})
+            logger.success(f"AI Analysis COMPLETED for drawing_id: {drawing_id}")
+        else:
+            logger.warning(f"Job {job_id} was taken over by another worker; result of drawing_id {drawing_id} discarded.")
+
+    def _publish(self, drawing_id: str, event: dict):
+        if self.events is not None:
+            self.events.publish(drawing_id, event)
+
+    async def _analyze(self, drawing_id: str, image_path: str) -> dict:
+        analysis_result = None
+        # publish every stage output and report token as it arrives for the SSE endpoint;
+        # assigned drawings queue behind interactive users in the LLM governor
+        async for event in self.inference.astream(image_path, workflow="pluto", language="en", priority="assigned"):
+            self._publish(drawing_id, event)
+            if event["event"] == "result":
+                analysis_result = event["result"]
+        if analysis_result is None:
+            raise RuntimeError("Inference ended without a result.")
+        # an incomplete report is a failed attempt: retried with backoff, dead-lettered after max_attempts
+        missing = list(analysis_result.get("missing") or {})
+        if missing or not analysis_result.get("final"):
+            raise RuntimeError(f"Analysis incomplete: {', '.join(missing or ['final'])}")
+        return analysis_result
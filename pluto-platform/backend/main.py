@@ -1,19 +1,23 @@
 import shutil
 import os
 import uuid
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, BackgroundTasks, Form
+import asyncio
+from fastapi import FastAPI, Depends, HTTPException, Query, status, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from starlette.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Annotated, List
 from jose import JWTError, jwt
 from pydantic import EmailStr
 
-from app import auth, crud, models, schemas
+from app import auth, crud, jobs, models, schemas
 from app.database import engine, get_db, SessionLocal
-from src.model_langchain import HTPModel
-from langchain_google_genai import ChatGoogleGenerativeAI
+from app.events import EventRelay
+from app.inference import create_inference
+from app.worker import AnalysisWorker
+from src.streaming import SSE_HEADERS, EventHub, sse_stream
 from dotenv import load_dotenv
 
 from loguru import logger  # <--- IMPORT LOGURU
@@ -25,6 +29,9 @@ logger.add(sys.stderr, format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <leve
 
 load_dotenv()
 models.Base.metadata.create_all(bind=engine)
+# create_all skips existing tables, so indexes added to them later are created here
+for index in models.Drawing.__table__.indexes:
+    index.create(bind=engine, checkfirst=True)
 
 app = FastAPI()
 
@@ -41,9 +48,13 @@ app.add_middleware(
 os.makedirs("uploads", exist_ok=True)
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
-# Initialize AI Model
-text_model = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.2, google_api_key=os.getenv("GOOGLE_API_KEY"))
-htp_model = HTPModel(text_model=text_model, multimodal_model=text_model, use_cache=True)
+# live stage/token events of running analyses, keyed by drawing id; fed by the
+# embedded worker, or over Postgres LISTEN/NOTIFY by `python worker.py` processes
+analysis_events = EventHub()
+# analyses run from the durable analysis_jobs queue by `python worker.py`;
+# ANALYSIS_EMBEDDED_WORKER=true also runs a worker inside this process (single-box setups)
+EMBEDDED_WORKER = os.getenv("ANALYSIS_EMBEDDED_WORKER", "false").lower() == "true"
+ANALYSIS_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "5"))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
@@ -66,20 +77,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         raise credentials_exception
     return user
 
-# Background AI Task
-def run_ai_analysis(drawing_id: str, image_path: str):
-    db = SessionLocal()
-    try:
-        logger.info(f"Starting AI analysis for drawing_id: {drawing_id}")
-        analysis_result = htp_model.pluto_workflow(image_path=image_path, language="en")
-        crud.create_ai_analysis(db, drawing_id=drawing_id, analysis_data=analysis_result)
-        crud.update_drawing_status(db, drawing_id, "in_review")
-        logger.success(f"AI Analysis COMPLETED for drawing_id: {drawing_id}")
-    except Exception as e:
-        crud.update_drawing_status(db, drawing_id, "failed")
-        logger.error(f"AI Analysis FAILED for drawing_id {drawing_id}: {e}")
-    finally:
-        db.close()
+async def stored_analysis_events(status: str, analysis_data: dict):
+    """Events for a drawing whose analysis is not running in this process (e.g. on a separate worker)."""
+    yield {"event": "status", "status": status}
+    if analysis_data is not None:
+        yield {"event": "result", "result": analysis_data, "cached": True}
 
 # --- API Endpoints ---
 
@@ -120,18 +122,28 @@ async def upload_drawing(file: UploadFile = File(...), db: Session = Depends(get
     drawing = crud.create_drawing(db=db, student_id=current_user.id, file_path=file_path)
     return drawing
 
-@app.get("/api/my-submissions", response_model=List[schemas.Assessment], status_code=status.HTTP_200_OK, tags=["Student"])
-def get_my_submissions(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+@app.get("/api/my-submissions", response_model=schemas.AssessmentPage, status_code=status.HTTP_200_OK, tags=["Student"])
+def get_my_submissions(filters: Annotated[schemas.AssessmentFilters, Query()], db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     if current_user.role != models.RoleEnum.student:
         raise HTTPException(status_code=403, detail="Not a student.")
-    return crud.get_assessments_for_student(db, student_id=current_user.id)
+    return crud.get_assessments_for_student(db, student_id=current_user.id, filters=filters)
 
 # FACILITATOR
-@app.get("/api/assessments/facilitator", response_model=List[schemas.Assessment], status_code=status.HTTP_200_OK, tags=["Facilitator"])
-def get_facilitator_assessments(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+@app.get("/api/assessments/facilitator", response_model=schemas.AssessmentPage, status_code=status.HTTP_200_OK, tags=["Facilitator"])
+def get_facilitator_assessments(filters: Annotated[schemas.AssessmentFilters, Query()], db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """
+    One page of drawings, newest first. Pass the returned `next_cursor` as
+    `cursor` (with the same filters) to get the next page; it is null on the last one.
+    """
+    if current_user.role != models.RoleEnum.facilitator:
+        raise HTTPException(status_code=403, detail="Not a facilitator.")
+    return crud.get_assessments_for_facilitator(db, filters=filters)
+
+@app.get("/api/assessments/facilitator/stats", response_model=schemas.AssessmentStats, status_code=status.HTTP_200_OK, tags=["Facilitator"])
+def get_facilitator_stats(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     if current_user.role != models.RoleEnum.facilitator:
         raise HTTPException(status_code=403, detail="Not a facilitator.")
-    return crud.get_assessments_for_facilitator(db)
+    return crud.get_assessment_stats(db)
 
 @app.get("/api/psychologists", response_model=List[schemas.User], status_code=status.HTTP_200_OK, tags=["Facilitator"])
 def list_psychologists(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
@@ -140,27 +152,75 @@ def list_psychologists(db: Session = Depends(get_db), current_user: models.User
     return crud.get_psychologists(db)
 
 @app.put("/api/drawings/{drawing_id}/assign/{psychologist_id}", response_model=schemas.Assessment, status_code=status.HTTP_200_OK, tags=["Facilitator"])
-def assign_drawing(drawing_id: uuid.UUID, psychologist_id: uuid.UUID, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def assign_drawing(drawing_id: uuid.UUID, psychologist_id: uuid.UUID, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     if current_user.role != models.RoleEnum.facilitator:
         raise HTTPException(status_code=403, detail="Not a facilitator.")
     
-    updated_drawing = crud.assign_drawing(db, drawing_id=drawing_id, psychologist_id=psychologist_id)
+    updated_drawing = crud.assign_drawing(db, drawing_id=drawing_id, psychologist_id=psychologist_id, commit=False)
     if not updated_drawing:
         raise HTTPException(status_code=404, detail="Drawing not found")
 
-    # This is the new trigger for the AI analysis
-    background_tasks.add_task(run_ai_analysis, drawing_id=str(updated_drawing.id), image_path=updated_drawing.file_path)
+    # This is the new trigger for the AI analysis: a durable job picked up by an analysis worker.
+    # Committed together with the assignment, so a "processing" drawing always has its job.
+    jobs.enqueue_analysis(db, updated_drawing.id, updated_drawing.file_path, max_attempts=ANALYSIS_MAX_ATTEMPTS, commit=False)
+    db.commit()
     
     # Reload from db to get relationships
     return db.query(models.Drawing).filter(models.Drawing.id == drawing_id).first()
 
+@app.post("/api/drawings/assign", response_model=List[schemas.Assessment], status_code=status.HTTP_200_OK, tags=["Facilitator"])
+def assign_drawings(body: schemas.BulkAssignment, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """Assign many drawings in one transaction; nothing is assigned if any drawing or psychologist is unknown."""
+    if current_user.role != models.RoleEnum.facilitator:
+        raise HTTPException(status_code=403, detail="Not a facilitator.")
+
+    # later entries win for a drawing listed twice
+    assignments = {a.drawing_id: a.psychologist_id for a in body.assignments}
+    psychologist_ids = set(assignments.values())
+    known = {row.id for row in db.query(models.User.id).filter(
+        models.User.id.in_(psychologist_ids), models.User.role == models.RoleEnum.psychologist)}
+    if known != psychologist_ids:
+        raise HTTPException(status_code=400, detail={"unknown_psychologists": [str(p) for p in psychologist_ids - known]})
+
+    updated = crud.assign_drawings(db, assignments)
+    missing = set(assignments) - {row.id for row in updated}
+    if missing:
+        db.rollback()
+        raise HTTPException(status_code=404, detail={"unknown_drawings": [str(d) for d in missing]})
+    jobs.enqueue_analyses(db, [(row.id, row.file_path) for row in updated], max_attempts=ANALYSIS_MAX_ATTEMPTS, commit=False)
+    db.commit()
+
+    return crud.get_assessments_by_ids(db, list(assignments))
+
+
+@app.get("/api/drawings/{drawing_id}/analysis/stream", status_code=status.HTTP_200_OK, tags=["Psychologist"])
+async def stream_analysis(drawing_id: uuid.UUID, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """
+    Server-Sent Events of a drawing's AI analysis: `start`, one `stage` event per
+    finished stage, `token` chunks of the final report, then `result` and `status`.
+    Finished analyses are sent as a single `result` event.
+    """
+    if current_user.role not in (models.RoleEnum.psychologist, models.RoleEnum.facilitator):
+        raise HTTPException(status_code=403, detail="Not a psychologist or facilitator.")
+    drawing = db.query(models.Drawing).filter(models.Drawing.id == drawing_id).first()
+    if not drawing:
+        raise HTTPException(status_code=404, detail="Drawing not found")
+    if current_user.role == models.RoleEnum.psychologist and drawing.psychologist_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Drawing is not assigned to you.")
+
+    events = await analysis_events.subscribe(str(drawing_id))
+    if events is None:
+        analysis_data = drawing.ai_analysis.analysis_data if drawing.ai_analysis else None
+        events = stored_analysis_events(drawing.status, analysis_data)
+    return StreamingResponse(sse_stream(events), media_type="text/event-stream", headers=SSE_HEADERS)
+
 
 # PSYCHOLOGIST
-@app.get("/api/assessments/psychologist", response_model=List[schemas.Assessment], status_code=status.HTTP_200_OK, tags=["Psychologist"])
-def get_psychologist_assessments(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+@app.get("/api/assessments/psychologist", response_model=schemas.AssessmentPage, status_code=status.HTTP_200_OK, tags=["Psychologist"])
+def get_psychologist_assessments(filters: Annotated[schemas.AssessmentFilters, Query()], db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     if current_user.role != models.RoleEnum.psychologist:
         raise HTTPException(status_code=403, detail="Not a psychologist.")
-    return crud.get_assessments_for_psychologist(db, psychologist_id=current_user.id)
+    return crud.get_assessments_for_psychologist(db, psychologist_id=current_user.id, filters=filters)
 
 @app.post("/api/drawings/{drawing_id}/evaluate", status_code=status.HTTP_200_OK, tags=["Psychologist"])
 def save_evaluation(drawing_id: uuid.UUID, evaluation: schemas.EvaluationCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
@@ -170,6 +230,30 @@ def save_evaluation(drawing_id: uuid.UUID, evaluation: schemas.EvaluationCreate,
     eval_result = crud.create_or_update_evaluation(db, drawing_id=drawing_id, psychologist_id=current_user.id, notes=evaluation.notes)
     return eval_result
 
+@app.on_event("startup")
+async def start_embedded_worker():
+    if not EMBEDDED_WORKER:
+        if engine.dialect.name == "postgresql":
+            app.state.event_relay = EventRelay(engine, analysis_events, asyncio.get_running_loop())
+            app.state.event_relay.start()
+        else:
+            logger.warning("Live analysis streams need Postgres or ANALYSIS_EMBEDDED_WORKER=true; only stored results will be streamed.")
+        return
+    worker = AnalysisWorker.from_env(create_inference(), events=analysis_events)
+    app.state.worker_stop = asyncio.Event()
+    app.state.worker_task = asyncio.create_task(worker.run(app.state.worker_stop))
+    app.state.worker = worker
+
+@app.on_event("shutdown")
+async def stop_embedded_worker():
+    if not EMBEDDED_WORKER:
+        if getattr(app.state, "event_relay", None) is not None:
+            app.state.event_relay.stop()
+        return
+    app.state.worker_stop.set()
+    await app.state.worker_task
+    await app.state.worker.inference.aclose()
+
 # Database Seeding on Startup (for development)
 @app.on_event("startup")
 def on_startup():
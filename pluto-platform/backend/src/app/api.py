@@ -1,57 +1,101 @@
+import os
+
 from requests import JSONDecodeError
-from src.app.models import HTPInput, HTPOutput, Usage, MethodList, AnalysisOutput
-from fastapi import FastAPI, HTTPException, status
+from src.app.inputs import read_images, request_body_docs
+from src.app.jobs import JobManager, JobQueueFull
+from src.app.models import HTPOutput, Usage, MethodList, AnalysisOutput, JobStatus, JobList
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from src.governor import PRIORITIES
+from src.streaming import SSE_HEADERS, sse_stream
+
+
+def analysis_output(section: dict, compact: bool = False) -> AnalysisOutput:
+    if compact:
+        # `feature` is left unset, so responses built with exclude_unset omit it
+        return AnalysisOutput(analysis=section["analysis"])
+    return AnalysisOutput(feature=section["feature"], analysis=section["analysis"])
+
+
+def to_output(result: dict, compact: bool = False) -> HTPOutput:
+    """Response model of a workflow result; `compact` drops the long per-element feature texts."""
+    return HTPOutput(
+        usage=Usage(
+            total_tokens=result["usage"]["total"],
+            prompt_tokens=result["usage"]["prompt"],
+            completion_tokens=result["usage"]["completion"]
+        ),
+        overall=analysis_output(result["overall"], compact),
+        house=analysis_output(result["house"], compact),
+        tree=analysis_output(result["tree"], compact),
+        person=analysis_output(result["person"], compact),
+        merge=result["merge"],
+        final=result["final"],
+        signal=result["signal"],
+        classification=result["classification"],
+        classification_source=result.get("classification_source"),
+        missing=result.get("missing", {}),
+        fix_signal=result["fix_signal"]
+    )
 
 
-def create_app(model):
+def job_status(job, compact: bool = False) -> JobStatus:
+    return JobStatus(
+        id=job.id,
+        status=job.status,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        result=to_output(job.result, compact) if job.result is not None else None,
+        error=job.error
+    )
+
+
+def create_app(model, job_workers: int = None, max_pending_jobs: int = None):
     app = FastAPI(
         title = "HTP Test",
         description = "A simple web application that uses the House-Tree-Person test to analyze an image.",
     )
 
+    def run_job(payload):
+        # runs on a job worker thread; the sync workflow keeps the event loop free
+        image, language = payload
+        context = model.new_context(language, "workflow", priority="assigned")
+        return model.workflow(image_path=image, language=language, context=context)
+
+    jobs = JobManager(
+        run_job,
+        workers=job_workers or int(os.getenv("HTP_JOB_WORKERS", "4")),
+        max_pending=max_pending_jobs or int(os.getenv("HTP_MAX_PENDING_JOBS", "256"))
+    )
+    app.state.jobs = jobs
+
     @app.get("/health", status_code=status.HTTP_200_OK)
     async def health_check():
         """Health check endpoint for monitoring service availability."""
         return {"status": "healthy", "service": "HTP Test API"}
 
-    @app.post("/v1/predict", response_model=HTPOutput, status_code=status.HTTP_200_OK)
-    async def predict(data: HTPInput):
+    def check_language(language: str):
+        if language != "en":
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Language must be 'en'.")
+
+    async def read_image(request: Request, language: str):
+        image, language = (await read_images(request, language))[0]
+        check_language(language)
+        return image, language
+
+    # inputs are JSON, multipart or raw image bytes (see read_images); responses
+    # use exclude_unset so `compact=true` can leave out the feature texts
+    @app.post("/v1/predict", response_model=HTPOutput, response_model_exclude_unset=True,
+              status_code=status.HTTP_200_OK, openapi_extra=request_body_docs())
+    async def predict(request: Request, language: str = "en", compact: bool = False):
+        image, language = await read_image(request, language)
         try:
-            assert data.language == "en", "Language must be 'en'."
-            result = model.workflow(
-                image_path=data.image_path,
-                language=data.language
-            )
-            result = HTPOutput(
-                usage=Usage(
-                    total_tokens=result["usage"]["total"],
-                    prompt_tokens=result["usage"]["prompt"],
-                    completion_tokens=result["usage"]["completion"]
-                ),
-                overall=AnalysisOutput(
-                    feature=result["overall"]["feature"],
-                    analysis=result["overall"]["analysis"],
-                ),
-                house=AnalysisOutput(
-                    feature=result["house"]["feature"],
-                    analysis=result["house"]["analysis"],
-                ),
-                tree=AnalysisOutput(
-                    feature=result["tree"]["feature"],
-                    analysis=result["tree"]["analysis"],
-                ),
-                person=AnalysisOutput(
-                    feature=result["person"]["feature"],
-                    analysis=result["person"]["analysis"],
-                ),
-                merge=result["merge"],
-                final=result["final"],
-                signal=result["signal"],
-                classification=result["classification"],
-                fix_signal=result["fix_signal"]
+            result = await model.aworkflow(
+                image_path=image,
+                language=language
             )
-
-            return result
+            return to_output(result, compact)
         
         except JSONDecodeError as e:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -59,10 +103,62 @@ def create_app(model):
             print(e)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+    @app.post("/v1/predict/stream", status_code=status.HTTP_200_OK, openapi_extra=request_body_docs())
+    async def predict_stream(request: Request, language: str = "en", workflow: str = "workflow",
+                             priority: str = "interactive"):
+        """
+        Server-Sent Events of a workflow ("workflow" or "pluto"): each stage
+        output, final report tokens, then the result. `priority` picks the
+        governor lane, e.g. "assigned" for the backend's queued analyses.
+        """
+        image, language = await read_image(request, language)
+        if workflow not in ("workflow", "pluto"):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Workflow must be 'workflow' or 'pluto'.")
+        if priority not in PRIORITIES:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown priority '{priority}'.")
+        events = model.astream_workflow(
+            image_path=image,
+            workflow=workflow,
+            language=language,
+            context=model.new_context(language, workflow, priority=priority)
+        )
+        return StreamingResponse(sse_stream(events), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    def submit(inputs: list) -> list:
+        for _, language in inputs:
+            check_language(language)
+        try:
+            return jobs.submit_many(inputs)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e), headers={"Retry-After": "30"})
+
+    @app.post("/v1/jobs", response_model=JobStatus, status_code=status.HTTP_202_ACCEPTED,
+              openapi_extra=request_body_docs())
+    async def submit_job(request: Request, language: str = "en"):
+        """Queue one analysis and return its job id immediately; poll GET /v1/jobs/{id} for the result."""
+        return job_status(submit([await read_image(request, language)])[0])
+
+    @app.post("/v1/jobs:batch", response_model=JobList, status_code=status.HTTP_202_ACCEPTED,
+              openapi_extra=request_body_docs(batch=True))
+    async def submit_jobs(request: Request, language: str = "en"):
+        """Queue many analyses at once; either all of them are accepted or none."""
+        images = await read_images(request, language, batch=True)
+        if not images:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No images given.")
+        return JobList(jobs=[job_status(job) for job in submit(images)])
+
+    @app.get("/v1/jobs/{job_id}", response_model=JobStatus, response_model_exclude_unset=True,
+             status_code=status.HTTP_200_OK)
+    async def get_job(job_id: str, compact: bool = False):
+        job = jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found or expired.")
+        return job_status(job, compact)
+
     @app.get("/v1/methods", status_code=status.HTTP_200_OK)
     async def list_methods():
         return MethodList(
-            method=["predict"]
+            method=["predict", "predict/stream", "jobs", "jobs:batch"]
         )
         
     return app
\ No newline at end of file
@@ -0,0 +1,87 @@
+import json
+from typing import List, Tuple, Union
+
+from fastapi import HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+
+from src.app.models import HTPInput, JobBatchInput
+from src.image_input import ImageInput
+
+# (image, language); the image is already decoded and checked, whichever way it was sent
+ImageRequest = Tuple[ImageInput, str]
+
+BINARY_TYPES = ("application/octet-stream",)
+
+
+def request_body_docs(batch: bool = False) -> dict:
+    """OpenAPI requestBody for endpoints that read their input with `read_images`."""
+    single = HTPInput.model_json_schema()
+    field = "images" if batch else "image"
+    binary = {"type": "string", "format": "binary"}
+    return {"requestBody": {"required": True, "content": {
+        "application/json": {"schema": {
+            "type": "object", "properties": {"images": {"type": "array", "items": single}}, "required": ["images"]
+        } if batch else single},
+        "multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {field: {"type": "array", "items": binary} if batch else binary,
+                           "language": {"type": "string", "default": "en"}},
+            "required": [field],
+        }},
+        "application/octet-stream": {"schema": binary},
+        "image/*": {"schema": binary},
+    }}}
+
+
+def to_image(image: Union[str, bytes]) -> ImageInput:
+    """Resolve an image up front so bad input is a 400, not a failed (and retried) model run."""
+    try:
+        return ImageInput.resolve(image)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+async def read_images(request: Request, language: str = "en", batch: bool = False) -> List[ImageRequest]:
+    """
+    Images of a request, sent as JSON (`image_path` / `images`), as
+    multipart form files (`image`, or `images` for batches) or as the raw
+    `application/octet-stream` / `image/*` body. Binary uploads are passed
+    to the model as bytes, so they are never base64 encoded on the way in.
+    Anything that is not a supported image is rejected with 400.
+    """
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+    if content_type == "application/json":
+        try:
+            body = json.loads(await request.body())
+            items = JobBatchInput(**body).images if batch else [HTPInput(**body)]
+        except ValueError as e:
+            if isinstance(e, ValidationError):
+                raise RequestValidationError(e.errors())
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON body: {e}")
+        except TypeError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="JSON body must be an object.")
+        return [(to_image(item.image_path), item.language) for item in items]
+
+    if content_type == "multipart/form-data":
+        form = await request.form()
+        language = form.get("language") or language
+        uploads = form.getlist("images") + form.getlist("image") if batch else form.getlist("image")[:1]
+        images = []
+        for upload in uploads:
+            if isinstance(upload, str):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Images must be sent as files.")
+            images.append((to_image(await upload.read()), language))
+            await upload.close()
+        if not images:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No image file in the form.")
+        return images
+
+    if content_type in BINARY_TYPES or content_type.startswith("image/"):
+        data = await request.body()
+        if not data:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty image body.")
+        return [(to_image(data), language)]
+
+    raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                        detail=f"Unsupported content type '{content_type}'.")
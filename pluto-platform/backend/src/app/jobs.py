@@ -0,0 +1,109 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from loguru import logger
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    """More jobs were submitted than the service accepts at once."""
+
+
+class Job(object):
+    def __init__(self, payload):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+
+class JobManager(object):
+    """
+    Runs submitted analyses on a bounded thread pool, off the event loop.
+
+    At most `workers` jobs run at once and at most `max_pending` are queued
+    or running; further submissions raise JobQueueFull so callers can back
+    off. Finished jobs stay readable for `retain` seconds.
+    """
+
+    def __init__(self, run: Callable, workers: int = 4, max_pending: int = 256, retain: float = 3600.0):
+        assert workers > 0 and max_pending > 0, "workers and max_pending must be positive."
+        self.run = run
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retain = retain
+        self._jobs = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="htp-job")
+
+    def submit(self, payload) -> Job:
+        return self.submit_many([payload])[0]
+
+    def submit_many(self, payloads: list) -> List[Job]:
+        """Queue all payloads or none of them."""
+        jobs = [Job(payload) for payload in payloads]
+        with self._lock:
+            self._prune()
+            if self._pending + len(jobs) > self.max_pending:
+                raise JobQueueFull(f"{self._pending} jobs pending; at most {self.max_pending} are accepted.")
+            self._pending += len(jobs)
+            for job in jobs:
+                self._jobs[job.id] = job
+        for job in jobs:
+            self._pool.submit(self._execute, job)
+        return jobs
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _execute(self, job: Job):
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = self.run(job.payload)
+            job.status = SUCCEEDED
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            # the input (possibly a whole image) is not needed once the job ran
+            job.payload = None
+            job.finished_at = time.time()
+            with self._lock:
+                self._pending -= 1
+
+    def _prune(self):
+        # jobs are stored in submission order, so old finished ones sit at the front
+        cutoff = time.time() - self.retain
+        for job_id in list(self._jobs):
+            job = self._jobs[job_id]
+            if job.created_at > cutoff:
+                break
+            if job.finished and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": self.workers, "pending": self._pending, "retained": len(self._jobs)}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
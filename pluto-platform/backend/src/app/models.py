@@ -1,12 +1,12 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class MethodList(BaseModel):
     method: List[str]
 
 class AnalysisOutput(BaseModel):
-    feature: str
-    analysis: str
+    feature: Optional[str] = None
+    analysis: Optional[str] = None
     
 class Usage(BaseModel):
     total_tokens: int
@@ -22,9 +22,28 @@ class HTPOutput(BaseModel):
     house: AnalysisOutput
     tree: AnalysisOutput
     person: AnalysisOutput
-    merge: str
-    final: str
-    signal: str
+    merge: Optional[str] = None
+    final: Optional[str] = None
+    signal: Optional[str] = None
     usage: Usage
     classification: Optional[bool]
-    fix_signal: Optional[str] = None
\ No newline at end of file
+    classification_source: Optional[str] = None
+    # stage -> reason for stages that failed or were skipped; empty when complete
+    missing: Dict[str, str] = {}
+    fix_signal: Optional[str] = None
+
+class JobStatus(BaseModel):
+    id: str
+    # queued, running, succeeded or failed
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[HTPOutput] = None
+    error: Optional[str] = None
+
+class JobBatchInput(BaseModel):
+    images: List[HTPInput]
+
+class JobList(BaseModel):
+    jobs: List[JobStatus]
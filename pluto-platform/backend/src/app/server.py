@@ -0,0 +1,48 @@
+# Inference service: serves the src.app.api endpoints that the platform calls
+# with INFERENCE_MODE=remote at INFERENCE_URL.
+#
+#     cd backend
+#     uvicorn --factory src.app.server:create_server_app --host 0.0.0.0 --port 8001
+#
+# Scale it on its own: every process runs HTP_JOB_WORKERS analyses and shares
+# nothing but the stage cache file.
+import os
+
+from dotenv import load_dotenv
+
+from src.app.api import create_app
+
+
+def build_model():
+    """HTPModel on Gemini configured from the environment; the LangChain/Gemini stack is imported on first use."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from src.image_normalize import ImageNormalizer
+    from src.model_langchain import HTPModel
+    from src.resilience import StagePolicy, StageRunner
+    from src.result_cache import ResultCache
+    from src.stage_cache import StageCache
+
+    stage_timeout = float(os.getenv("STAGE_TIMEOUT", "120"))
+    # the request timeout ends calls abandoned at the stage deadline, freeing their governor slot
+    text_model = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.2, google_api_key=os.getenv("GOOGLE_API_KEY"), timeout=stage_timeout)
+    result_cache = ResultCache(
+        max_size=int(os.getenv("RESULT_CACHE_SIZE", "512")),
+        ttl=float(os.getenv("RESULT_CACHE_TTL", "86400")),
+    )
+    normalizer = ImageNormalizer(
+        max_edge=int(os.getenv("IMAGE_MAX_EDGE", "1024")),
+        grayscale=os.getenv("IMAGE_GRAYSCALE", "false").lower() == "true",
+    )
+    stage_cache = StageCache(os.getenv("STAGE_CACHE_PATH", "stage_cache.db"))
+    stage_runner = StageRunner(default=StagePolicy(
+        timeout=stage_timeout,
+        retries=int(os.getenv("STAGE_RETRIES", "2")),
+        hedge=os.getenv("STAGE_HEDGE", "true").lower() == "true",
+    ))
+    return HTPModel(text_model=text_model, multimodal_model=text_model, use_cache=True, result_cache=result_cache, normalizer=normalizer, stage_cache=stage_cache, stage_runner=stage_runner, image_mode=os.getenv("HTP_IMAGE_MODE", "separate"))
+
+
+def create_server_app(model=None):
+    """App factory for uvicorn; `model` defaults to `build_model()`."""
+    load_dotenv()
+    return create_app(model or build_model())
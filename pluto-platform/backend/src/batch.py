@@ -0,0 +1,281 @@
+"""
+Headless batch analysis of HTP drawings for server-side backlogs.
+
+Images are split into chunks and fanned out across a process pool; inside
+each worker process the chunk runs through `HTPModel.abatch_workflow` with
+async LLM concurrency. Every image is sent back through a queue as soon as
+it finishes, checkpointed in a BatchManifest and written to a JSONL file,
+optionally with DOCX reports in a directory and/or a ZIP archive laid out
+like the Streamlit Batch page. Rerunning the same command resumes the
+backlog, even after the run was killed in the middle of a chunk.
+
+    cd backend
+    python -m src.batch "drawings/*.png" --processes 4 --concurrency 8 --output results.jsonl --zip reports.zip
+
+Exits with status 1 when any image failed or came back incomplete (missing
+stages), 0 otherwise.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+from loguru import logger
+
+from src.batch_manifest import BatchManifest, image_digest, outcome
+from src.batch_report import ZipReportWriter, report_document
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# one model per worker process and the queue finished records go back on, set by the pool initializer
+_model = None
+_results = None
+# how long to wait for records still in transit from a finished or crashed worker
+DRAIN_TIMEOUT = 5.0
+
+
+def find_images(inputs) -> list:
+    """Image files named by directories, glob patterns or plain paths, sorted and de-duplicated."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = [os.path.join(item, name) for name in os.listdir(item)]
+        else:
+            candidates = glob.glob(item, recursive=True)
+        paths.extend(path for path in candidates
+                     if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(set(os.path.abspath(path) for path in paths))
+
+
+def build_model(config: dict):
+    from src.model_langchain import HTPModel
+
+    if config["fake"]:
+        from src.fake_llm import FakeChatModel
+        text_model = FakeChatModel(latency=config["fake_latency"], latency_distribution="lognormal", seed=os.getpid())
+    else:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        from src.resilience import DEFAULT_STAGE_TIMEOUT
+        text_model = ChatGoogleGenerativeAI(model=config["model"], temperature=0.2, google_api_key=config["api_key"],
+                                            timeout=DEFAULT_STAGE_TIMEOUT)
+    return HTPModel(text_model=text_model, multimodal_model=text_model, language=config["language"],
+                    use_cache=config["use_cache"], image_mode=config["image_mode"])
+
+
+def _init_worker(config: dict, results):
+    global _model, _results
+    logger.remove()
+    logger.add(sys.stderr, level=config["log_level"])
+    _model = build_model(config)
+    _results = results
+
+
+def _run_chunk(paths: list, config: dict) -> int:
+    """Analyze one chunk in a worker process, sending each record back as soon as its image finishes."""
+    async def run():
+        items = _model.abatch_workflow(paths, max_concurrency=config["concurrency"], workflow=config["workflow"],
+                                       language=config["language"], priority="backfill")
+        async for item in items:
+            _results.put({
+                "file": paths[item["index"]],
+                "success": item["success"],
+                "error": item["error"],
+                "seconds": round(item["seconds"], 3),
+                "result": item["result"],
+            })
+
+    asyncio.run(run())
+    return len(paths)
+
+
+class Outputs(object):
+    """JSONL results plus the optional DOCX directory and ZIP archive, written record by record."""
+
+    def __init__(self, args):
+        self.jsonl = open(args.output, "a" if args.append else "w", encoding="utf-8")
+        self.docx_dir = args.docx_dir
+        if self.docx_dir:
+            os.makedirs(self.docx_dir, exist_ok=True)
+        self.zip = ZipReportWriter(args.zip) if args.zip else None
+
+    def write(self, record: dict):
+        self.jsonl.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self.jsonl.flush()
+        file_name = os.path.basename(record["file"])
+        if self.docx_dir:
+            # the image hash keeps same-named files from different directories apart
+            path = os.path.join(self.docx_dir, f"{os.path.splitext(file_name)[0]}_{record['digest'][:12]}.docx")
+            report_document(file_name, record["success"], record["result"]).save(path)
+        if self.zip:
+            self.zip.add(file_name, record["success"], record["result"])
+
+    def close(self):
+        self.jsonl.close()
+        if self.zip:
+            self.zip.close()
+
+
+class Progress(object):
+    """Throughput and ETA of the images analyzed in this run, printed to stderr."""
+
+    def __init__(self, total: int, todo: int, every: float = 5.0):
+        self.total = total
+        self.todo = todo
+        self.every = every
+        self.done = 0
+        self.analyzed = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+        self._last = 0.0
+
+    def update(self, record: dict, analyzed: bool = True):
+        self.done += 1
+        self.analyzed += 1 if analyzed else 0
+        self.failed += 0 if record["success"] else 1
+        now = time.perf_counter()
+        if now - self._last >= self.every or self.done == self.total:
+            self._last = now
+            self.print(now)
+
+    def print(self, now: float = None):
+        elapsed = (now or time.perf_counter()) - self.start
+        rate = self.analyzed / elapsed if elapsed > 0 else 0.0
+        eta = (self.todo - self.analyzed) / rate if rate > 0 else 0.0
+        print(f"[{self.done}/{self.total}] failed {self.failed} | {rate:.2f} img/s | "
+              f"elapsed {time.strftime('%H:%M:%S', time.gmtime(elapsed))} | "
+              f"ETA {time.strftime('%H:%M:%S', time.gmtime(eta))}", file=sys.stderr, flush=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a directory or glob of HTP drawings without the UI.")
+    parser.add_argument("inputs", nargs="+", help="image files, directories or glob patterns")
+    parser.add_argument("--workflow", choices=["workflow", "pluto"], default="workflow")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes")
+    parser.add_argument("--concurrency", type=int, default=4, help="drawings in flight per process")
+    parser.add_argument("--chunk-size", type=int, default=None, help="images per worker task (default 4 x concurrency)")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL results file")
+    parser.add_argument("--append", action="store_true", help="append to --output instead of overwriting it")
+    parser.add_argument("--docx-dir", help="also write one DOCX report per image here")
+    parser.add_argument("--zip", help="also write the reports and failed.txt into this ZIP")
+    parser.add_argument("--manifest", default=None, help="checkpoint file (default BATCH_MANIFEST_PATH or batch_manifest.db)")
+    parser.add_argument("--no-resume", action="store_true", help="re-analyze images already finished in the manifest")
+    parser.add_argument("--model", default="gemini-2.5-flash")
+    parser.add_argument("--image-mode", choices=["separate", "merged"], default=os.getenv("HTP_IMAGE_MODE", "separate"))
+    parser.add_argument("--no-cache", action="store_true", help="disable the LLM response cache")
+    parser.add_argument("--fake", action="store_true", help="use the offline FakeChatModel (dry run)")
+    parser.add_argument("--fake-latency", type=float, default=0.2)
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    load_dotenv()
+    args = parse_args(argv)
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    paths = find_images(args.inputs)
+    if not paths:
+        print("No image files found.", file=sys.stderr)
+        return 2
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not (args.fake or api_key):
+        print("GOOGLE_API_KEY is not set.", file=sys.stderr)
+        return 2
+    config = {
+        "workflow": args.workflow,
+        "language": args.language,
+        "concurrency": args.concurrency,
+        "model": args.model,
+        "api_key": api_key,
+        "image_mode": args.image_mode,
+        "use_cache": not args.no_cache,
+        "fake": args.fake,
+        "fake_latency": args.fake_latency,
+        "log_level": args.log_level,
+    }
+
+    manifest = BatchManifest(args.manifest)
+    digests = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            digests[path] = image_digest(f.read())
+    finished = set() if args.no_resume else manifest.completed(digests.values(), args.workflow, args.language)
+    todo = [path for path in paths if digests[path] not in finished]
+    print(f"{len(paths)} images, {len(paths) - len(todo)} already finished, {len(todo)} to analyze "
+          f"({args.processes} processes x {args.concurrency} concurrent).", file=sys.stderr)
+
+    outputs = Outputs(args)
+    progress = Progress(len(paths), len(todo))
+    left = set(todo)
+
+    def finish(record: dict):
+        # the manifest's rule decides success, so the exit status agrees with what a rerun retries
+        record["digest"] = digests[record["file"]]
+        record["success"], record["error"] = outcome(record["success"], record["result"], record["error"])
+        manifest.record(record["digest"], args.workflow, args.language, os.path.basename(record["file"]),
+                        record["success"], record["result"], record["error"])
+        if record["file"] not in left:
+            # arrived after its chunk was already given up on; the checkpoint above keeps it
+            return
+        left.discard(record["file"])
+        outputs.write(record)
+        progress.update(record)
+
+    def give_up(paths, error: str):
+        for path in paths:
+            if path in left:
+                finish({"file": path, "success": False, "error": error, "seconds": 0.0, "result": None})
+
+    try:
+        for path in paths:
+            if digests[path] in finished:
+                stored = manifest.get(digests[path], args.workflow, args.language)
+                record = {"file": path, "digest": digests[path], "success": True, "error": None, "seconds": 0.0,
+                          "result": stored["result"], "resumed": True}
+                outputs.write(record)
+                progress.update(record, analyzed=False)
+
+        chunk_size = args.chunk_size or args.concurrency * 4
+        chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+        results = multiprocessing.Queue()
+        with ProcessPoolExecutor(max_workers=args.processes, initializer=_init_worker,
+                                 initargs=(config, results)) as pool:
+            pending = {pool.submit(_run_chunk, chunk, config): chunk for chunk in chunks}
+            drain_until = None
+            while left:
+                try:
+                    finish(results.get(timeout=0.5))
+                    continue
+                except queue.Empty:
+                    pass
+                for future in [f for f in pending if f.done()]:
+                    chunk = pending.pop(future)
+                    if future.exception() is not None:
+                        # a crashed worker fails the rest of its chunk; the manifest keeps those retryable
+                        logger.error(f"Worker failed on a chunk of {len(chunk)} images: {future.exception()}")
+                        give_up(chunk, str(future.exception()))
+                if not pending:
+                    # every worker is done; wait a little for records still in the queue
+                    drain_until = drain_until or time.monotonic() + DRAIN_TIMEOUT
+                    if time.monotonic() > drain_until:
+                        give_up(list(left), "Worker exited without a result.")
+    finally:
+        outputs.close()
+        manifest.close()
+
+    print(f"Finished: {progress.done - progress.failed} succeeded, {progress.failed} failed "
+          f"({progress.done - progress.analyzed} resumed from {manifest.path}).", file=sys.stderr)
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional, Set, Tuple
+
+from loguru import logger
+
+DONE = "done"
+FAILED = "failed"
+
+
+def image_digest(data: bytes) -> str:
+    """Same content address as `ImageInput.digest`."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def outcome(success: bool, result: dict = None, error: str = None) -> Tuple[bool, Optional[str]]:
+    """(success, error) of one batch result: a run with missing stages counts as failed and stays retryable."""
+    missing = success and result and result.get("missing")
+    if missing:
+        return False, f"incomplete: {', '.join(missing)}"
+    return success, error
+
+
+class BatchManifest(object):
+    """
+    Checkpoint of batch runs, one row per (image hash, workflow, language).
+
+    Every result is committed as soon as its drawing finishes, so a rerun
+    after a crash, disconnect or quota error skips the completed images and
+    only sends the failed and never-started ones to the model again. Stored
+    results are kept so their reports can be rebuilt without an LLM call.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = os.path.abspath(path or os.getenv("BATCH_MANIFEST_PATH", "batch_manifest.db"))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS batch_items ("
+            "digest TEXT NOT NULL, workflow TEXT NOT NULL, language TEXT NOT NULL, "
+            "file_name TEXT, status TEXT NOT NULL, result TEXT, error TEXT, "
+            "attempts INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (digest, workflow, language))"
+        )
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def completed(self, digests: Iterable[str], workflow: str, language: str) -> Set[str]:
+        """Those of the given images that already finished successfully."""
+        digests = list(digests)
+        finished = set()
+        conn = self._connection()
+        # stay below SQLite's bound-parameter limit on large batches
+        for i in range(0, len(digests), 500):
+            chunk = digests[i:i + 500]
+            rows = conn.execute(
+                f"SELECT digest FROM batch_items WHERE workflow = ? AND language = ? AND status = ? "
+                f"AND digest IN ({','.join('?' * len(chunk))})",
+                [workflow, language, DONE] + chunk,
+            )
+            finished.update(digest for digest, in rows)
+        return finished
+
+    def get(self, digest: str, workflow: str, language: str) -> Optional[dict]:
+        row = self._connection().execute(
+            "SELECT file_name, status, result, error, attempts, updated_at FROM batch_items "
+            "WHERE digest = ? AND workflow = ? AND language = ?",
+            (digest, workflow, language),
+        ).fetchone()
+        if row is None:
+            return None
+        file_name, status, result, error, attempts, updated_at = row
+        return {
+            "file_name": file_name,
+            "status": status,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "attempts": attempts,
+            "updated_at": updated_at,
+        }
+
+    def record(self, digest: str, workflow: str, language: str, file_name: str,
+               success: bool, result: dict = None, error: str = None):
+        """
+        Checkpoint one finished image. Runs with missing stages stay retryable,
+        and a success is never overwritten by a later failure.
+        """
+        success, error = outcome(success, result, error)
+        payload = json.dumps(result, ensure_ascii=False, default=str) if success else None
+        conn = self._connection()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO batch_items (digest, workflow, language, file_name, status, result, error, attempts, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?) "
+                    "ON CONFLICT (digest, workflow, language) DO UPDATE SET "
+                    "file_name = excluded.file_name, status = excluded.status, result = excluded.result, "
+                    "error = excluded.error, attempts = batch_items.attempts + 1, updated_at = excluded.updated_at "
+                    "WHERE batch_items.status != 'done' OR excluded.status = 'done'",
+                    (digest, workflow, language, file_name, DONE if success else FAILED, payload, error, time.time()),
+                )
+        except sqlite3.Error as e:
+            # a lost checkpoint only costs a repeat analysis, so never fail the batch over it
+            logger.warning(f"Batch manifest write failed for {file_name}: {e}")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
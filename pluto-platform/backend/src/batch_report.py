@@ -0,0 +1,73 @@
+import io
+import os
+import zipfile
+from typing import List
+
+from docx import Document
+
+AI_DISCLAIMER = "NOTE: AI-generated content, for reference only. Not a substitute for medical diagnosis."
+
+
+def report_document(file_name: str, success: bool, analysis_result, disclaimer: str = AI_DISCLAIMER) -> Document:
+    """Batch report of one drawing: the signal, plus the final report when concerns were flagged or could not be ruled out."""
+    doc = Document()
+    doc.add_heading(f"Analysis Report: {file_name}", 0)
+    if success:
+        doc.add_paragraph(disclaimer)
+        if analysis_result.get('classification') is not False:
+            doc.add_paragraph(analysis_result.get('signal') or "")
+            doc.add_paragraph(analysis_result.get('final') or "")
+        else:
+            doc.add_paragraph(analysis_result.get('fix_signal') or "")
+    else:
+        doc.add_paragraph("failed")
+    return doc
+
+
+class ZipReportWriter(object):
+    """
+    Writes batch reports straight into a ZIP file on disk.
+
+    Each `add` renders one DOCX and appends it as `results/<name>.docx`, so
+    only the report being written is held in memory no matter how large the
+    batch is. `close` adds `failed.txt` with the drawings that failed.
+    """
+
+    def __init__(self, path: str, disclaimer: str = AI_DISCLAIMER):
+        self.path = path
+        self.disclaimer = disclaimer
+        self.written = 0
+        self.failed: List[str] = []
+        self._names = set()
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _arcname(self, file_name: str) -> str:
+        # uploads from different folders may share a name
+        stem = os.path.splitext(os.path.basename(file_name))[0]
+        name, n = stem, 1
+        while name in self._names:
+            n += 1
+            name = f"{stem}_{n}"
+        self._names.add(name)
+        return f"results/{name}.docx"
+
+    def add(self, file_name: str, success: bool, analysis_result=None):
+        buffer = io.BytesIO()
+        report_document(file_name, success, analysis_result, self.disclaimer).save(buffer)
+        self._zip.writestr(self._arcname(file_name), buffer.getvalue())
+        self.written += 1
+        if not success:
+            self.failed.append(file_name)
+
+    def close(self):
+        if self._zip is None:
+            return
+        self._zip.writestr("failed.txt", "".join(f"{name}\n" for name in self.failed))
+        self._zip.close()
+        self._zip = None
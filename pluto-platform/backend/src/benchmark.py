@@ -0,0 +1,206 @@
+"""
+End-to-end benchmark of the HTP workflows against the offline FakeChatModel.
+
+Measures orchestration overhead without a Gemini key: throughput, p50/p95/p99
+run latency and peak RSS for `pluto_workflow` and `workflow` at increasing
+concurrency levels.
+
+    cd backend
+    python -m src.benchmark --concurrency 1 4 16 64 --runs 64 --latency 0.2
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger
+from PIL import Image
+
+from src.fake_llm import FakeChatModel
+from src.governor import LLMGovernor
+from src.model_langchain import HTPModel
+
+WORKFLOWS = {
+    "pluto": ("pluto_workflow", "apluto_workflow"),
+    "workflow": ("workflow", "aworkflow"),
+}
+
+
+def percentile(values, q: float) -> float:
+    """Nearest-rank percentile of `values` (q in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(q / 100.0 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes (Linux), else the peak so far."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RSSSampler(object):
+    """Samples RSS on a background thread and keeps the peak of one measurement window."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def synthetic_drawings(count: int, size: int = 1024):
+    """Distinct PNG drawings so no run can be served from another run's cache entry."""
+    images = []
+    for i in range(count):
+        image = Image.new("RGB", (size, size), "white")
+        image.putpixel((i % size, i // size % size), (0, 0, 0))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        images.append(buffer.getvalue())
+    return images
+
+
+def build_model(args) -> HTPModel:
+    def fake(seed):
+        return FakeChatModel(
+            latency=args.latency,
+            latency_distribution=args.distribution,
+            latency_sigma=args.sigma,
+            seed=seed,
+        )
+    # caches off and a dedicated governor so every run exercises the full pipeline
+    return HTPModel(
+        text_model=fake(args.seed),
+        multimodal_model=fake(args.seed + 1),
+        use_cache=False,
+        governor=LLMGovernor(max_concurrency=args.llm_concurrency),
+    )
+
+
+def run_sync(model: HTPModel, method: str, images, concurrency: int):
+    def one(image):
+        start = time.perf_counter()
+        getattr(model, method)(image)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, images))
+
+
+def run_async(model: HTPModel, method: str, images, concurrency: int):
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(image):
+            async with semaphore:
+                start = time.perf_counter()
+                await getattr(model, method)(image)
+                return time.perf_counter() - start
+
+        return await asyncio.gather(*(one(image) for image in images))
+
+    return asyncio.run(main())
+
+
+def benchmark(model: HTPModel, workflow: str, mode: str, concurrency: int, images) -> dict:
+    sync_method, async_method = WORKFLOWS[workflow]
+    with RSSSampler() as rss:
+        start = time.perf_counter()
+        if mode == "async":
+            latencies = run_async(model, async_method, images, concurrency)
+        else:
+            latencies = run_sync(model, sync_method, images, concurrency)
+        elapsed = time.perf_counter() - start
+    return {
+        "workflow": workflow,
+        "mode": mode,
+        "concurrency": concurrency,
+        "runs": len(latencies),
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 2),
+        "p50": round(percentile(latencies, 50), 3),
+        "p95": round(percentile(latencies, 95), 3),
+        "p99": round(percentile(latencies, 99), 3),
+        "peak_rss_mb": round(rss.peak / (1024 * 1024), 1),
+    }
+
+
+def print_table(rows):
+    header = f"{'workflow':<10}{'mode':<7}{'conc':>6}{'runs':>6}{'runs/s':>10}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'RSS MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['workflow']:<10}{row['mode']:<7}{row['concurrency']:>6}{row['runs']:>6}"
+              f"{row['throughput']:>10.2f}{row['p50']:>9.3f}{row['p95']:>9.3f}{row['p99']:>9.3f}{row['peak_rss_mb']:>9.1f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark HTP workflows against a fake LLM backend.")
+    parser.add_argument("--workflow", nargs="+", choices=list(WORKFLOWS), default=list(WORKFLOWS))
+    parser.add_argument("--mode", nargs="+", choices=["async", "sync"], default=["async", "sync"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 64])
+    parser.add_argument("--runs", type=int, default=64, help="workflow runs per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.2, help="median LLM call latency in seconds")
+    parser.add_argument("--distribution", choices=["constant", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--sigma", type=float, default=0.5, help="lognormal shape parameter")
+    parser.add_argument("--llm-concurrency", type=int, default=256, help="governor concurrency limit")
+    parser.add_argument("--image-size", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    model = build_model(args)
+    images = synthetic_drawings(args.runs, args.image_size)
+    # warm up prompt compilation and imports outside the measurement
+    benchmark(model, args.workflow[0], "async", 1, images[:1])
+
+    rows = []
+    for workflow in args.workflow:
+        for mode in args.mode:
+            for concurrency in args.concurrency:
+                rows.append(benchmark(model, workflow, mode, concurrency, images))
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import asyncio
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+
+def message_content(response):
+    return response.content
+
+
+class Stage(object):
+    """
+    One node of a workflow DAG.
+
+    A stage declares the names of the values it consumes (`inputs`, either
+    other stages or workflow inputs such as `image`), the prompt registry
+    template it renders (`prompt`) and which model runs it (`model`,
+    "text" or "multimodal"). `variables` maps the input values to template
+    variables and `postprocess` turns the model response into the stage
+    output. Stages without a prompt are local steps computed by `run`.
+    A prompt stage may also declare a `local` fast path: it receives the
+    input values and returns the stage output, or None to fall through to
+    the model. `stream` marks stages whose tokens are forwarded to the
+    run's token callback as they are generated.
+    """
+
+    def __init__(self, name: str, inputs: List[str] = (), prompt: str = None, model: str = "text",
+                 variables: Callable = None, output_parser=None, postprocess: Callable = message_content,
+                 run: Callable = None, local: Callable = None, stream: bool = False):
+        assert model in ("text", "multimodal"), "Stage model must be either 'text' or 'multimodal'."
+        assert (prompt is None) != (run is None), "A stage needs exactly one of `prompt` or `run`."
+        self.name = name
+        self.inputs = list(inputs)
+        self.prompt = prompt
+        self.model = model
+        self.variables = variables or (lambda values: dict(values))
+        self.output_parser = output_parser
+        self.postprocess = postprocess
+        self.run = run
+        self.local = local
+        self.stream = stream
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={self.inputs!r}, prompt={self.prompt!r}, model={self.model!r})"
+
+
+class StageGraph(object):
+    """A validated, acyclic set of stages. Inputs not produced by a stage must be supplied at run time."""
+
+    def __init__(self, name: str, stages: List[Stage]):
+        self.name = name
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            assert stage.name not in self.stages, f"Duplicate stage '{stage.name}' in graph '{name}'."
+            self.stages[stage.name] = stage
+        self.inputs = sorted({
+            dep for stage in stages for dep in stage.inputs if dep not in self.stages
+        })
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done or name not in self.stages:
+                return
+            assert name not in visiting, f"Cycle detected at stage '{name}' in graph '{self.name}'."
+            visiting.add(name)
+            for dep in self.stages[name].inputs:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def __getitem__(self, name: str) -> Stage:
+        return self.stages[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.stages
+
+    def dependencies(self, name: str) -> List[str]:
+        return [dep for dep in self.stages[name].inputs if dep in self.stages]
+
+
+class DAGResult(object):
+    def __init__(self, outputs: dict, timings: dict, cached: List[str] = None, errors: Dict[str, Exception] = None,
+                 missing: Dict[str, str] = None):
+        self.outputs = outputs
+        self.timings = timings
+        self.cached = cached or []
+        # stage -> exception for stages that failed in a partial run
+        self.errors = errors or {}
+        # stage -> reason for every stage without an output (failed or skipped)
+        self.missing = missing or {}
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+
+class DAGExecutor(object):
+    """
+    Runs a StageGraph with maximum safe parallelism: every stage whose
+    dependencies are satisfied is started immediately, each stage output is
+    computed once and shared by all consumers, and per-stage wall time is
+    recorded.
+
+    `invoke(stage, values, context)` / `ainvoke(stage, values, context)`
+    execute prompt stages; `run` stages are called locally. `context` is the
+    caller's per-run state and is passed through untouched apart from stage
+    timings. With a `stage_cache`, prompt stage outputs are persisted under
+    `stage_key(stage, values, context)` and reused on
+    later runs, so only stages whose prompt or inputs changed are recomputed.
+    `on_stage(name, output, seconds, cached)` is called as each stage
+    finishes, which is what the streaming workflows build on.
+
+    With `partial=True` a failing stage does not abort the run: its
+    dependents are skipped, every independent stage still runs, and the
+    result lists the failed and skipped stages in `missing`. `on_error(name,
+    error)` is called for each failure.
+    """
+
+    def __init__(self, invoke: Callable, ainvoke: Callable, max_workers: Optional[int] = None,
+                 stage_cache=None, stage_key: Callable = None):
+        assert stage_cache is None or stage_key is not None, "A stage cache needs a `stage_key` function."
+        self.invoke = invoke
+        self.ainvoke = ainvoke
+        self.max_workers = max_workers
+        self.stage_cache = stage_cache
+        self.stage_key = stage_key
+
+    @staticmethod
+    def _values(graph: StageGraph, name: str, outputs: dict) -> dict:
+        return {dep: outputs[dep] for dep in graph[name].inputs}
+
+    def _check_inputs(self, graph: StageGraph, inputs: dict):
+        missing = [name for name in graph.inputs if name not in inputs]
+        assert not missing, f"Graph '{graph.name}' is missing inputs: {missing}"
+
+    def _ready(self, graph: StageGraph, outputs: dict, started: set) -> List[str]:
+        return [
+            name for name in graph.order
+            if name not in started and all(dep in outputs for dep in graph.dependencies(name))
+        ]
+
+    @staticmethod
+    def _record(context, name: str, seconds: float):
+        if context is not None:
+            context.record_timing(name, seconds)
+
+    def _finish(self, name: str, result: tuple, outputs: dict, timings: dict, cached: list, context, on_stage):
+        outputs[name], timings[name], hit = result
+        self._record(context, name, timings[name])
+        if hit:
+            cached.append(name)
+        logger.debug(f"Stage '{name}' finished in {timings[name]:.2f}s.")
+        if on_stage is not None:
+            on_stage(name, outputs[name], timings[name], hit)
+
+    @staticmethod
+    def _fail(name: str, error: Exception, errors: dict, partial: bool, on_error):
+        if not partial:
+            raise error
+        errors[name] = error
+        logger.warning(f"Stage '{name}' failed: {error}")
+        if on_error is not None:
+            on_error(name, error)
+
+    @staticmethod
+    def _result(graph: StageGraph, outputs: dict, timings: dict, cached: list, errors: dict) -> DAGResult:
+        missing = {}
+        for name in graph.order:
+            if name in errors:
+                missing[name] = f"failed: {errors[name]}"
+            elif name not in outputs:
+                failed = [dep for dep in graph.dependencies(name) if dep in missing]
+                missing[name] = f"skipped: upstream stage '{failed[0]}' is missing" if failed else "skipped"
+        if cached:
+            logger.info(f"Graph '{graph.name}' reused {len(cached)} cached stages: {cached}")
+        return DAGResult(outputs, timings, cached, errors, missing)
+
+    def _lookup(self, stage: Stage, values: dict, context):
+        if self.stage_cache is None or stage.run:
+            return None, None
+        key = self.stage_key(stage, values, context)
+        return key, self.stage_cache.get(key)
+
+    def _call(self, stage: Stage, values: dict, context):
+        start = time.perf_counter()
+        key, output = self._lookup(stage, values, context)
+        if output is not None:
+            return output, time.perf_counter() - start, True
+        output = stage.run(values) if stage.run else self.invoke(stage, values, context)
+        if key is not None:
+            self.stage_cache.put(key, output)
+        return output, time.perf_counter() - start, False
+
+    def run(self, graph: StageGraph, inputs: dict, context=None, on_stage: Callable = None,
+            partial: bool = False, on_error: Callable = None) -> DAGResult:
+        self._check_inputs(graph, inputs)
+        outputs, timings, started, cached, errors = dict(inputs), {}, set(), [], {}
+        workers = self.max_workers or max(1, len(graph.stages))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+            while True:
+                for name in self._ready(graph, outputs, started):
+                    started.add(name)
+                    pending[executor.submit(self._call, graph[name], self._values(graph, name, outputs), context)] = name
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self._fail(name, e, errors, partial, on_error)
+                        continue
+                    self._finish(name, result, outputs, timings, cached, context, on_stage)
+        return self._result(graph, outputs, timings, cached, errors)
+
+    async def _acall(self, stage: Stage, values: dict, context):
+        start = time.perf_counter()
+        key, output = self._lookup(stage, values, context)
+        if output is not None:
+            return output, time.perf_counter() - start, True
+        output = stage.run(values) if stage.run else await self.ainvoke(stage, values, context)
+        if key is not None:
+            self.stage_cache.put(key, output)
+        return output, time.perf_counter() - start, False
+
+    async def arun(self, graph: StageGraph, inputs: dict, context=None, on_stage: Callable = None,
+                   partial: bool = False, on_error: Callable = None) -> DAGResult:
+        self._check_inputs(graph, inputs)
+        outputs, timings, started, cached, errors = dict(inputs), {}, set(), [], {}
+        pending = {}
+        try:
+            while True:
+                for name in self._ready(graph, outputs, started):
+                    started.add(name)
+                    pending[asyncio.ensure_future(self._acall(graph[name], self._values(graph, name, outputs), context))] = name
+                if not pending:
+                    break
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        self._fail(name, e, errors, partial, on_error)
+                        continue
+                    self._finish(name, result, outputs, timings, cached, context, on_stage)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        return self._result(graph, outputs, timings, cached, errors)
@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+IMAGE_TOKENS = 258
+CHARS_PER_TOKEN = 4
+# only the role/task statement at the top of a prompt is matched, so
+# upstream outputs substituted further down cannot change the reply
+MARKER_WINDOW = 400
+
+FEATURE_OUTPUT = """### Extracted Features
+- **Size and placement**: The figure is drawn in the centre of the page at a moderate size.
+- **Line quality**: Lines are continuous with even pressure.
+- **Details**: Main elements are present with a moderate level of detail."""
+
+ANALYSIS_OUTPUT = """### Interpretation
+- **Size and placement**: Suggests an adequate sense of self and balanced attention to the environment.
+- **Line quality**: Indicates stable emotional control.
+- **Details**: Reflects typical engagement with the task and age-appropriate development."""
+
+MERGE_OUTPUT = """### Integrated Analysis
+- **Overall**: Balanced composition with age-appropriate detail.
+- **House**: Indicates a generally secure view of the home environment.
+- **Tree**: Suggests steady personal growth.
+- **Person**: Reflects an adequate self-concept."""
+
+FINAL_OUTPUT = """### HTP Test Report
+The drawing shows balanced use of space, consistent line quality and age-appropriate detail across all elements.
+No strong indicators of emotional distress were identified. Protective factors include a stable self-concept and a secure home representation."""
+
+SIGNAL_OUTPUT = """### Assessment Opinion:
+Observation
+
+No significant mental health concerns are evident. Routine follow-up is sufficient; continue to support the child's existing strengths."""
+
+PERSON_REPORT_OUTPUT = """### HTP "Person" Analysis Summary
+**Feature: Figure Size and Placement**
+*   **Observation**: The figure is centred and moderately sized.
+*   **Interpretation**: Suggests an adequate sense of self.
+**Feature: Line Quality**
+*   **Observation**: Lines are continuous with even pressure.
+*   **Interpretation**: Indicates stable emotional control.
+
+### Overall Summary
+The drawing reflects a stable self-concept and adequate emotional regulation. No acute concerns are indicated; routine observation is recommended."""
+
+CLASSIFICATION_OUTPUT = '{"result": false}'
+
+COMBINED_OUTPUT = f"<features>\n{FEATURE_OUTPUT}\n</features>\n<analysis>\n{ANALYSIS_OUTPUT}\n</analysis>"
+
+# (marker in the opening of the system prompt, canned reply); the first match wins
+DEFAULT_RESPONSES = [
+    ("complete two tasks on the same drawing", COMBINED_OUTPUT),
+    ("classify the overall mental health screening result", CLASSIFICATION_OUTPUT),
+    ("final, concise summary report", PERSON_REPORT_OUTPUT),
+    ("risk assessment and mental health screening", SIGNAL_OUTPUT),
+    ("final professional psychological assessment report", FINAL_OUTPUT),
+    ("synthesize and integrate", MERGE_OUTPUT),
+    ("extract", FEATURE_OUTPUT),
+]
+
+
+def _content_text(message: BaseMessage):
+    """Text of a message plus the number of images it carries."""
+    if isinstance(message.content, str):
+        return message.content, 0
+    texts, images = [], 0
+    for part in message.content:
+        if isinstance(part, str):
+            texts.append(part)
+        elif part.get("type") == "image_url":
+            images += 1
+        elif part.get("type") == "text":
+            texts.append(part.get("text", ""))
+    return "\n".join(texts), images
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline, deterministic stand-in for Gemini that plugs into
+    `HTPModel(text_model=..., multimodal_model=...)`.
+
+    Replies are picked by matching the system prompt against `responses`,
+    so every HTP stage gets output in the format its parser expects.
+    Latency is drawn from a seeded distribution ("constant", "uniform" or
+    "lognormal" around `latency` seconds), usage metadata is estimated from
+    the prompt size, and `failure_rate` / `rate_limit_rate` inject errors.
+    Like the real clients' request timeout, `timeout` makes a call whose
+    sampled latency exceeds it fail with TimeoutError after `timeout` seconds.
+    Streaming yields the reply word by word: half of the sampled latency
+    passes before the first token, the rest is spread over the chunks.
+    """
+
+    latency: float = 0.0
+    latency_distribution: str = "constant"
+    latency_sigma: float = 0.5
+    seed: int = 0
+    responses: List[tuple] = DEFAULT_RESPONSES
+    default_response: str = ANALYSIS_OUTPUT
+    failure_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    timeout: Optional[float] = None
+    model: str = "fake-htp"
+
+    _rng: Any = PrivateAttr(default=None)
+    _calls: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context: Any) -> None:
+        assert self.latency_distribution in ("constant", "uniform", "lognormal"), \
+            "latency_distribution must be 'constant', 'uniform' or 'lognormal'."
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-htp"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model}
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def sample_latency(self) -> float:
+        if self.latency <= 0:
+            return 0.0
+        if self.latency_distribution == "uniform":
+            return self._rng.uniform(0, 2 * self.latency)
+        if self.latency_distribution == "lognormal":
+            # median of the distribution equals `latency`, with a heavy right tail
+            return self.latency * self._rng.lognormvariate(0, self.latency_sigma)
+        return self.latency
+
+    def _timed_out(self, delay: float) -> bool:
+        return self.timeout is not None and delay > self.timeout
+
+    def _timeout_error(self) -> TimeoutError:
+        return TimeoutError(f"fake request timed out after {self.timeout}s")
+
+    def _check_failure(self):
+        roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED: fake rate limit")
+        if roll < self.rate_limit_rate + self.failure_rate:
+            raise RuntimeError("fake model failure")
+
+    def reply_for(self, messages: List[BaseMessage]) -> str:
+        system = next((m for m in messages if m.type == "system"), None)
+        system_text = _content_text(system)[0][:MARKER_WINDOW].lower() if system else ""
+        for marker, response in self.responses:
+            if marker.lower() in system_text:
+                return response
+        return self.default_response
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        self._calls += 1
+        input_chars, images = 0, 0
+        for message in messages:
+            text, count = _content_text(message)
+            input_chars += len(text)
+            images += count
+        content = self.reply_for(messages)
+        input_tokens = input_chars // CHARS_PER_TOKEN + images * IMAGE_TOKENS
+        output_tokens = max(1, len(content) // CHARS_PER_TOKEN)
+        message = AIMessage(
+            content=content,
+            id=hashlib.sha256(content.encode("utf-8")).hexdigest()[:16],
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        delay = self.sample_latency()
+        if self._timed_out(delay):
+            time.sleep(self.timeout)
+            raise self._timeout_error()
+        if delay:
+            time.sleep(delay)
+        self._check_failure()
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        delay = self.sample_latency()
+        if self._timed_out(delay):
+            await asyncio.sleep(self.timeout)
+            raise self._timeout_error()
+        if delay:
+            await asyncio.sleep(delay)
+        self._check_failure()
+        return self._result(messages)
+
+    def _chunks(self, messages: List[BaseMessage]):
+        message = self._result(messages).generations[0].message
+        words = re.findall(r"\S+\s*|\s+", message.content)
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=word,
+                # usage is reported once, on the final chunk, as Gemini does
+                usage_metadata=message.usage_metadata if last else None,
+            ))
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        delay = self.sample_latency()
+        if self._timed_out(delay):
+            time.sleep(self.timeout)
+            raise self._timeout_error()
+        time.sleep(delay / 2)
+        self._check_failure()
+        chunks = list(self._chunks(messages))
+        for chunk in chunks:
+            time.sleep(delay / 2 / len(chunks))
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        delay = self.sample_latency()
+        if self._timed_out(delay):
+            await asyncio.sleep(self.timeout)
+            raise self._timeout_error()
+        await asyncio.sleep(delay / 2)
+        self._check_failure()
+        chunks = list(self._chunks(messages))
+        for chunk in chunks:
+            await asyncio.sleep(delay / 2 / len(chunks))
+            yield chunk
@@ -0,0 +1,294 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+from loguru import logger
+
+# lower value = served first
+PRIORITIES = {
+    "interactive": 0,
+    "assigned": 1,
+    "backfill": 2,
+}
+
+RATE_LIMIT_MARKERS = ("429", "resource_exhausted", "resource exhausted", "rate limit", "ratelimit", "quota")
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Best-effort detection of provider throttling (HTTP 429 / RESOURCE_EXHAUSTED)."""
+    if type(error).__name__ in ("ResourceExhausted", "RateLimitError", "TooManyRequests"):
+        return True
+    for attr in ("status_code", "code"):
+        if getattr(error, attr, None) == 429:
+            return True
+    message = str(error).lower()
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+
+class TokenBucket(object):
+    """Continuously refilling bucket of `per_minute` units with a burst of `capacity`."""
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        assert per_minute > 0, "per_minute must be positive."
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (requests larger than the burst wait for a full bucket)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        """Charge (positive) or refund (negative) the difference between estimated and actual usage."""
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class _Waiter(object):
+    __slots__ = ("priority", "seq", "tokens", "event", "loop", "future", "granted", "cancelled")
+
+    def __init__(self, priority: int, seq: int, tokens: int, loop=None):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+        self.granted = False
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def grant(self):
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class LLMGovernor(object):
+    """
+    Process-wide admission control for LLM calls.
+
+    Calls wait in priority lanes (interactive > assigned > backfill, FIFO
+    within a lane) until a concurrency slot is free and the requests/min and
+    tokens/min buckets allow them. A rate-limit error pauses all admissions
+    with jittered exponential backoff and halves the concurrency limit,
+    which then grows back by one slot per window of successful calls.
+    Works from threads (`call`) and event loops (`acall`) at the same time.
+    """
+
+    def __init__(self, max_concurrency: int = 8, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_retries: int = 4,
+                 base_backoff: float = 1.0, max_backoff: float = 60.0):
+        assert max_concurrency > 0, "max_concurrency must be positive."
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+        self._lock = threading.Lock()
+        self._queue = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._limit = max_concurrency
+        self._successes = 0
+        self._consecutive_limits = 0
+        self._paused_until = 0.0
+        self._timer = None
+        self._timer_due = None
+        self.stats = {"calls": 0, "rate_limited": 0, "retries": 0, "failures": 0}
+
+    # -- scheduling ---------------------------------------------------------
+
+    def _wake_at(self, due: float):
+        if self._timer is not None and self._timer_due <= due:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_due = due
+        self._timer = threading.Timer(max(0.0, due - time.monotonic()), self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self._timer_due = None
+            self._dispatch()
+
+    def _dispatch(self):
+        """Grant queued waiters in priority order. Must be called with the lock held."""
+        while self._queue and self._queue[0].cancelled:
+            heapq.heappop(self._queue)
+        while self._queue and self._active < self._limit:
+            now = time.monotonic()
+            if now < self._paused_until:
+                self._wake_at(self._paused_until)
+                return
+            waiter = self._queue[0]
+            delay = 0.0
+            if self.request_bucket:
+                delay = max(delay, self.request_bucket.delay(1, now))
+            if self.token_bucket:
+                delay = max(delay, self.token_bucket.delay(waiter.tokens, now))
+            if delay > 0:
+                self._wake_at(now + delay)
+                return
+            heapq.heappop(self._queue)
+            if self.request_bucket:
+                self.request_bucket.take(1)
+            if self.token_bucket:
+                self.token_bucket.take(waiter.tokens)
+            self._active += 1
+            waiter.grant()
+            while self._queue and self._queue[0].cancelled:
+                heapq.heappop(self._queue)
+
+    def _enqueue(self, priority: str, tokens: int, loop=None) -> _Waiter:
+        assert priority in PRIORITIES, f"Unknown priority lane '{priority}'."
+        waiter = _Waiter(PRIORITIES[priority], next(self._seq), max(0, int(tokens)), loop)
+        with self._lock:
+            heapq.heappush(self._queue, waiter)
+            self._dispatch()
+        return waiter
+
+    def acquire(self, priority: str = "interactive", tokens: int = 0):
+        waiter = self._enqueue(priority, tokens)
+        waiter.event.wait()
+
+    async def aacquire(self, priority: str = "interactive", tokens: int = 0):
+        waiter = self._enqueue(priority, tokens, asyncio.get_running_loop())
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    # granted in the same instant we were cancelled: give the slot back
+                    self._active -= 1
+                    self._dispatch()
+                else:
+                    waiter.cancelled = True
+            raise
+
+    def release(self, estimated_tokens: int = 0, actual_tokens: Optional[int] = None, rate_limited: bool = False):
+        with self._lock:
+            self._active -= 1
+            if self.token_bucket and actual_tokens is not None:
+                self.token_bucket.adjust(actual_tokens - estimated_tokens)
+            if rate_limited:
+                self._on_rate_limit()
+            else:
+                self._consecutive_limits = 0
+                self._successes += 1
+                if self._limit < self.max_concurrency and self._successes >= self._limit:
+                    self._limit += 1
+                    self._successes = 0
+            self._dispatch()
+
+    def _on_rate_limit(self):
+        self.stats["rate_limited"] += 1
+        backoff = min(self.max_backoff, self.base_backoff * (2 ** self._consecutive_limits))
+        backoff *= random.uniform(0.5, 1.5)
+        self._consecutive_limits += 1
+        self._successes = 0
+        self._limit = max(1, self._limit // 2)
+        self._paused_until = max(self._paused_until, time.monotonic() + backoff)
+        logger.warning(f"LLM rate limit hit; pausing {backoff:.1f}s, concurrency limit now {self._limit}.")
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    # -- call wrappers ------------------------------------------------------
+
+    def call(self, fn: Callable, priority: str = "interactive", tokens: int = 0, measure: Callable = None):
+        """Run `fn()` under admission control, retrying on rate-limit errors."""
+        for attempt in range(self.max_retries + 1):
+            self.acquire(priority, tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                limited = is_rate_limit_error(e)
+                self.release(tokens, rate_limited=limited)
+                if limited and attempt < self.max_retries:
+                    self._count("retries")
+                    continue
+                self._count("failures")
+                raise
+            self.release(tokens, measure(result) if measure else None)
+            self._count("calls")
+            return result
+
+    async def acall(self, fn: Callable, priority: str = "interactive", tokens: int = 0, measure: Callable = None):
+        """Async counterpart of `call`; `fn()` must return an awaitable."""
+        for attempt in range(self.max_retries + 1):
+            await self.aacquire(priority, tokens)
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self.release(tokens)
+                raise
+            except Exception as e:
+                limited = is_rate_limit_error(e)
+                self.release(tokens, rate_limited=limited)
+                if limited and attempt < self.max_retries:
+                    self._count("retries")
+                    continue
+                self._count("failures")
+                raise
+            self.release(tokens, measure(result) if measure else None)
+            self._count("calls")
+            return result
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "active": self._active,
+                "queued": sum(1 for waiter in self._queue if not waiter.cancelled),
+                "concurrency_limit": self._limit,
+            }
+
+
+_default_governor = None
+_default_lock = threading.Lock()
+
+
+def get_governor() -> LLMGovernor:
+    """Process-wide governor configured from LLM_MAX_CONCURRENCY, LLM_RPM and LLM_TPM."""
+    global _default_governor
+    with _default_lock:
+        if _default_governor is None:
+            rpm = os.getenv("LLM_RPM")
+            tpm = os.getenv("LLM_TPM")
+            _default_governor = LLMGovernor(
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+                requests_per_minute=float(rpm) if rpm else None,
+                tokens_per_minute=float(tpm) if tpm else None,
+            )
+        return _default_governor
@@ -0,0 +1,102 @@
+import base64
+import binascii
+import hashlib
+import os
+import re
+from typing import Optional, Union
+
+DATA_URI_PATTERN = re.compile(r'^data:(image/[\w.+-]+);base64,')
+# anything longer than this cannot be a sane file path, so skip the filesystem lookup
+MAX_PATH_LENGTH = 4096
+INVALID_IMAGE = "Invalid image path or base64 string."
+
+MAGIC_NUMBERS = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+]
+
+
+def sniff_mime_type(data: bytes) -> Optional[str]:
+    """MIME type from the magic number; None when the bytes are not a supported image format."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    for magic, mime_type in MAGIC_NUMBERS:
+        if data.startswith(magic):
+            return mime_type
+    return None
+
+
+class ImageInput(object):
+    """
+    An image resolved exactly once from a path, raw bytes, or a base64 /
+    data-URI string. Instances are immutable and can be shared by every stage
+    of a workflow; the base64 payload is encoded at most once. Input that is
+    not a JPEG, PNG, GIF, BMP or WebP image raises ValueError.
+    """
+
+    __slots__ = ("data", "digest", "mime_type", "source", "_base64")
+
+    def __init__(self, data: bytes, mime_type: str = None, source: str = "bytes", encoded: str = None):
+        data = bytes(data)
+        mime_type = mime_type or sniff_mime_type(data)
+        if mime_type is None:
+            raise ValueError(INVALID_IMAGE)
+        object.__setattr__(self, "data", data)
+        object.__setattr__(self, "digest", hashlib.sha256(self.data).hexdigest())
+        object.__setattr__(self, "mime_type", mime_type)
+        object.__setattr__(self, "source", source)
+        object.__setattr__(self, "_base64", encoded)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ImageInput is immutable.")
+
+    @classmethod
+    def resolve(cls, image: Union["ImageInput", bytes, bytearray, memoryview, str]) -> "ImageInput":
+        if isinstance(image, ImageInput):
+            return image
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return cls(image, source="bytes")
+        if not isinstance(image, str):
+            raise TypeError(f"Unsupported image input type: {type(image).__name__}")
+
+        match = DATA_URI_PATTERN.match(image)
+        if match:
+            return cls._from_base64(image[match.end():], mime_type=match.group(1), source="data_uri")
+        if len(image) <= MAX_PATH_LENGTH and os.path.isfile(image):
+            with open(image, "rb") as image_file:
+                return cls(image_file.read(), source="path")
+        return cls._from_base64(image, source="base64")
+
+    @classmethod
+    def _from_base64(cls, encoded: str, mime_type: str = None, source: str = "base64") -> "ImageInput":
+        try:
+            data = base64.b64decode(encoded, validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueError(INVALID_IMAGE)
+        # a declared data-URI type does not make arbitrary bytes an image
+        if sniff_mime_type(data) is None:
+            raise ValueError(INVALID_IMAGE)
+        return cls(data, mime_type=mime_type, source=source, encoded=encoded)
+
+    @property
+    def base64(self) -> str:
+        if self._base64 is None:
+            object.__setattr__(self, "_base64", base64.b64encode(self.data).decode("utf-8"))
+        return self._base64
+
+    @property
+    def data_uri(self) -> str:
+        return f"data:{self.mime_type};base64,{self.base64}"
+
+    def template_inputs(self) -> dict:
+        """Variables consumed by the image prompt templates."""
+        return {"image_data": self.base64, "mime_type": self.mime_type}
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return f"ImageInput(source={self.source!r}, mime_type={self.mime_type!r}, size={len(self.data)}, digest={self.digest[:12]!r})"
@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from loguru import logger
+from PIL import Image, ImageOps
+
+from src.image_input import ImageInput
+
+
+class ImageNormalizer(object):
+    """
+    Pre-LLM normalization for uploaded drawings.
+
+    Auto-orients from EXIF, caps the long edge at `max_edge`, drops EXIF and
+    other metadata, and optionally converts pencil drawings to grayscale JPEG
+    or a small-palette PNG. Results are cached per image hash so the work is
+    done once per drawing.
+    """
+
+    def __init__(self, max_edge: int = 1024, grayscale: bool = False, palette_colors: int = None,
+                 quality: int = 85, cache_size: int = 256):
+        assert max_edge > 0, "max_edge must be positive."
+        assert palette_colors is None or 2 <= palette_colors <= 256, "palette_colors must be between 2 and 256."
+        self.max_edge = max_edge
+        self.grayscale = grayscale
+        self.palette_colors = palette_colors
+        self.quality = quality
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+
+    def __call__(self, image: ImageInput) -> ImageInput:
+        return self.normalize(image)
+
+    def normalize(self, image: ImageInput) -> ImageInput:
+        with self._lock:
+            cached = self._cache.get(image.digest)
+            if cached is not None:
+                self._cache.move_to_end(image.digest)
+                return cached
+
+        try:
+            normalized = self._normalize(image)
+        except Exception as e:
+            logger.warning(f"Image normalization failed, sending original image: {e}")
+            normalized = image
+
+        with self._lock:
+            # index by both hashes so an already normalized image is not processed again
+            self._cache[image.digest] = normalized
+            self._cache[normalized.digest] = normalized
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return normalized
+
+    @staticmethod
+    def _flatten(img: Image.Image) -> Image.Image:
+        """Composite transparent images onto white; a plain mode conversion would turn transparent pixels black."""
+        if img.mode not in ("RGBA", "LA", "PA") and "transparency" not in img.info:
+            return img
+        img = img.convert("RGBA")
+        return Image.alpha_composite(Image.new("RGBA", img.size, (255, 255, 255, 255)), img).convert("RGB")
+
+    def _normalize(self, image: ImageInput) -> ImageInput:
+        with Image.open(BytesIO(image.data)) as img:
+            img = ImageOps.exif_transpose(img)
+            if max(img.size) > self.max_edge:
+                img.thumbnail((self.max_edge, self.max_edge), Image.LANCZOS)
+            img = self._flatten(img)
+
+            buffer = BytesIO()
+            if self.palette_colors:
+                img = img.convert("L").quantize(colors=self.palette_colors)
+                img.save(buffer, format="PNG", optimize=True)
+                mime_type = "image/png"
+            else:
+                img = img.convert("L") if self.grayscale else img.convert("RGB")
+                img.save(buffer, format="JPEG", quality=self.quality, optimize=True)
+                mime_type = "image/jpeg"
+            width, height = img.size
+
+        normalized = ImageInput(buffer.getvalue(), mime_type=mime_type, source="normalized")
+        logger.info(f"Image normalized: {len(image)} -> {len(normalized)} bytes, {width}x{height}.")
+        return normalized
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+import random
+from typing import AsyncIterator
+
+import httpx
+from loguru import logger
+
+# worth retrying: the service is overloaded, restarting or briefly unreachable
+RETRY_STATUS = {429, 502, 503, 504}
+
+
+class InferenceError(RuntimeError):
+    """The inference service rejected the request or reported a failed run."""
+
+
+class LocalInference(object):
+    """Runs workflows on an in-process HTPModel."""
+
+    def __init__(self, model):
+        self.model = model
+
+    async def astream(self, image, workflow: str = "pluto", language: str = "en",
+                      priority: str = "assigned") -> AsyncIterator[dict]:
+        """Workflow events (`start`, `stage`, `token`, `stage_error`, `result`) of one drawing."""
+        context = self.model.new_context(language=language, workflow=workflow, priority=priority)
+        async for event in self.model.astream_workflow(image_path=image, workflow=workflow, language=language,
+                                                       context=context):
+            yield event
+
+    async def aclose(self):
+        pass
+
+
+class RemoteInference(object):
+    """
+    Runs workflows on the inference service (`src/app/server.py`).
+
+    Requests share one keep-alive httpx connection pool and at most
+    `max_concurrency` run at once. Image files are sent as raw
+    `application/octet-stream` bodies to `/v1/predict/stream`, and the SSE
+    events come back exactly as `LocalInference` yields them. Connection
+    errors, timeouts and 429/5xx answers are retried with full-jitter
+    backoff as long as nothing but the `start` event has been passed on.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 600.0, connect_timeout: float = 5.0, retries: int = 2,
+                 max_concurrency: int = 16, base_backoff: float = 1.0, max_backoff: float = 30.0):
+        self.retries = retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # read covers the gap between two events, so it bounds a single stage rather than the whole run
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+
+    @staticmethod
+    async def _read_image(image) -> bytes:
+        if isinstance(image, (bytes, bytearray)):
+            return bytes(image)
+        if isinstance(image, str) and os.path.isfile(image):
+            return await asyncio.to_thread(_read_file, image)
+        raise InferenceError("Remote inference needs image bytes or a readable image file.")
+
+    async def _events(self, body: bytes, params: dict) -> AsyncIterator[dict]:
+        async with self._client.stream("POST", "/v1/predict/stream", content=body, params=params,
+                                       headers={"Content-Type": "application/octet-stream"}) as response:
+            if response.status_code in RETRY_STATUS:
+                raise httpx.HTTPStatusError(f"Inference service answered {response.status_code}",
+                                            request=response.request, response=response)
+            if response.status_code != 200:
+                detail = (await response.aread()).decode("utf-8", "replace")[:500]
+                raise InferenceError(f"Inference service answered {response.status_code}: {detail}")
+            data = []
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    data.append(line[5:].strip())
+                elif not line and data:
+                    yield json.loads("\n".join(data))
+                    data = []
+
+    async def astream(self, image, workflow: str = "pluto", language: str = "en",
+                      priority: str = "assigned") -> AsyncIterator[dict]:
+        body = await self._read_image(image)
+        params = {"workflow": workflow, "language": language, "priority": priority}
+        started = False
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                progressed = False
+                try:
+                    async for event in self._events(body, params):
+                        if event.get("event") == "error":
+                            raise InferenceError(event.get("detail") or "Inference run failed.")
+                        if event.get("event") != "start":
+                            progressed = True
+                        elif started:
+                            # the consumer already saw an earlier attempt's start event
+                            continue
+                        started = True
+                        yield event
+                    return
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    if progressed or attempt == self.retries:
+                        raise InferenceError(f"Inference service unavailable: {e}") from e
+                    delay = self.backoff(attempt)
+                    logger.warning(f"Inference request attempt {attempt + 1} failed ({e}); retrying in {delay:.1f}s.")
+                    await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
@@ -0,0 +1,230 @@
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+from loguru import logger
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """Hash the serialized prompt so multi-megabyte base64 images are never stored as keys."""
+    digest = hashlib.sha256()
+    digest.update(llm_string.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ShardedLRU(object):
+    """In-memory LRU split into independently locked shards to reduce lock contention."""
+
+    def __init__(self, max_entries: int = 1024, shards: int = 16):
+        assert max_entries > 0 and shards > 0, "max_entries and shards must be positive."
+        self.shards = [OrderedDict() for _ in range(shards)]
+        self.locks = [threading.Lock() for _ in range(shards)]
+        self.max_per_shard = max(1, max_entries // shards)
+
+    def _shard(self, key: str) -> int:
+        return int(key[:8], 16) % len(self.shards)
+
+    def get(self, key: str):
+        index = self._shard(key)
+        with self.locks[index]:
+            shard = self.shards[index]
+            value = shard.get(key)
+            if value is not None:
+                shard.move_to_end(key)
+            return value
+
+    def put(self, key: str, value):
+        index = self._shard(key)
+        with self.locks[index]:
+            shard = self.shards[index]
+            shard[key] = value
+            shard.move_to_end(key)
+            while len(shard) > self.max_per_shard:
+                shard.popitem(last=False)
+
+    def clear(self):
+        for lock, shard in zip(self.locks, self.shards):
+            with lock:
+                shard.clear()
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+
+class SQLiteStore(object):
+    """
+    WAL-mode SQLite key/value store holding zlib-compressed values.
+
+    Writes are queued and applied in batches by a single background writer
+    thread, so callers never wait on the database write lock. Entries older
+    than `max_age` seconds are dropped, and the oldest entries are evicted
+    once the stored values exceed `max_bytes`.
+    """
+
+    def __init__(self, path: str, table: str = "llm_cache", max_bytes: int = 256 * 1024 * 1024,
+                 max_age: Optional[float] = 30 * 24 * 3600, evict_every: int = 200):
+        self.path = path
+        self.table = table
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evict_every = evict_every
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._writes = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_created_at ON {table} (created_at)")
+        conn.commit()
+
+        self._writer = threading.Thread(target=self._write_loop, name=f"{table}-writer", daemon=True)
+        self._writer.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._connection().execute(
+            f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if self.max_age is not None and time.time() - row[1] > self.max_age:
+            return None
+        return zlib.decompress(row[0])
+
+    def put(self, key: str, value: bytes):
+        self._queue.put((key, zlib.compress(value), time.time()))
+
+    def flush(self):
+        """Block until every queued write has been applied."""
+        self._queue.join()
+
+    def _write_loop(self):
+        conn = self._connection()
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO {self.table} (key, value, size, created_at) VALUES (?, ?, ?, ?)",
+                        [(key, value, len(value), created_at) for key, value, created_at in batch],
+                    )
+                self._writes += len(batch)
+                if self._writes >= self.evict_every:
+                    self._writes = 0
+                    self.evict(conn)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache write failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def evict(self, conn: sqlite3.Connection = None):
+        conn = conn or self._connection()
+        with conn:
+            if self.max_age is not None:
+                conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.max_age,))
+            total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+            if total > self.max_bytes:
+                # drop the oldest entries until the store is back under budget
+                excess = total - self.max_bytes
+                freed = 0
+                keys = []
+                for key, size in conn.execute(f"SELECT key, size FROM {self.table} ORDER BY created_at"):
+                    keys.append((key,))
+                    freed += size
+                    if freed >= excess:
+                        break
+                conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", keys)
+                logger.info(f"LLM cache evicted {len(keys)} entries ({freed} bytes).")
+
+    def clear(self):
+        self.flush()
+        with self._connection() as conn:
+            conn.execute(f"DELETE FROM {self.table}")
+
+
+class TieredLLMCache(BaseCache):
+    """
+    LangChain LLM cache with a sharded in-memory LRU in front of a WAL-mode
+    SQLite store. Keys are hashes of the prompt and model configuration and
+    values are stored compressed, so the cached base64 images are never
+    duplicated on disk.
+    """
+
+    def __init__(self, path: str = "llm_cache.db", max_entries: int = 1024, shards: int = 16,
+                 max_bytes: int = 256 * 1024 * 1024, max_age: Optional[float] = 30 * 24 * 3600):
+        self.memory = ShardedLRU(max_entries=max_entries, shards=shards)
+        self.store = SQLiteStore(path, max_bytes=max_bytes, max_age=max_age)
+        self._stats_lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = cache_key(prompt, llm_string)
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+        raw = self.store.get(key)
+        if raw is None:
+            self._count("misses")
+            return None
+        value = loads(raw.decode("utf-8"), allowed_objects="core")
+        self.memory.put(key, value)
+        self._count("disk_hits")
+        return value
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = cache_key(prompt, llm_string)
+        self.memory.put(key, return_val)
+        self.store.put(key, dumps(list(return_val)).encode("utf-8"))
+        self._count("writes")
+
+    def clear(self, **kwargs: Any) -> None:
+        self.memory.clear()
+        self.store.clear()
+
+
+_default_caches = {}
+_default_lock = threading.Lock()
+
+
+def get_llm_cache(path: str = None) -> TieredLLMCache:
+    """Process-wide cache per path, shared by every HTPModel in the process."""
+    path = os.path.abspath(path or os.getenv("LLM_CACHE_PATH", "llm_cache.db"))
+    with _default_lock:
+        if path not in _default_caches:
+            _default_caches[path] = TieredLLMCache(path)
+        return _default_caches[path]
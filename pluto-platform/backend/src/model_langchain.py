@@ -1,41 +1,145 @@
-import base64
-from loguru import logger
-import os
+import asyncio
+import queue
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Optional
+import threading
+import time
+
+from loguru import logger
+from typing import AsyncIterator, Iterable, Iterator, List, Optional
 
-from langchain_community.cache import SQLiteCache
+from langchain_core.caches import BaseCache
 from langchain_core.globals import set_llm_cache
+from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 
+from src.dag import DAGExecutor, Stage, StageGraph
+from src.governor import LLMGovernor, get_governor
+from src.image_input import ImageInput
+from src.image_normalize import ImageNormalizer
+from src.llm_cache import get_llm_cache
+from src.prompts import PromptRegistry
+from src.resilience import StageRunner
+from src.result_cache import ResultCache, analysis_key
+from src.run_context import RunContext
+from src.signal_classifier import SignalClassifier
+from src.stage_cache import StageCache, stage_key
+
 # logger = logging.getLogger(__name__)
 # logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def is_base64_or_path(input_string):
-    # 移除可能的前缀（如 "data:image/jpeg;base64,"）
-    stripped_string = re.sub(r'^data:image/.+;base64,', '', input_string)
-    
-    # 检查是否是有效的文件路径
-    if os.path.exists(input_string):
-        return "path"
-    
-    # 检查是否可能是 base64
-    try:
-        # 尝试解码
-        base64.b64decode(stripped_string)
-        # 检查是否只包含 base64 字符
-        if re.match(r'^[A-Za-z0-9+/]+={0,2}$', stripped_string):
-            return "base64"
-    except:
-        pass
-    # 如果既不是有效路径也不是 base64，返回 "unknown"
-    return "unknown"
-
-def encode_image(image_path):
-  with open(image_path, "rb") as image_file:
-    return base64.b64encode(image_file.read()).decode('utf-8')
+STAGES = ["overall", "house", "tree", "person"]
+
+# rough token accounting for the governor: Gemini bills an image at a fixed size,
+# text at about four characters per token, plus an allowance for the reply
+IMAGE_TOKENS = 258
+CHARS_PER_TOKEN = 4
+OUTPUT_TOKEN_ALLOWANCE = 1024
+
+FEATURE_INPUT = "Organize the feature extraction results into a **clear and concise** markdown format."
+ANALYSIS_INPUT = "Please analyze the features based on professional knowledge and the image features provided by the assistant, and organize the results in markdown format."
+
+# merged image mode: feature extraction and analysis of one element in a single
+# multimodal call, so the image and both system prompts are sent only once
+COMBINED_HEADER = "You will complete two tasks on the same drawing in a single response."
+COMBINED_FORMAT = """Answer both tasks in exactly this structure and nothing else:
+<features>
+(task 1 result in markdown)
+</features>
+<analysis>
+(task 2 result in markdown, interpreting the features you listed in task 1)
+</analysis>"""
+COMBINED_INPUT = "Complete both tasks for this drawing and answer in the required structure."
+COMBINED_SECTION = re.compile(r"<(features|analysis)>\s*(.*?)\s*(?:</\1>|(?=<(?:features|analysis)>)|\Z)", re.DOTALL | re.IGNORECASE)
+
+def combined_system_prompt(feature_prompt: str, analysis_prompt: str) -> str:
+    # plain concatenation: the prompt texts are template strings themselves
+    return (
+        COMBINED_HEADER + "\n\nTASK 1 - FEATURE EXTRACTION\n" + feature_prompt
+        + "\n\nTASK 2 - PSYCHOLOGICAL ANALYSIS\n" + analysis_prompt
+        + "\n\n" + COMBINED_FORMAT
+    )
+
+def parse_combined(response) -> dict:
+    """Split a merged-mode reply into its feature and analysis sections."""
+    sections = {name.lower(): text for name, text in COMBINED_SECTION.findall(response.content)}
+    missing = [name for name in ("features", "analysis") if not sections.get(name)]
+    if missing:
+        raise ValueError(f"Combined response is missing the {missing} section(s).")
+    return {"feature": sections["features"], "analysis": sections["analysis"]}
+
+def image_template(system_prompt: str, user_text: str):
+    return ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        (
+            "user", 
+            [
+                {"type": "image_url", "image_url": {'url': 'data:{mime_type};base64,{image_data}'}},
+                {"type": "text", "text": user_text}
+            ]
+        )]
+    )
+
+def register_templates(registry: PromptRegistry):
+    """Compile every template used by HTPModel into `registry`."""
+    for stage in STAGES:
+        registry.register(
+            f"{stage}_feature", [f"{stage}_feature"],
+            lambda text: image_template(text, FEATURE_INPUT)
+        )
+        registry.register(
+            f"{stage}_analysis", [f"{stage}_analysis"],
+            lambda text: image_template(text, ANALYSIS_INPUT)
+        )
+        registry.register(
+            f"{stage}_combined", [f"{stage}_feature", f"{stage}_analysis"],
+            lambda feature_text, analysis_text: image_template(
+                combined_system_prompt(feature_text, analysis_text), COMBINED_INPUT
+            )
+        )
+    registry.register(
+        "merge", ["analysis_merge", "merge_format"],
+        lambda merge_prompt, merge_inputs: ChatPromptTemplate.from_messages([
+            ("system", merge_prompt),
+            (
+                "user",
+                [
+                    {"type": "text", "text": merge_inputs}
+                ]
+            )]
+        )
+    )
+    registry.register(
+        "final", ["final_result"],
+        lambda final_prompt: ChatPromptTemplate.from_messages([
+            ("system", final_prompt),
+            ("user", "Based on the analysis results: \n{merge_result}\n, write your professional HTP test report.")
+        ])
+    )
+    registry.register(
+        "signal", ["signal_judge"],
+        lambda signal_prompt: ChatPromptTemplate.from_messages([
+            ("system", signal_prompt),
+            ("user", "{final_result}")
+        ])
+    )
+    registry.register(
+        "classification", ["clf"],
+        lambda classification_prompt: ChatPromptTemplate.from_messages([
+            ("system", classification_prompt),
+            ("user", "{result}" + "{format_instructions}")
+        ])
+    )
+    registry.register(
+        "person_final_report", ["person_final_report"],
+        lambda final_report_prompt_text: ChatPromptTemplate.from_messages([
+            ("system", final_report_prompt_text),
+            (
+                "user",
+                "VISUAL FEATURES:\n{features}\n\nPSYCHOLOGICAL INTERPRETATIONS:\n{analysis}"
+            )
+        ])
+    )
 
 class ClfResult(BaseModel):
     """Classification result."""
@@ -54,305 +158,714 @@ Your well-being is paramount, and a trained expert can provide the support you m
 
 Remember, it's okay to ask for help. You're not alone in this. """
 
+CLF_PARSER = JsonOutputParser(pydantic_object=ClfResult)
+
+def parse_classification(result):
+    """True / False from the classifier's JSON, or None when the reply cannot be read as either."""
+    if type(result) == dict:
+        result = result.get("result")
+    if type(result) == str:
+        result = {"true": True, "false": False}.get(result.strip().lower())
+            
+    logger.info(f"result classification completed. Result: {result}")
+    if type(result) == bool:
+        return result
+    logger.warning("Could not parse the classification reply; leaving the result to human review.")
+    return None
+
+SIGNAL_CLASSIFIER = SignalClassifier()
+
+def local_classification(values: dict):
+    """Classify the signal text with local rules; None when ambiguous so the LLM decides."""
+    result = SIGNAL_CLASSIFIER(values["signal"])
+    if result is None:
+        return None
+    logger.info(f"result classification decided locally. Result: {result}")
+    return {"result": result, "source": "local"}
+
+def llm_classification(parsed):
+    result = parse_classification(parsed)
+    # "llm_unparsed": the model answered, but not with a readable true/false
+    return {"result": result, "source": "llm" if result is not None else "llm_unparsed"}
+
+def stage_analysis_stages(stage: str, merged: bool = False) -> List[Stage]:
+    """
+    Feature extraction and interpretation stages for one of overall/house/tree/person.
+    With `merged`, one multimodal `{stage}_combined` call produces both and the
+    `{stage}_feature` / `{stage}_analysis` stages just pick their section, so
+    downstream stages are unchanged.
+    """
+    if merged:
+        return [
+            Stage(
+                f"{stage}_combined", inputs=["image"], prompt=f"{stage}_combined", model="multimodal",
+                variables=lambda values: values["image"].template_inputs(), postprocess=parse_combined
+            ),
+            Stage(f"{stage}_feature", inputs=[f"{stage}_combined"], run=lambda values, stage=stage: values[f"{stage}_combined"]["feature"]),
+            Stage(f"{stage}_analysis", inputs=[f"{stage}_combined"], run=lambda values, stage=stage: values[f"{stage}_combined"]["analysis"]),
+        ]
+    return [
+        Stage(
+            f"{stage}_feature", inputs=["image"], prompt=f"{stage}_feature", model="multimodal",
+            variables=lambda values: values["image"].template_inputs()
+        ),
+        Stage(
+            f"{stage}_analysis", inputs=["image", f"{stage}_feature"], prompt=f"{stage}_analysis", model="text",
+            variables=lambda values, stage=stage: {
+                **values["image"].template_inputs(),
+                "FEATURES": values[f"{stage}_feature"]
+            }
+        ),
+    ]
+
+# The full HTP workflow: four stage analyses in parallel, then merge -> final -> signal -> classification
+def workflow_graph(merged: bool = False) -> StageGraph:
+    return StageGraph("workflow", [
+        *(s for stage in STAGES for s in stage_analysis_stages(stage, merged)),
+        Stage(
+            "merge", inputs=[f"{stage}_analysis" for stage in STAGES], prompt="merge", model="text",
+            variables=lambda values: {f"{stage}_analysis": values[f"{stage}_analysis"] for stage in STAGES}
+        ),
+        Stage(
+            "final", inputs=["merge"], prompt="final", model="text",
+            variables=lambda values: {"merge_result": values["merge"]}, stream=True
+        ),
+        Stage(
+            "signal", inputs=["final"], prompt="signal", model="text",
+            variables=lambda values: {"final_result": values["final"]}
+        ),
+        Stage(
+            "classification", inputs=["signal"], prompt="classification", model="multimodal",
+            variables=lambda values: {
+                "result": values["signal"],
+                "format_instructions": CLF_PARSER.get_format_instructions()
+            },
+            output_parser=CLF_PARSER, postprocess=llm_classification, local=local_classification
+        ),
+    ])
+
+# The PLUTO workflow: Person drawing only, followed by the person final report
+def pluto_graph(merged: bool = False) -> StageGraph:
+    return StageGraph("pluto", [
+        *stage_analysis_stages("person", merged),
+        Stage(
+            "person_final_report", inputs=["person_feature", "person_analysis"], prompt="person_final_report", model="text",
+            variables=lambda values: {
+                "features": values["person_feature"],
+                "analysis": values["person_analysis"]
+            }, stream=True
+        ),
+    ])
+
+WORKFLOW_GRAPH = workflow_graph()
+PLUTO_GRAPH = pluto_graph()
+MERGED_WORKFLOW_GRAPH = workflow_graph(merged=True)
+MERGED_PLUTO_GRAPH = pluto_graph(merged=True)
+
 class HTPModel(object):
-    def __init__(self, text_model, multimodal_model = None, language: str = "en", use_cache: bool = True):
+    """
+    HTP analysis pipeline. One instance can be shared by many concurrent
+    runs: all per-run state (language, token usage, stage timings) lives in
+    a RunContext that is created per workflow call and returned with the
+    result.
+    """
+    def __init__(self, text_model, multimodal_model = None, language: str = "en", use_cache: bool = True, result_cache: ResultCache = None, llm_cache: BaseCache = None, normalizer: ImageNormalizer = None, stage_cache: StageCache = None, governor: LLMGovernor = None, local_classification: bool = True, stage_runner: StageRunner = None, image_mode: str = "separate"):
         self.text_model = text_model
         self.multimodal_model = multimodal_model if multimodal_model else text_model
-        # set language
+        # set default language
         assert language == "en", "Language must be 'en'."
         self.language = language
         logger.info(f"HTPModel initialized with language: {language}")
+        # load and compile prompts once
+        self._prompt_registries = {}
+        self.load_prompts(language)
         # set cache
         if use_cache:
-            set_llm_cache(SQLiteCache("cache.db"))
+            set_llm_cache(llm_cache or get_llm_cache())
             logger.info("Cache enabled.")
-        # init token usage
-        self.usage = {
-            "total": 0,
-            "prompt": 0,
-            "completion": 0
-        }
+        # whole-analysis result cache, keyed by image hash, prompt versions and models
+        self.result_cache = result_cache
+        # optional pre-LLM image normalization (downscale, strip EXIF, grayscale)
+        self.normalizer = normalizer
+        # process-wide admission control (concurrency, rate limits, priority lanes)
+        self.governor = governor or get_governor()
+        # "separate": feature and analysis calls each send the image;
+        # "merged": one structured call per element sends it once
+        assert image_mode in ("separate", "merged"), "image_mode must be either 'separate' or 'merged'."
+        self.image_mode = image_mode
+        # per-stage deadlines, hedged requests past p95 and jittered retries
+        self.stage_runner = stage_runner or StageRunner()
+        # decide the signal classification with local rules when they are confident
+        self.local_classification = local_classification
+        # stage DAG executor shared by all workflows; the optional stage cache
+        # lets reruns recompute only stages whose prompt or inputs changed
+        self.stage_cache = stage_cache
+        self.executor = DAGExecutor(
+            self._invoke_stage, self._ainvoke_stage,
+            stage_cache=stage_cache, stage_key=self._stage_key
+        )
     
-    def refresh_usage(self):
-        self.usage = {
-            "total": 0,
-            "prompt": 0,
-            "completion": 0
-        }
+    def load_prompts(self, language: str) -> PromptRegistry:
+        if language not in self._prompt_registries:
+            registry = PromptRegistry(language)
+            register_templates(registry)
+            self._prompt_registries[language] = registry
+        return self._prompt_registries[language]
     
-    def update_usage(self, response):
-        """Update token usage from Gemini response metadata"""
-        if hasattr(response, 'usage_metadata') and response.usage_metadata:
-            self.usage["total"] += response.usage_metadata.get('input_tokens', 0) + response.usage_metadata.get('output_tokens', 0)
-            self.usage["prompt"] += response.usage_metadata.get('input_tokens', 0)
-            self.usage["completion"] += response.usage_metadata.get('output_tokens', 0)
-        
-    def get_prompt(self, stage: str):
-        assert stage in ["overall", "house", "tree", "person"], "Stage should be either 'overall', 'house', 'tree', or 'person'."
-
-        if stage == "overall":
-            feature_prompt = open(f"src/prompt/{self.language}/overall_feature.txt", "r", encoding="utf-8").read()
-            analysis_prompt = open(f"src/prompt/{self.language}/overall_analysis.txt", "r", encoding="utf-8").read()
-        elif stage == "house":
-            feature_prompt = open(f"src/prompt/{self.language}/house_feature.txt", "r", encoding="utf-8").read()
-            analysis_prompt = open(f"src/prompt/{self.language}/house_analysis.txt", "r", encoding="utf-8").read()
-        elif stage == "tree":
-            feature_prompt = open(f"src/prompt/{self.language}/tree_feature.txt", "r", encoding="utf-8").read()
-            analysis_prompt = open(f"src/prompt/{self.language}/tree_analysis.txt", "r", encoding="utf-8").read()
-        elif stage == "person":
-            feature_prompt = open(f"src/prompt/{self.language}/person_feature.txt", "r", encoding="utf-8").read()
-            analysis_prompt = open(f"src/prompt/{self.language}/person_analysis.txt", "r", encoding="utf-8").read()
-            
-        return feature_prompt, analysis_prompt
+    @property
+    def prompts(self) -> PromptRegistry:
+        """Prompt registry for the default language."""
+        return self.load_prompts(self.language)
+    
+    def prompt_versions(self, language: str = None) -> dict:
+        """Content hash of every prompt file, usable as a cache key."""
+        return self.load_prompts(language or self.language).versions()
+    
+    def new_context(self, language: str = None, workflow: str = None, priority: str = "interactive") -> RunContext:
+        language = language or self.language
+        assert language == "en", "Language must be 'en'."
+        return RunContext(language=language, workflow=workflow, priority=priority)
     
-    def basic_analysis(self, image_path: str, stage: str):
-        feature_prompt, analysis_prompt = self.get_prompt(stage)
+    @staticmethod
+    def _model_name(model) -> str:
+        return str(getattr(model, "model", None) or getattr(model, "model_name", None) or type(model).__name__)
+    
+    def model_names(self) -> list:
+        return [self._model_name(self.text_model), self._model_name(self.multimodal_model)]
+    
+    def _stage_model(self, stage: Stage):
+        return self.multimodal_model if stage.model == "multimodal" else self.text_model
+    
+    def classifier_mode(self) -> str:
+        """"llm", or "local:<rules hash>" when local rules decide confident classifications."""
+        return f"local:{SIGNAL_CLASSIFIER.version}" if self.local_classification else "llm"
+    
+    def _stage_key(self, stage: Stage, values: dict, context: RunContext) -> str:
+        prompt_version = self.load_prompts(context.language).template_version(stage.prompt)
+        variant = self.classifier_mode() if stage.local is not None else None
+        return stage_key(stage.name, prompt_version, self._model_name(self._stage_model(stage)), values, variant)
+    
+    def _result_key(self, workflow: str, image: ImageInput, context: RunContext) -> str:
+        if self.image_mode != "separate":
+            workflow = f"{workflow}:{self.image_mode}"
+        workflow = f"{workflow}:{self.classifier_mode()}"
+        return analysis_key(workflow, image.digest, self.prompt_versions(context.language), self.model_names())
+    
+    def _cached_result(self, key: str, context: RunContext):
+        if self.result_cache is None:
+            return None
+        results = self.result_cache.get(key)
+        if results is not None:
+            logger.info("Analysis result served from cache.")
+            results["usage"] = context.usage
+            results["timings"] = context.timings
+            results["run_id"] = context.run_id
+        return results
+    
+    def _store_result(self, key: str, results: dict):
+        if self.result_cache is not None:
+            self.result_cache.put(key, results)
         
-        feature_input = "Organize the feature extraction results into a **clear and concise** markdown format."
-        analysis_input = "Please analyze the features based on professional knowledge and the image features provided by the assistant, and organize the results in markdown format."
-            
-        # 判断输入是 base64 还是路径
-        if is_base64_or_path(image_path) == "path":
-            image_data = encode_image(image_path)
-        elif is_base64_or_path(image_path) == "base64":
-            image_data = image_path
+    def get_prompt(self, stage: str, language: str = None):
+        assert stage in STAGES, "Stage should be either 'overall', 'house', 'tree', or 'person'."
+        prompts = self.load_prompts(language or self.language)
+        return prompts.text(f"{stage}_feature"), prompts.text(f"{stage}_analysis")
+    
+    def _resolve_image(self, image_path) -> ImageInput:
+        """Classify and decode a path, raw bytes or base64 / data-URI input exactly once."""
+        image = ImageInput.resolve(image_path)
+        if self.normalizer is not None:
+            image = self.normalizer(image)
+        return image
+    
+    def _stage_chain(self, stage: Stage, context: RunContext):
+        chain = self.load_prompts(context.language).template(stage.prompt) | self._stage_model(stage)
+        if stage.output_parser is not None:
+            chain = chain | stage.output_parser
+        return chain
+    
+    def _estimate_tokens(self, stage: Stage, variables: dict, context: RunContext) -> int:
+        prompts = self.load_prompts(context.language)
+        chars = sum(len(prompts.text(name)) for name in prompts.sources(stage.prompt))
+        tokens = OUTPUT_TOKEN_ALLOWANCE
+        for name, value in variables.items():
+            if name == "image_data":
+                tokens += IMAGE_TOKENS
+            elif isinstance(value, str):
+                chars += len(value)
+        return tokens + chars // CHARS_PER_TOKEN
+    
+    @staticmethod
+    def _used_tokens(response):
+        usage_metadata = getattr(response, "usage_metadata", None)
+        if not usage_metadata:
+            return None
+        return usage_metadata.get('input_tokens', 0) + usage_metadata.get('output_tokens', 0)
+    
+    def _local_output(self, stage: Stage, values: dict):
+        if stage.local is None or not self.local_classification:
+            return None
+        return stage.local(values)
+    
+    @staticmethod
+    def _streams(stage: Stage, context: RunContext) -> bool:
+        return stage.stream and context.on_token is not None
+    
+    @staticmethod
+    def _stream_chain(stage: Stage, chain, variables: dict, context: RunContext):
+        """Consume `chain.stream`, forwarding each chunk, and return the aggregated message."""
+        response = None
+        for chunk in chain.stream(variables):
+            if chunk.content:
+                context.on_token(stage.name, chunk.content)
+            response = chunk if response is None else response + chunk
+        return response
+    
+    @staticmethod
+    async def _astream_chain(stage: Stage, chain, variables: dict, context: RunContext):
+        response = None
+        async for chunk in chain.astream(variables):
+            if chunk.content:
+                context.on_token(stage.name, chunk.content)
+            response = chunk if response is None else response + chunk
+        return response
+    
+    def _invoke_stage(self, stage: Stage, values: dict, context: RunContext = None):
+        context = context or self.new_context()
+        output = self._local_output(stage, values)
+        if output is not None:
+            return output
+        logger.info(f"{stage.name} started.")
+        chain = self._stage_chain(stage, context)
+        variables = stage.variables(values)
+        streams = self._streams(stage, context)
+        if streams:
+            call = lambda: self._stream_chain(stage, chain, variables, context)
         else:
-            raise ValueError("Invalid image path or base64 string.")
-        
-        feature_prompt = ChatPromptTemplate.from_messages([
-            ("system", feature_prompt),
-            (
-                "user", 
-                [
-                    {"type": "image_url", "image_url": {'url': 'data:image/jpeg;base64,{image_data}'}},
-                    {"type": "text", "text": feature_input}
-                ]
-            )]
-        )
-        analysis_prompt = ChatPromptTemplate.from_messages([
-            ("system", analysis_prompt),
-            (
-                "user",
-                [
-                    {"type": "image_url", "image_url": {'url': 'data:image/jpeg;base64,{image_data}'}},
-                    {"type": "text", "text": analysis_input}
-                ]
-            )]
-        )
-        logger.info(f"{stage} analysis started.")
-        chain = feature_prompt | self.multimodal_model
-        feature_response = chain.invoke({
-            "image_data": image_data
-        })
-        feature_result = feature_response.content
-        self.update_usage(feature_response)
-        
-        chain = analysis_prompt | self.text_model
-        analysis_response = chain.invoke({
-            "image_data": image_data,
-            "FEATURES": feature_result
-        })
-        analysis_result = analysis_response.content
-        self.update_usage(analysis_response)
-            
-        logger.info(f"{stage} analysis completed.")
-        
+            call = lambda: chain.invoke(variables)
+        # every call (hedged duplicates and retries too) takes its own governor slot and token budget
+        tokens = self._estimate_tokens(stage, variables, context)
+        admit = lambda run: self.governor.call(run, priority=context.priority, tokens=tokens, measure=self._used_tokens)
+        # streamed stages are never hedged: a duplicate would emit its tokens twice
+        attempt = lambda: self.stage_runner.execute(stage.name, call, hedge=not streams, admit=admit)
+        response = self.stage_runner.retry(stage.name, attempt)
+        context.update_usage(response)
+        logger.info(f"{stage.name} completed.")
+        return stage.postprocess(response)
+    
+    async def _ainvoke_stage(self, stage: Stage, values: dict, context: RunContext = None):
+        context = context or self.new_context()
+        output = self._local_output(stage, values)
+        if output is not None:
+            return output
+        logger.info(f"{stage.name} started.")
+        chain = self._stage_chain(stage, context)
+        variables = stage.variables(values)
+        streams = self._streams(stage, context)
+        if streams:
+            call = lambda: self._astream_chain(stage, chain, variables, context)
+        else:
+            call = lambda: chain.ainvoke(variables)
+        tokens = self._estimate_tokens(stage, variables, context)
+        admit = lambda run: self.governor.acall(run, priority=context.priority, tokens=tokens, measure=self._used_tokens)
+        attempt = lambda: self.stage_runner.aexecute(stage.name, call, hedge=not streams, admit=admit)
+        response = await self.stage_runner.aretry(stage.name, attempt)
+        context.update_usage(response)
+        logger.info(f"{stage.name} completed.")
+        return stage.postprocess(response)
+    
+    def basic_analysis(self, image_path, stage: str, context: RunContext = None):
+        assert stage in STAGES, "Stage should be either 'overall', 'house', 'tree', or 'person'."
+        context = context or self.new_context()
+        image = self._resolve_image(image_path)
+        if self.image_mode == "merged":
+            combined = self._invoke_stage(MERGED_WORKFLOW_GRAPH[f"{stage}_combined"], {"image": image}, context)
+            return combined["feature"], combined["analysis"]
+        feature_result = self._invoke_stage(WORKFLOW_GRAPH[f"{stage}_feature"], {"image": image}, context)
+        analysis_result = self._invoke_stage(WORKFLOW_GRAPH[f"{stage}_analysis"], {
+            "image": image,
+            f"{stage}_feature": feature_result
+        }, context)
         return feature_result, analysis_result
     
-    def merge_analysis(self, results: dict):
-        logger.info("merge analysis started.")
-        merge_prompt = open(f"src/prompt/{self.language}/analysis_merge.txt", "r", encoding="utf-8").read()
-        merge_inputs = open(f"src/prompt/{self.language}/merge_format.txt", "r", encoding="utf-8").read()
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", merge_prompt),
-            (
-                "user",
-                [
-                    {"type": "text", "text": merge_inputs}
-                ]
-            )]
-        )
-        chain = prompt | self.text_model
-        response = chain.invoke({
-            "overall_analysis": results["overall"]["analysis"],
-            "house_analysis": results["house"]["analysis"],
-            "tree_analysis": results["tree"]["analysis"],
-            "person_analysis": results["person"]["analysis"]
-        })
-        result = response.content
-        self.update_usage(response)
-        
-        logger.info("merge analysis completed.")
-        return result
+    async def abasic_analysis(self, image_path, stage: str, context: RunContext = None):
+        """Async counterpart of `basic_analysis` built on `ainvoke`."""
+        assert stage in STAGES, "Stage should be either 'overall', 'house', 'tree', or 'person'."
+        context = context or self.new_context()
+        image = self._resolve_image(image_path)
+        if self.image_mode == "merged":
+            combined = await self._ainvoke_stage(MERGED_WORKFLOW_GRAPH[f"{stage}_combined"], {"image": image}, context)
+            return combined["feature"], combined["analysis"]
+        feature_result = await self._ainvoke_stage(WORKFLOW_GRAPH[f"{stage}_feature"], {"image": image}, context)
+        analysis_result = await self._ainvoke_stage(WORKFLOW_GRAPH[f"{stage}_analysis"], {
+            "image": image,
+            f"{stage}_feature": feature_result
+        }, context)
+        return feature_result, analysis_result
     
-    def final_analysis(self, results: dict):
-        logger.info("final analysis started.")
-        final_prompt = open(f"src/prompt/{self.language}/final_result.txt", "r", encoding="utf-8").read()
-        
-        inputs = "Based on the analysis results: \n{merge_result}\n, write your professional HTP test report."
-            
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", final_prompt),
-            ("user", inputs)
-        ])
-        
-        chain = prompt | self.text_model
-        response = chain.invoke({
-            "merge_result": results["merge"]
-        })
-        result = response.content
-        self.update_usage(response)
-        
-        logger.info("final analysis completed.")
-        return result
+    def _merge_inputs(self, results: dict):
+        return {f"{stage}_analysis": results[stage]["analysis"] for stage in STAGES}
     
-    def signal_analysis(self, results: dict):
-        logger.info("signal analysis started.")
-        signal_prompt = open(f"src/prompt/{self.language}/signal_judge.txt", "r", encoding="utf-8").read()
-        inputs = "{final_result}"
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", signal_prompt),
-            ("user", inputs)
-        ])
-        
-        chain = prompt | self.text_model
-        response = chain.invoke({
-            "final_result": results["final"]
-        })
-        result = response.content
-        self.update_usage(response)
-        
-        logger.info("signal analysis completed.")
-        return result
+    def merge_analysis(self, results: dict, context: RunContext = None):
+        return self._invoke_stage(WORKFLOW_GRAPH["merge"], self._merge_inputs(results), context)
     
-    def result_classification(self, results: dict):
-        logger.info("result classification started.")
-        classification_prompt = open(f"src/prompt/{self.language}/clf.txt", "r", encoding="utf-8").read()
-        inputs = "{result}"
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", classification_prompt),
-            ("user", inputs + "{format_instructions}")
-        ])
-        # chain = prompt | self.multimodal_model.with_structured_output(ClfResult)
-        from langchain_core.output_parsers import JsonOutputParser
-        
-        parse = JsonOutputParser(pydantic_object=ClfResult)
-        chain = prompt | self.multimodal_model | parse
-        response = chain.invoke({
-            "result": results["signal"],
-            "format_instructions": parse.get_format_instructions()
-        })
-        result = response
-        
-        if type(result) == dict:
-            result = result["result"]
-        if type(result) == str:
-            if result == "true":
-                result = True
-            elif result == "false":
-                result = False
-                
-        logger.info(f"result classification completed. Result: {result}")
-        if type(result) == bool:
-            return result
-        else:
-            return True
+    async def amerge_analysis(self, results: dict, context: RunContext = None):
+        return await self._ainvoke_stage(WORKFLOW_GRAPH["merge"], self._merge_inputs(results), context)
+    
+    def final_analysis(self, results: dict, context: RunContext = None):
+        return self._invoke_stage(WORKFLOW_GRAPH["final"], {"merge": results["merge"]}, context)
+    
+    async def afinal_analysis(self, results: dict, context: RunContext = None):
+        return await self._ainvoke_stage(WORKFLOW_GRAPH["final"], {"merge": results["merge"]}, context)
+    
+    def signal_analysis(self, results: dict, context: RunContext = None):
+        return self._invoke_stage(WORKFLOW_GRAPH["signal"], {"final": results["final"]}, context)
+    
+    async def asignal_analysis(self, results: dict, context: RunContext = None):
+        return await self._ainvoke_stage(WORKFLOW_GRAPH["signal"], {"final": results["final"]}, context)
+    
+    def result_classification(self, results: dict, context: RunContext = None):
+        return self._invoke_stage(WORKFLOW_GRAPH["classification"], {"signal": results["signal"]}, context)["result"]
+    
+    async def aresult_classification(self, results: dict, context: RunContext = None):
+        output = await self._ainvoke_stage(WORKFLOW_GRAPH["classification"], {"signal": results["signal"]}, context)
+        return output["result"]
         
-    def person_final_report(self, person_features: str, person_analysis: str):
+    def person_final_report(self, person_features: str, person_analysis: str, context: RunContext = None):
         """Generates the final, formatted report for the Person drawing."""
-        logger.info("Generating final Person report.")
-        final_report_prompt_text = open(f"src/prompt/{self.language}/person_final_report.txt", "r", encoding="utf-8").read()
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", final_report_prompt_text),
-            (
-                "user",
-                "VISUAL FEATURES:\n{features}\n\nPSYCHOLOGICAL INTERPRETATIONS:\n{analysis}"
-            )
-        ])
-        
-        chain = prompt | self.text_model
-        response = chain.invoke({
-            "features": person_features,
-            "analysis": person_analysis
-        })
-        result = response.content
-        self.update_usage(response)
-        
-        logger.info("Final Person report generated.")
-        return result
-
-    def pluto_workflow(self, image_path: str, language: str = "en"):
-        """
-        A streamlined workflow for the PLUTO project that analyzes ONLY the Person drawing.
-        It returns a structured report with blank fields for House and Tree.
-        """
-        self.refresh_usage()
-        self.language = language
-
-        # 1. Analyze only the Person drawing (Feature Extraction and Interpretation)
-        logger.info("Starting PLUTO workflow for Person analysis.")
-        person_features, person_analysis = self.basic_analysis(image_path, "person")
-
-        # 2. Generate the final, formatted report using the new prompt
-        final_report_content = self.person_final_report(person_features, person_analysis)
-
-        # 3. Assemble the final output object in the desired format
+        return self._invoke_stage(PLUTO_GRAPH["person_final_report"], {
+            "person_feature": person_features,
+            "person_analysis": person_analysis
+        }, context)
+    
+    async def aperson_final_report(self, person_features: str, person_analysis: str, context: RunContext = None):
+        """Async counterpart of `person_final_report`."""
+        return await self._ainvoke_stage(PLUTO_GRAPH["person_final_report"], {
+            "person_feature": person_features,
+            "person_analysis": person_analysis
+        }, context)
+    
+    def _pluto_results(self, outputs: dict, context: RunContext):
+        # Assemble the final output object in the desired format
         # This keeps the output structure consistent with the original, but with blank data.
         blank_analysis = {"feature": "Not analyzed.", "analysis": "Not applicable."}
         
-        results = {
+        return {
             "overall": blank_analysis,
             "house": blank_analysis,
             "tree": blank_analysis,
             "person": {
-                "feature": person_features,
-                "analysis": person_analysis
+                "feature": outputs.get("person_feature"),
+                "analysis": outputs.get("person_analysis")
             },
             "merge": "Not applicable for Person-only analysis.",
-            "final": final_report_content, # This is your main output!
+            "final": outputs.get("person_final_report"), # This is your main output!
             "signal": "Please review the final report for a qualitative summary.",
             "classification": None, # Classification is not performed in this simplified flow
+            "classification_source": None,
             "fix_signal": None,
-            "usage": self.usage
+            "usage": context.usage,
+            "timings": context.timings,
+            "run_id": context.run_id
+        }
+    
+    def _workflow_results(self, outputs: dict, context: RunContext):
+        results = {
+            stage: {
+                "feature": outputs.get(f"{stage}_feature"),
+                "analysis": outputs.get(f"{stage}_analysis")
+            } for stage in STAGES
         }
+        results["usage"] = context.usage
+        results["merge"] = outputs.get("merge")
+        results["final"] = outputs.get("final")
+        results["signal"] = outputs.get("signal")
+        classification = outputs.get("classification", {"result": None, "source": None})
+        if not isinstance(classification, dict):
+            # stage cache entries written before the local fast path hold a bare bool
+            classification = {"result": classification, "source": "llm"}
+        results["classification"] = classification["result"]
+        # "local" when the rule-based classifier decided, "llm" when the model was asked,
+        # "llm_unparsed" (with a None result) when its reply could not be parsed
+        results["classification_source"] = classification["source"]
+        if results["classification"] == False:
+            results["fix_signal"] = FIX_SIGNAL
+        else:
+            results["fix_signal"] = None
+        results["timings"] = context.timings
+        results["run_id"] = context.run_id
+        return results
+
+    def _start(self, workflow: str, image_path, language: str, context: RunContext = None):
+        context = context or self.new_context(language, workflow)
+        context.workflow = context.workflow or workflow
+        image = self._resolve_image(image_path)
+        key = self._result_key(workflow, image, context)
+        return context, image, key, self._cached_result(key, context)
+
+    def _graph(self, workflow: str):
+        assert workflow in ("pluto", "workflow"), "Workflow must be either 'pluto' or 'workflow'."
+        merged = self.image_mode == "merged"
+        if workflow == "pluto":
+            return (MERGED_PLUTO_GRAPH if merged else PLUTO_GRAPH), self._pluto_results
+        return (MERGED_WORKFLOW_GRAPH if merged else WORKFLOW_GRAPH), self._workflow_results
+    
+    def _finish_run(self, workflow: str, run, key: str, context: RunContext):
+        """
+        Build the workflow result. Stages that failed after their retries, and
+        the stages depending on them, are listed under `missing` (stage ->
+        reason) and their fields are None. Only complete results are cached;
+        a run without a single successful stage raises the first error.
+        """
+        graph, build_results = self._graph(workflow)
+        if run.errors and all(name in run.missing for name in graph.stages):
+            raise next(iter(run.errors.values()))
+        results = build_results(run.outputs, context)
+        results["missing"] = run.missing
+        if run.complete:
+            self._store_result(key, results)
+        else:
+            logger.warning(f"{workflow} run {context.run_id} finished with missing stages: {list(run.missing)}")
+        return results
+    
+    def _run(self, workflow: str, image: ImageInput, key: str, context: RunContext, on_stage=None, on_error=None):
+        graph, _ = self._graph(workflow)
+        run = self.executor.run(graph, {"image": image}, context, on_stage=on_stage, partial=True, on_error=on_error)
+        return self._finish_run(workflow, run, key, context)
+    
+    async def _arun(self, workflow: str, image: ImageInput, key: str, context: RunContext, on_stage=None, on_error=None):
+        graph, _ = self._graph(workflow)
+        run = await self.executor.arun(graph, {"image": image}, context, on_stage=on_stage, partial=True, on_error=on_error)
+        return self._finish_run(workflow, run, key, context)
+
+    def pluto_workflow(self, image_path, language: str = "en", context: RunContext = None):
+        """
+        A streamlined workflow for the PLUTO project that analyzes ONLY the Person drawing.
+        It returns a structured report with blank fields for House and Tree.
+        """
+        context, image, key, cached = self._start("pluto", image_path, language, context)
+        if cached is not None:
+            return cached
+
+        logger.info("Starting PLUTO workflow for Person analysis.")
+        results = self._run("pluto", image, key, context)
+        
+        logger.info("PLUTO workflow completed.")
+        return results
+    
+    async def apluto_workflow(self, image_path, language: str = "en", context: RunContext = None):
+        """Async counterpart of `pluto_workflow`, awaitable from an event loop."""
+        context, image, key, cached = self._start("pluto", image_path, language, context)
+        if cached is not None:
+            return cached
+
+        logger.info("Starting PLUTO workflow for Person analysis.")
+        results = await self._arun("pluto", image, key, context)
         
         logger.info("PLUTO workflow completed.")
         return results
 
     # Keep the original workflow method in case you need it, but your project will call pluto_workflow
-    def workflow(self, image_path: str, language: str = "en"):
-        self.refresh_usage()
-        # update language
-        self.language = language
+    def workflow(self, image_path, language: str = "en", context: RunContext = None):
+        context, image, key, cached = self._start("workflow", image_path, language, context)
+        if cached is not None:
+            return cached
         
-        with ThreadPoolExecutor(max_workers = 4) as executor:
-            futures = {
-                executor.submit(self.basic_analysis, image_path, stage): stage for stage in ["overall", "house", "tree", "person"]
-            }
+        results = self._run("workflow", image, key, context)
             
-            results = {}
-            for future in as_completed(futures):
-                stage = futures[future]
-                feature_result, analysis_result = future.result()
-                results[stage] = {
-                    "feature": feature_result,
-                    "analysis": analysis_result
-                }
-            results["usage"] = self.usage
+        logger.info("HTP analysis workflow completed.")
+        return results
+    
+    async def aworkflow(self, image_path, language: str = "en", context: RunContext = None):
+        """
+        Async counterpart of `workflow`. Every stage whose inputs are ready runs
+        concurrently on the calling event loop instead of a thread pool.
+        """
+        context, image, key, cached = self._start("workflow", image_path, language, context)
+        if cached is not None:
+            return cached
         
-        results["merge"] = self.merge_analysis(results)
-        results["final"] = self.final_analysis(results)
-        results["signal"] = self.signal_analysis(results)
-        results["classification"] = self.result_classification(results)
-        if results["classification"] == False:
-            results["fix_signal"] = FIX_SIGNAL
-        else:
-            results["fix_signal"] = None
+        results = await self._arun("workflow", image, key, context)
             
         logger.info("HTP analysis workflow completed.")
-        
-        return results
\ No newline at end of file
+        return results
+    
+    @staticmethod
+    def _stage_event(name: str, output, seconds: float, cached: bool) -> dict:
+        return {"event": "stage", "stage": name, "output": output, "seconds": round(seconds, 3), "cached": cached}
+    
+    @staticmethod
+    def _stage_error_event(name: str, error: Exception) -> dict:
+        return {"event": "stage_error", "stage": name, "detail": str(error)}
+    
+    def stream_workflow(self, image_path, workflow: str = "pluto", language: str = "en",
+                        context: RunContext = None) -> Iterator[dict]:
+        """
+        Generator form of `pluto_workflow` / `workflow`. Yields events as they
+        are produced:
+
+        - {"event": "start", "run_id", "workflow"}
+        - {"event": "stage", "stage", "output", "seconds", "cached"} per finished stage
+        - {"event": "token", "stage", "text"} for chunks of the final report
+        - {"event": "stage_error", "stage", "detail"} per stage that failed after its retries
+        - {"event": "result", "result", "cached"} with the same dict the workflow returns
+        """
+        context, image, key, cached = self._start(workflow, image_path, language, context)
+        yield {"event": "start", "run_id": context.run_id, "workflow": workflow}
+        if cached is not None:
+            yield {"event": "result", "result": cached, "cached": True}
+            return
+
+        events = queue.Queue()
+        done = object()
+        outcome = {}
+        context.on_token = lambda stage, text: events.put({"event": "token", "stage": stage, "text": text})
+
+        def on_stage(name, output, seconds, hit):
+            events.put(self._stage_event(name, output, seconds, hit))
+
+        def on_error(name, error):
+            events.put(self._stage_error_event(name, error))
+
+        def run():
+            try:
+                outcome["result"] = self._run(workflow, image, key, context, on_stage=on_stage, on_error=on_error)
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                events.put(done)
+
+        threading.Thread(target=run, name=f"stream-{context.run_id[:8]}", daemon=True).start()
+        while True:
+            event = events.get()
+            if event is done:
+                break
+            yield event
+        if "error" in outcome:
+            raise outcome["error"]
+        yield {"event": "result", "result": outcome["result"], "cached": False}
+    
+    async def astream_workflow(self, image_path, workflow: str = "pluto", language: str = "en",
+                               context: RunContext = None) -> AsyncIterator[dict]:
+        """Async-iterator counterpart of `stream_workflow`, yielding the same events."""
+        context, image, key, cached = self._start(workflow, image_path, language, context)
+        yield {"event": "start", "run_id": context.run_id, "workflow": workflow}
+        if cached is not None:
+            yield {"event": "result", "result": cached, "cached": True}
+            return
+
+        events = asyncio.Queue()
+        context.on_token = lambda stage, text: events.put_nowait({"event": "token", "stage": stage, "text": text})
+
+        def on_stage(name, output, seconds, hit):
+            events.put_nowait(self._stage_event(name, output, seconds, hit))
+
+        def on_error(name, error):
+            events.put_nowait(self._stage_error_event(name, error))
+
+        task = asyncio.ensure_future(self._arun(workflow, image, key, context, on_stage=on_stage, on_error=on_error))
+        task.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+            yield {"event": "result", "result": task.result(), "cached": False}
+        finally:
+            # the consumer went away (client disconnect): stop the remaining stages
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+    
+    async def abatch_workflow(self, images: Iterable, max_concurrency: int = 4, workflow: str = "workflow",
+                              language: str = "en", priority: str = "backfill") -> AsyncIterator[dict]:
+        """
+        Run many drawings through `workflow` ("workflow" or "pluto") with at
+        most `max_concurrency` in flight, yielding one item per image in
+        completion order:
+
+            {"index", "success", "result", "error", "seconds"}
+
+        `index` is the position in `images`, which is consumed lazily. A
+        failing image yields an item with its error instead of stopping the
+        batch. Stage-level LLM calls of all items share the governor.
+        """
+        assert max_concurrency > 0, "max_concurrency must be positive."
+        self._graph(workflow)
+        run = self.apluto_workflow if workflow == "pluto" else self.aworkflow
+
+        async def one(index, image):
+            start = time.perf_counter()
+            context = self.new_context(language, workflow, priority)
+            try:
+                result = await run(image_path=image, language=language, context=context)
+                return {"index": index, "success": True, "result": result, "error": None,
+                        "seconds": time.perf_counter() - start}
+            except Exception as e:
+                logger.error(f"Batch item {index} failed: {e}")
+                return {"index": index, "success": False, "result": None, "error": str(e),
+                        "seconds": time.perf_counter() - start}
+
+        pending = set()
+        try:
+            for index, image in enumerate(images):
+                pending.add(asyncio.ensure_future(one(index, image)))
+                if len(pending) < max_concurrency:
+                    continue
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+    
+    def batch_workflow(self, images: Iterable, max_concurrency: int = 4, workflow: str = "workflow",
+                       language: str = "en", priority: str = "backfill") -> Iterator[dict]:
+        """
+        Blocking generator form of `abatch_workflow` for synchronous callers
+        such as Streamlit. The batch runs on an event loop in a background
+        thread; closing the generator early cancels the remaining items.
+        """
+        items = queue.Queue()
+        done = object()
+        state = {}
+
+        async def produce():
+            async for item in self.abatch_workflow(images, max_concurrency, workflow, language, priority):
+                items.put(item)
+
+        def run():
+            loop = asyncio.new_event_loop()
+            task = loop.create_task(produce())
+            state["loop"], state["task"] = loop, task
+            try:
+                loop.run_until_complete(task)
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                state["error"] = e
+            finally:
+                loop.run_until_complete(loop.shutdown_asyncgens())
+                loop.close()
+                items.put(done)
+
+        thread = threading.Thread(target=run, name="htp-batch", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = items.get()
+                if item is done:
+                    break
+                yield item
+            if "error" in state:
+                raise state["error"]
+        finally:
+            if thread.is_alive() and "task" in state:
+                state["loop"].call_soon_threadsafe(state["task"].cancel)
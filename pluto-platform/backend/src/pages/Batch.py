@@ -1,17 +1,17 @@
-import base64
 import os
-import shutil
-import tempfile
 import time
-import zipfile
-from io import BytesIO
 
 import streamlit as st
-from docx import Document
 from langchain_google_genai import ChatGoogleGenerativeAI
-from PIL import Image
 
+from src.batch_manifest import BatchManifest, image_digest, outcome
+from src.batch_report import ZipReportWriter
 from src.model_langchain import HTPModel
+from src.resilience import DEFAULT_STAGE_TIMEOUT
+
+# results are written to a folder instead of served with st.download_button,
+# which holds the whole archive in memory
+BATCH_OUTPUT_DIR = os.getenv("BATCH_OUTPUT_DIR", "batch_results")
 
 SUPPORTED_LANGUAGES = {
     "English": "en"
@@ -28,13 +28,16 @@ LANGUAGES = {
         "images_found": "{} image files found. Ready for batch analysis.",
         "start_batch_analysis": "Start Batch Analysis",
         "batch_results_summary": "Batch Analysis Results Summary",
-        "download_batch_results": "Download Batch Results",
         "enter_valid_folder": "Please upload images.",
         "error_no_api_key": "❌ Please enter your API key in the sidebar before starting the analysis.",
         "batch_instructions_title": "📋 Batch Analysis Instructions",
         "upload_images": "Upload Images for Batch Analysis",
         "images_uploaded": "{} images uploaded successfully.",
         "upload_images_prompt": "Please upload images to start batch analysis.",
+        "concurrency_label": "Drawings analyzed in parallel:",
+        "batch_resuming": "{} of {} images were already analyzed in an earlier run and will not be sent again.",
+        "output_dir_label": "Save results to folder:",
+        "error_no_output_dir": "❌ Please enter the folder to save the results to in the sidebar.",
     "batch_instructions": """
     **Please read the following instructions carefully before proceeding with batch analysis:**
 
@@ -58,14 +61,14 @@ LANGUAGES = {
        - After uploading your images, click on the 'Start Batch Analysis' button to begin the process.
     
     7. **Results**: 
-       - Once the analysis is complete, use the 'Download Batch Results' button to save the full analysis results as a zip file.
+       - Enter the folder to save the results to in the sidebar. Once the analysis is complete, the full analysis results are saved there as a zip file.
        - The zip file will contain individual reports for each image and a summary of any failed analyses.
 
     **Note**: This tool is for reference only and cannot replace professional psychological evaluation. If you have concerns, please consult a qualified mental health professional.
     """,
     "welcome": "Welcome to the Batch Analysis Page",
-    "batch_results": "Batch Analysis Finished, Please download the results. Successful: {} | Failed: {}",
-    "download_batch_results": "Download Batch Results (ZIP)",
+    "batch_results": "Batch Analysis Finished. Successful: {} | Failed: {}",
+    "batch_results_saved": "Results saved to {}",
     "ai_disclaimer": "NOTE: AI-generated content, for reference only. Not a substitute for medical diagnosis.",
     }
 }
@@ -74,62 +77,14 @@ def get_text(key):
     """Get text from language dictionary based on session state language_code."""
     return LANGUAGES[st.session_state['language_code']][key]
 
-@st.cache_data
-def get_uploaded_files():
-    return []
-
-def pil_to_base64(image: Image.Image, format: str = "JPEG") -> str:
-    """Convert PIL image to base64 string."""
-    buffered = BytesIO()
-    image.save(buffered, format=format)
-    return base64.b64encode(buffered.getvalue()).decode('utf-8')
+def new_results_path():
+    """Fresh ZIP path for this run in the chosen output folder; earlier runs' archives are kept."""
+    output_dir = os.path.abspath(os.path.expanduser(st.session_state.batch_output_dir))
+    os.makedirs(output_dir, exist_ok=True)
+    return os.path.join(output_dir, time.strftime("batch_analysis_results_%Y%m%d_%H%M%S.zip"))
 
-def save_results(results):
-    """Save analysis results to a ZIP file."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        result_folder = os.path.join(temp_dir, "results")
-        os.makedirs(result_folder, exist_ok=True)
-        
-        for result in results:
-            file_name_without_ext = os.path.splitext(result['file_name'])[0]
-            doc = Document()
-            doc.add_heading(f"Analysis Report: {result['file_name']}", 0)
-            if result['success']:
-                doc.add_paragraph(get_text("ai_disclaimer"))
-                if result['analysis_result']['classification'] is True:
-                    signal = result['analysis_result']['signal']
-                    final = result['analysis_result']['final']
-                    doc.add_paragraph(signal)
-                    doc.add_paragraph(final)
-                else:
-                    signal = result['analysis_result']['fix_signal']
-                    doc.add_paragraph(signal)
-            else:
-                doc.add_paragraph("failed")
-            doc_path = os.path.join(result_folder, f"{file_name_without_ext}.docx")
-            doc.save(doc_path)
-        
-        failed_path = os.path.join(temp_dir, "failed.txt")
-        with open(failed_path, "w") as f:
-            for result in results:
-                if not result['success']:
-                    f.write(f"{result['file_name']}\n")
-                    
-        zip_path = os.path.join(temp_dir, "results.zip")
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
-            for root, _, files in os.walk(temp_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, temp_dir)
-                    zipf.write(file_path, arcname)
-        with open(zip_path, "rb") as f:
-            zip_content = f.read()
-    
-    return zip_content    
-        
 def batch_analyze(uploaded_files):
-    results = []
-    
+    """Analyze the uploads and stream each report into a ZIP on disk; returns (zip path, successes)."""
     MULTIMODAL_MODEL="gemini-2.5-flash"
     TEXT_MODEL="gemini-2.5-flash"
     
@@ -137,11 +92,13 @@ def batch_analyze(uploaded_files):
         model=TEXT_MODEL,
         temperature=0.2,
         google_api_key=st.session_state.api_key,
+        timeout=DEFAULT_STAGE_TIMEOUT,
     )
     multimodal_model = ChatGoogleGenerativeAI(
         model=MULTIMODAL_MODEL,
         temperature=0.2,
         google_api_key=st.session_state.api_key,
+        timeout=DEFAULT_STAGE_TIMEOUT,
     )
     model = HTPModel(
         text_model=text_model,
@@ -149,43 +106,62 @@ def batch_analyze(uploaded_files):
         language=st.session_state['language_code'],
         use_cache=True
     )
-    progress_bar = st.progress(0, text=f"Progressing: 0/{len(uploaded_files)}")
+    workflow = "workflow"
+    language = st.session_state['language_code']
+    total = len(uploaded_files)
+    # checkpointed by image hash: finished images are skipped, failed and unstarted ones are (re)run
+    manifest = BatchManifest()
+    digests = [image_digest(uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+    finished = manifest.completed(digests, workflow, language)
+    pending = [i for i, digest in enumerate(digests) if digest not in finished]
+    if finished:
+        st.info(get_text("batch_resuming").format(len(finished), total))
+
+    progress_bar = st.progress(0, text=f"Progressing: 0/{total}")
     start_time = time.time()
     success = 0
-    for i, uploaded_file in enumerate(uploaded_files):
-        try:
-            image = Image.open(uploaded_file)
-            image_data = pil_to_base64(image)
+    # each report goes to disk as soon as its drawing finishes, so memory stays flat with batch size
+    zip_path = new_results_path()
+    with ZipReportWriter(zip_path, disclaimer=get_text("ai_disclaimer")) as writer:
+        for i, digest in enumerate(digests):
+            if digest in finished:
+                writer.add(uploaded_files[i].name, True, manifest.get(digest, workflow, language)["result"])
+                success += 1
+        completed = len(finished)
+        progress_bar.progress(completed / total, text=f"Progressing: {completed}/{total}")
+
+        # drawings are pipelined through the workflow concurrently and arrive in completion order
+        items = model.batch_workflow(
+            (uploaded_files[i].getvalue() for i in pending),
+            max_concurrency=st.session_state.get('batch_concurrency', 4),
+            workflow=workflow,
+            language=language,
+            priority="backfill"
+        )
+        for n, item in enumerate(items):
+            index = pending[item["index"]]
+            file_name = uploaded_files[index].name
+            # the manifest's rule decides success, so the summary, failed.txt and a rerun agree
+            item_success, error = outcome(item["success"], item["result"], item["error"])
+            manifest.record(digests[index], workflow, language, file_name, item_success, item["result"], error)
+            writer.add(file_name, item_success, item["result"])
+            if item_success:
+                success += 1
+            completed += 1
             
-            response = model.workflow(image_path=image_data, language=st.session_state['language_code'])
-            results.append({
-                "file_name": uploaded_file.name,
-                "analysis_result": response,
-                "success": True,
-                "image": image
-            })
-            success += 1
-        except Exception as e:
-            results.append({
-                "file_name": uploaded_file.name,
-                "analysis_result": str(e),
-                "success": False,
-                "image": image
-            })
-        
-        elapsed_time = time.time() - start_time
-        progress = (i + 1) / len(uploaded_files)
-        estimated_total_time = elapsed_time / progress if progress > 0 else 0
-        remaining_time = estimated_total_time - elapsed_time
-        
-        elapsed_str = time.strftime("%H:%M:%S", time.gmtime(elapsed_time))
-        remaining_str = time.strftime("%H:%M:%S", time.gmtime(remaining_time))
-        
-        progress_bar.progress(progress, text=f"Progressing: {i + 1}/{len(uploaded_files)} | Elapsed: {elapsed_str} | Remaining: {remaining_str}")
+            # completion-rate based ETA over this run's analyses, valid for any concurrency
+            elapsed_time = time.time() - start_time
+            remaining_time = elapsed_time / (n + 1) * (len(pending) - n - 1)
+            
+            elapsed_str = time.strftime("%H:%M:%S", time.gmtime(elapsed_time))
+            remaining_str = time.strftime("%H:%M:%S", time.gmtime(remaining_time))
+            
+            progress_bar.progress(completed / total, text=f"Progressing: {completed}/{total} | Elapsed: {elapsed_str} | Remaining: {remaining_str}")
+    manifest.close()
     
-    st.success(get_text("batch_results").format(success, len(uploaded_files) - success))
+    st.success(get_text("batch_results").format(success, total - success))
     
-    return results, success
+    return zip_path, success
 
 def sidebar() -> None: 
     """Render sidebar components."""
@@ -207,6 +183,12 @@ def sidebar() -> None:
     # Model Settings
     st.sidebar.markdown(f"## {get_text('model_settings')}")
     st.session_state.api_key = st.sidebar.text_input("API Key", value=st.session_state.get('api_key', ''), type="password", key="api_key_input")
+    st.session_state.batch_concurrency = st.sidebar.number_input(
+        get_text("concurrency_label"), min_value=1, max_value=16, value=st.session_state.get('batch_concurrency', 4), step=1
+    )
+    st.session_state.batch_output_dir = st.sidebar.text_input(
+        get_text("output_dir_label"), value=st.session_state.get('batch_output_dir', BATCH_OUTPUT_DIR)
+    ).strip()
     
     # Buttons
     st.sidebar.markdown("---")
@@ -244,24 +226,17 @@ def main():
     uploaded_files = st.file_uploader(get_text("upload_images"), accept_multiple_files=True, type=['png', 'jpg', 'jpeg'], key="file_uploader")
     status_placeholder = st.empty()
     if uploaded_files:
-        cached_files = get_uploaded_files()
-        cached_files.extend(uploaded_files)
-        status_placeholder.success(get_text("images_uploaded").format(len(cached_files)))
+        status_placeholder.success(get_text("images_uploaded").format(len(uploaded_files)))
         
     if st.session_state.get('start_analysis'):
     # if st.sidebar.button(get_text("start_batch_analysis"), type="primary"):
         if not st.session_state.api_key:
             st.error(get_text("error_no_api_key"))
+        elif not st.session_state.batch_output_dir:
+            st.error(get_text("error_no_output_dir"))
         elif uploaded_files:
-            results, success = batch_analyze(uploaded_files=uploaded_files)
-            
-            zip_content = save_results(results)
-            st.download_button(
-                label = get_text("download_batch_results"),
-                data=zip_content,
-                file_name="batch_analysis_results.zip",
-                mime="application/zip"
-            )
+            zip_path, success = batch_analyze(uploaded_files=uploaded_files)
+            st.info(get_text("batch_results_saved").format(zip_path))
         st.session_state.start_analysis = False
     
     
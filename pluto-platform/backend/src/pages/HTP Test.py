@@ -8,6 +8,7 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from PIL import Image
 
 from src.model_langchain import HTPModel
+from src.resilience import DEFAULT_STAGE_TIMEOUT
 
 # Constants
 MAX_IMAGE_SIZE = (800, 800)
@@ -118,7 +119,7 @@ def reset_session() -> None:
 
 def export_report() -> None:
     if st.session_state.get('analysis_result'):
-        if st.session_state["analysis_result"]['classification'] is True:
+        if st.session_state["analysis_result"]['classification'] is not False:
             signal = st.session_state['analysis_result'].get('signal', '')
             final_report = st.session_state['analysis_result'].get('final', '').replace("<output>", "").replace("</output>", "")
             disclaimer = get_text("ai_disclaimer")
@@ -257,11 +258,13 @@ def main() -> None:
         model=TEXT_MODEL,
         temperature=0.2,
         google_api_key=st.session_state.api_key,
+        timeout=DEFAULT_STAGE_TIMEOUT,
     )
     multimodal_model = ChatGoogleGenerativeAI(
         model=MULTIMODAL_MODEL,
         temperature=0.2,
         google_api_key=st.session_state.api_key,
+        timeout=DEFAULT_STAGE_TIMEOUT,
     )
     model = HTPModel(
         text_model=text_model,
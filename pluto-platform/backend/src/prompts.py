@@ -0,0 +1,108 @@
+import glob
+import hashlib
+import os
+import threading
+from typing import Callable, Dict, List
+
+from loguru import logger
+
+PROMPT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt")
+
+
+class PromptFile(object):
+    """A prompt text loaded from disk together with its content version."""
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.mtime = None
+        self.text = None
+        self.version = None
+        self.load()
+
+    def load(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path, "r", encoding="utf-8") as f:
+            text = f.read()
+        self.text = text
+        self.version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        self.mtime = mtime
+
+    def is_stale(self) -> bool:
+        return os.stat(self.path).st_mtime_ns != self.mtime
+
+
+class PromptRegistry(object):
+    """
+    Loads every prompt in `src/prompt/<language>/` once and keeps compiled
+    templates in memory. A file is re-read only when its mtime changes, and
+    each prompt exposes a content hash as its version.
+    """
+
+    def __init__(self, language: str = "en", prompt_dir: str = None, auto_reload: bool = True):
+        self.language = language
+        self.prompt_dir = prompt_dir or os.path.join(PROMPT_ROOT, language)
+        self.auto_reload = auto_reload
+        self._lock = threading.Lock()
+        self._files: Dict[str, PromptFile] = {}
+        self._builders: Dict[str, tuple] = {}
+        self._compiled: Dict[str, tuple] = {}
+
+        for path in sorted(glob.glob(os.path.join(self.prompt_dir, "*.txt"))):
+            name = os.path.splitext(os.path.basename(path))[0]
+            self._files[name] = PromptFile(name, path)
+        if not self._files:
+            raise FileNotFoundError(f"No prompt files found in {self.prompt_dir}")
+        logger.info(f"Loaded {len(self._files)} prompts from {self.prompt_dir}")
+
+    def _file(self, name: str) -> PromptFile:
+        try:
+            prompt = self._files[name]
+        except KeyError:
+            raise KeyError(f"Unknown prompt '{name}' for language '{self.language}'.")
+        if self.auto_reload and prompt.is_stale():
+            with self._lock:
+                if prompt.is_stale():
+                    prompt.load()
+                    logger.info(f"Prompt '{name}' reloaded, version {prompt.version}.")
+        return prompt
+
+    def names(self) -> List[str]:
+        return list(self._files)
+
+    def text(self, name: str) -> str:
+        return self._file(name).text
+
+    def version(self, name: str) -> str:
+        return self._file(name).version
+
+    def versions(self, names: List[str] = None) -> Dict[str, str]:
+        return {name: self.version(name) for name in (names or self.names())}
+
+    def register(self, key: str, sources: List[str], build: Callable):
+        """
+        Register a compiled template. `build` receives the texts of `sources`
+        in order and returns the template; it is compiled immediately and again
+        only when one of the source prompts changes.
+        """
+        self._builders[key] = (list(sources), build)
+        self.template(key)
+
+    def template(self, key: str):
+        sources, build = self._builders[key]
+        versions = tuple(self.version(name) for name in sources)
+        compiled = self._compiled.get(key)
+        if compiled is None or compiled[0] != versions:
+            template = build(*(self.text(name) for name in sources))
+            compiled = (versions, template)
+            self._compiled[key] = compiled
+        return compiled[1]
+
+    def sources(self, key: str) -> List[str]:
+        """Prompt files a registered template is built from."""
+        return list(self._builders[key][0])
+
+    def template_version(self, key: str) -> str:
+        """Combined version of all prompts a registered template is built from."""
+        sources, _ = self._builders[key]
+        return "+".join(self.version(name) for name in sources)
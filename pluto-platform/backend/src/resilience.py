@@ -0,0 +1,266 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+
+from loguru import logger
+
+from src.governor import is_rate_limit_error
+
+
+# stage deadline of the default policy; also the request timeout given to the model
+# clients, so a call abandoned at the deadline ends and frees its governor slot
+DEFAULT_STAGE_TIMEOUT = 120.0
+
+
+class StageTimeoutError(TimeoutError):
+    """A stage call did not finish within its deadline."""
+
+
+class StagePolicy(object):
+    """
+    Tail-latency settings of one stage.
+
+    `timeout` bounds each attempt once it holds a governor slot, `retries`
+    extra attempts follow with full-jitter exponential backoff (rate-limit
+    errors excepted: the governor retries those), and with
+    `hedge` a duplicate request is started when an attempt runs longer than
+    the stage's observed p95 latency (or `hedge_after` seconds until enough
+    samples exist).
+    """
+
+    def __init__(self, timeout: Optional[float] = DEFAULT_STAGE_TIMEOUT, retries: int = 2, hedge: bool = True,
+                 hedge_after: Optional[float] = None, base_backoff: float = 0.5, max_backoff: float = 10.0):
+        self.timeout = timeout
+        self.retries = retries
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay before retry number `attempt` (0-based)."""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+
+
+class LatencyTracker(object):
+    """Rolling window of successful call latencies per stage."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, name: str, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q / 100.0 * len(samples)))]
+
+
+def _remaining(deadline: Optional[float], hedge_at: Optional[float], now: float) -> Optional[float]:
+    """Seconds until the next deadline or hedge point, None to wait indefinitely."""
+    points = [point for point in (deadline, hedge_at) if point is not None]
+    return max(0.0, min(points) - now) if points else None
+
+
+class StageRunner(object):
+    """
+    Applies StagePolicy to stage calls.
+
+    `execute` / `aexecute` run one attempt: the model call gets its deadline
+    and, past the p95 latency, a hedged duplicate; the first success wins and
+    the async loser is cancelled (a sync loser finishes in the background,
+    bounded by the model client's request timeout: give it the stage timeout).
+    Every call, hedges included, goes through `admit` on its own, so each
+    takes its own governor slot and token budget. `retry` / `aretry` wrap
+    whole attempts, so backoff sleeps never hold a slot.
+    """
+
+    def __init__(self, policies: Dict[str, StagePolicy] = None, default: StagePolicy = None,
+                 tracker: LatencyTracker = None, max_workers: int = 64):
+        self.policies = policies or {}
+        self.default = default or StagePolicy()
+        self.tracker = tracker or LatencyTracker()
+        self.stats = {"hedged": 0, "hedge_wins": 0, "timeouts": 0, "retries": 0}
+        self._max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def policy(self, name: str) -> StagePolicy:
+        return self.policies.get(name, self.default)
+
+    def hedge_delay(self, name: str, hedge: bool = True) -> Optional[float]:
+        policy = self.policy(name)
+        if not (hedge and policy.hedge):
+            return None
+        p95 = self.tracker.percentile(name, 95)
+        return p95 if p95 is not None else policy.hedge_after
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="stage-call")
+            return self._pool
+
+    @staticmethod
+    def _admitted(fn: Callable, admit: Optional[Callable], started: Future):
+        """One call of `fn()` through `admit`; `started` resolves once the call holds its slot."""
+        timing = {}
+
+        def run():
+            if not started.done():
+                started.set_result(None)
+            begin = time.perf_counter()
+            result = fn()
+            timing["seconds"] = time.perf_counter() - begin
+            return result
+
+        result = admit(run) if admit else run()
+        return result, timing["seconds"]
+
+    @staticmethod
+    async def _aadmitted(fn: Callable, admit: Optional[Callable], started: asyncio.Future):
+        timing = {}
+
+        async def run():
+            if not started.done():
+                started.set_result(None)
+            begin = time.perf_counter()
+            result = await fn()
+            timing["seconds"] = time.perf_counter() - begin
+            return result
+
+        result = await (admit(run) if admit else run())
+        return result, timing["seconds"]
+
+    def _won(self, name: str, outcome: tuple, hedge: bool = False):
+        # only the winning call is sampled, so abandoned losers cannot inflate the p95
+        result, seconds = outcome
+        self.tracker.record(name, seconds)
+        if hedge:
+            self._count("hedge_wins")
+        return result
+
+    def _timeout(self, name: str):
+        self._count("timeouts")
+        return StageTimeoutError(f"Stage '{name}' exceeded its {self.policy(name).timeout}s deadline.")
+
+    # -- one attempt --------------------------------------------------------
+
+    def execute(self, name: str, fn: Callable, hedge: bool = True, admit: Callable = None):
+        """
+        Run `fn()` with the stage deadline and an optional hedged duplicate.
+        `admit(run)` runs each call under admission control (the governor).
+        """
+        timeout = self.policy(name).timeout
+        hedge_after = self.hedge_delay(name, hedge)
+        if timeout is None and hedge_after is None:
+            return self._won(name, self._admitted(fn, admit, Future()))
+
+        pool = self._executor()
+        started = Future()
+        primary = pool.submit(self._admitted, fn, admit, started)
+        # the deadline and the hedge delay count from the moment the call holds its slot
+        wait({primary, started}, return_when=FIRST_COMPLETED)
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        hedge_at = start + hedge_after if hedge_after is not None else None
+        futures, error, hedged = {primary}, None, False
+        while futures:
+            done, _ = wait(futures, timeout=_remaining(deadline, None if hedged else hedge_at, time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                futures.discard(future)
+                if future.exception() is None:
+                    return self._won(name, future.result(), future is not primary)
+                error = future.exception()
+            if deadline is not None and time.monotonic() >= deadline:
+                raise self._timeout(name)
+            if futures and not hedged and hedge_at is not None and time.monotonic() >= hedge_at:
+                hedged = True
+                self._count("hedged")
+                logger.info(f"Stage '{name}' slower than {hedge_after:.1f}s; sending hedged request.")
+                futures.add(pool.submit(self._admitted, fn, admit, Future()))
+        raise error
+
+    async def aexecute(self, name: str, fn: Callable, hedge: bool = True, admit: Callable = None):
+        """Async counterpart of `execute`; `fn()` and `admit(run)` must return awaitables."""
+        timeout = self.policy(name).timeout
+        hedge_after = self.hedge_delay(name, hedge)
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+        if timeout is None and hedge_after is None:
+            return self._won(name, await self._aadmitted(fn, admit, started))
+
+        primary = asyncio.ensure_future(self._aadmitted(fn, admit, started))
+        tasks, error, hedged = {primary}, None, False
+        try:
+            await asyncio.wait({primary, started}, return_when=asyncio.FIRST_COMPLETED)
+            start = loop.time()
+            deadline = start + timeout if timeout is not None else None
+            hedge_at = start + hedge_after if hedge_after is not None else None
+            while tasks:
+                done, _ = await asyncio.wait(tasks, timeout=_remaining(deadline, None if hedged else hedge_at, loop.time()),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        return self._won(name, task.result(), task is not primary)
+                    error = task.exception()
+                if deadline is not None and loop.time() >= deadline:
+                    raise self._timeout(name)
+                if tasks and not hedged and hedge_at is not None and loop.time() >= hedge_at:
+                    hedged = True
+                    self._count("hedged")
+                    logger.info(f"Stage '{name}' slower than {hedge_after:.1f}s; sending hedged request.")
+                    tasks.add(asyncio.ensure_future(self._aadmitted(fn, admit, loop.create_future())))
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    # -- retries ------------------------------------------------------------
+
+    def retry(self, name: str, attempt: Callable):
+        """Call `attempt()` up to 1 + retries times with jittered backoff in between."""
+        policy = self.policy(name)
+        for n in range(policy.retries + 1):
+            try:
+                return attempt()
+            except Exception as e:
+                # rate limits were already retried by the governor, which backs off process-wide
+                if n == policy.retries or is_rate_limit_error(e):
+                    raise
+                delay = policy.backoff(n)
+                self._count("retries")
+                logger.warning(f"Stage '{name}' attempt {n + 1} failed ({e}); retrying in {delay:.1f}s.")
+                time.sleep(delay)
+
+    async def aretry(self, name: str, attempt: Callable):
+        policy = self.policy(name)
+        for n in range(policy.retries + 1):
+            try:
+                return await attempt()
+            except Exception as e:
+                if n == policy.retries or is_rate_limit_error(e):
+                    raise
+                delay = policy.backoff(n)
+                self._count("retries")
+                logger.warning(f"Stage '{name}' attempt {n + 1} failed ({e}); retrying in {delay:.1f}s.")
+                await asyncio.sleep(delay)
@@ -0,0 +1,68 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def analysis_key(workflow: str, image_digest: str, prompt_versions: dict, model_names: list) -> str:
+    """Content address of one workflow run: image bytes, prompts and models."""
+    payload = json.dumps({
+        "workflow": workflow,
+        "image": image_digest,
+        "prompts": prompt_versions,
+        "models": model_names,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache(object):
+    """
+    Thread-safe in-memory LRU cache for whole workflow results.
+
+    Entries are evicted once `max_size` is exceeded (least recently used
+    first) or when they are older than `ttl` seconds. `ttl=None` keeps
+    entries until they are pushed out by size.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: Optional[float] = None):
+        assert max_size > 0, "max_size must be positive."
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def put(self, key: str, value: dict):
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
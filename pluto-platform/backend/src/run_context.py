@@ -0,0 +1,56 @@
+import threading
+import uuid
+
+
+class RunContext(object):
+    """
+    Per-run state of one workflow execution: language, token usage and stage
+    timings. A shared HTPModel creates one context per run instead of
+    mutating instance attributes, so concurrent analyses never mix their
+    counters. Updates are lock-protected for the thread-pool executor.
+    """
+
+    def __init__(self, language: str = "en", workflow: str = None, run_id: str = None, priority: str = "interactive"):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.language = language
+        self.workflow = workflow
+        # governor lane for this run's LLM calls: interactive, assigned or backfill
+        self.priority = priority
+        self.usage = {
+            "total": 0,
+            "prompt": 0,
+            "completion": 0
+        }
+        self.timings = {}
+        # optional callback(stage, text) receiving token chunks of streamed stages
+        self.on_token = None
+        self._lock = threading.Lock()
+
+    def update_usage(self, response):
+        """Add token usage from Gemini response metadata."""
+        usage_metadata = getattr(response, "usage_metadata", None)
+        if not usage_metadata:
+            return
+        input_tokens = usage_metadata.get('input_tokens', 0)
+        output_tokens = usage_metadata.get('output_tokens', 0)
+        with self._lock:
+            self.usage["total"] += input_tokens + output_tokens
+            self.usage["prompt"] += input_tokens
+            self.usage["completion"] += output_tokens
+
+    def record_timing(self, stage: str, seconds: float):
+        with self._lock:
+            self.timings[stage] = seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "workflow": self.workflow,
+            "language": self.language,
+            "priority": self.priority,
+            "usage": dict(self.usage),
+            "timings": dict(self.timings),
+        }
+
+    def __repr__(self):
+        return f"RunContext(run_id={self.run_id!r}, workflow={self.workflow!r}, language={self.language!r}, priority={self.priority!r})"
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import re
+from typing import List, Optional, Tuple
+
+from loguru import logger
+
+# Decision contract of clf.txt: True = significant mental health concerns are
+# evident, False = no significant concerns / normal functioning range.
+
+# (pattern, weight) pairs; weights >= 2 are explicit conclusions, 1 is supporting evidence
+CONCERN_PATTERNS = [
+    (r"concerns? (?:are|is) (?:clearly |strongly )?(?:evident|present|identified|indicated)", 3),
+    (r"significant (?:mental health |psychological |emotional )?(?:concerns?|indicators?|distress|warning)", 2),
+    (r"(?:professional|clinical) (?:consultation|evaluation|assessment|follow-up) (?:is )?(?:strongly )?(?:recommended|warranted|advised|required|needed)", 2),
+    (r"(?:urgent|immediate) (?:professional |clinical )?(?:attention|intervention|consultation|referral|follow-up|assessment)", 3),
+    (r"(?:high|elevated|severe) (?:level of )?(?:risk|concern)", 2),
+    (r"suicid\w*|self-harm|self harm", 2),
+    (r"warning (?:signs?|indicators?|signals?)", 1),
+    (r"(?:trauma|abuse) indicators?", 1),
+    (r"(?:depressive|anxiety|anxious) (?:symptoms|indicators|features)", 1),
+]
+
+NORMAL_PATTERNS = [
+    (r"no (?:significant|notable|major|clear|evident|apparent|serious) (?:mental health |psychological |emotional )?(?:concerns?|indicators?|distress|warning|risk)", 3),
+    (r"no (?:mental health )?concerns? (?:are|is|were|was) (?:evident|present|identified|indicated|noted)", 3),
+    (r"(?:within|in) (?:the )?normal (?:range|limits)", 2),
+    (r"adequate (?:psychological|emotional) functioning", 2),
+    (r"(?:low|minimal) (?:level of )?(?:risk|concern)", 2),
+    (r"(?:routine|standard) (?:follow-up|monitoring|observation)", 1),
+    (r"age-appropriate|developmentally appropriate", 1),
+    (r"no (?:immediate|urgent) (?:intervention|action|referral|concern)", 2),
+]
+
+# "Overall level of mental health concern: moderate" / "Risk level - **High**"
+RISK_LEVEL = re.compile(
+    r"(?:(?:risk|concern)\s+level|level\s+of\s+[\w ]{0,30}?(?:risk|concern))[^\n:]{0,40}?[:\-–]\s*\**\s*"
+    r"(minimal|low|moderate|medium|high|severe)",
+    re.IGNORECASE
+)
+# "### Assessment Opinion:\nWarning" (the FIX_SIGNAL / signal heading format)
+OPINION = re.compile(
+    r"assessment opinion\s*:?\s*\**\s*\n+\s*\**\s*(warning|alert|concern|observation|normal|healthy)\b",
+    re.IGNORECASE
+)
+NEGATION = re.compile(r"\b(?:no|not|without|absence of|absent|denies|none|nor|neither|rule out|ruled out)\b[^.;:\n]*$", re.IGNORECASE)
+
+LEVEL_VOTES = {"minimal": (False, 3), "low": (False, 3), "high": (True, 3), "severe": (True, 4)}
+OPINION_VOTES = {
+    "warning": (True, 3), "alert": (True, 3), "concern": (True, 2),
+    "observation": (False, 2), "normal": (False, 3), "healthy": (False, 3),
+}
+
+
+class Decision(object):
+    """Outcome of local classification; `result` is None when the signal is ambiguous."""
+
+    def __init__(self, result: Optional[bool], concern: int, normal: int, evidence: List[str]):
+        self.result = result
+        self.concern = concern
+        self.normal = normal
+        self.evidence = evidence
+
+    @property
+    def confident(self) -> bool:
+        return self.result is not None
+
+    def __repr__(self):
+        return f"Decision(result={self.result!r}, concern={self.concern}, normal={self.normal})"
+
+
+class SignalClassifier(object):
+    """
+    Rule- and keyword-based classifier for the `signal_judge.txt` output.
+
+    Scores explicit conclusions ("no significant concerns", risk level,
+    assessment opinion heading) and supporting keywords for each side,
+    ignoring concern phrases that are negated within the same clause. It
+    decides only when one side reaches `threshold` and outweighs the other
+    by `margin`; otherwise the caller should fall back to the LLM.
+    """
+
+    def __init__(self, threshold: int = 3, margin: int = 3):
+        self.threshold = threshold
+        self.margin = margin
+        self._concern = [(re.compile(p, re.IGNORECASE), w) for p, w in CONCERN_PATTERNS]
+        self._normal = [(re.compile(p, re.IGNORECASE), w) for p, w in NORMAL_PATTERNS]
+
+    @property
+    def version(self) -> str:
+        """Hash of the rules and thresholds, so cached decisions follow rule changes."""
+        payload = json.dumps([CONCERN_PATTERNS, NORMAL_PATTERNS, RISK_LEVEL.pattern, OPINION.pattern,
+                              NEGATION.pattern, LEVEL_VOTES, OPINION_VOTES, self.threshold, self.margin],
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+    @staticmethod
+    def _negated(text: str, start: int) -> bool:
+        return NEGATION.search(text[max(0, start - 60):start]) is not None
+
+    def _score(self, text: str, patterns, check_negation: bool) -> Tuple[int, List[str]]:
+        score, evidence = 0, []
+        for pattern, weight in patterns:
+            for match in pattern.finditer(text):
+                if check_negation and self._negated(text, match.start()):
+                    continue
+                score += weight
+                evidence.append(match.group(0))
+        return score, evidence
+
+    def classify(self, signal: str) -> Decision:
+        if not isinstance(signal, str) or not signal.strip():
+            return Decision(None, 0, 0, [])
+        concern, concern_evidence = self._score(signal, self._concern, check_negation=True)
+        normal, normal_evidence = self._score(signal, self._normal, check_negation=False)
+        evidence = concern_evidence + normal_evidence
+
+        for pattern, votes in ((RISK_LEVEL, LEVEL_VOTES), (OPINION, OPINION_VOTES)):
+            match = pattern.search(signal)
+            if match and match.group(1).lower() in votes:
+                vote, weight = votes[match.group(1).lower()]
+                if vote:
+                    concern += weight
+                else:
+                    normal += weight
+                evidence.append(match.group(0).strip())
+
+        result = None
+        if concern >= self.threshold and concern - normal >= self.margin:
+            result = True
+        elif normal >= self.threshold and normal - concern >= self.margin:
+            result = False
+        return Decision(result, concern, normal, evidence)
+
+    def __call__(self, signal: str) -> Optional[bool]:
+        decision = self.classify(signal)
+        logger.debug(f"Local signal classification: {decision}")
+        return decision.result
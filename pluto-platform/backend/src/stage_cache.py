@@ -0,0 +1,57 @@
+import hashlib
+import json
+from typing import Any, Optional
+
+from src.image_input import ImageInput
+from src.llm_cache import SQLiteStore
+
+
+def value_digest(value: Any) -> str:
+    """Content hash of a stage input: image hash for images, JSON hash for everything else."""
+    if isinstance(value, ImageInput):
+        return value.digest
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def stage_key(stage: str, prompt_version: str, model: str, inputs: dict, variant: Optional[str] = None) -> str:
+    """
+    Key of one stage execution: its input hashes, prompt version and model,
+    plus `variant` for anything else that changes the output (e.g. whether
+    classification is decided by local rules or the LLM).
+    """
+    payload = json.dumps({
+        "stage": stage,
+        "prompt": prompt_version,
+        "model": model,
+        "variant": variant,
+        "inputs": {name: value_digest(value) for name, value in sorted(inputs.items())},
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class StageCache(object):
+    """
+    Persistent store of individual stage outputs. When only a downstream
+    prompt changes, re-running a workflow reuses every upstream stage whose
+    key is unchanged and recomputes just the affected stages.
+    """
+
+    def __init__(self, path: str = "stage_cache.db", max_bytes: int = 1024 * 1024 * 1024,
+                 max_age: Optional[float] = None):
+        self.store = SQLiteStore(path, table="stage_outputs", max_bytes=max_bytes, max_age=max_age)
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.store.get(key)
+        if raw is None:
+            return None
+        return json.loads(raw.decode("utf-8"))["output"]
+
+    def put(self, key: str, output: Any):
+        self.store.put(key, json.dumps({"output": output}, ensure_ascii=False).encode("utf-8"))
+
+    def flush(self):
+        self.store.flush()
+
+    def clear(self):
+        self.store.clear()
@@ -0,0 +1,107 @@
+import asyncio
+import json
+from typing import AsyncIterator, Dict, List, Optional
+
+from loguru import logger
+
+# keep proxies (nginx) from buffering the stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: dict) -> str:
+    """Format one workflow event as a Server-Sent Events message."""
+    data = json.dumps(event, ensure_ascii=False, default=str)
+    return f"event: {event.get('event', 'message')}\ndata: {data}\n\n"
+
+
+async def sse_stream(events: AsyncIterator[dict]) -> AsyncIterator[str]:
+    """Turn workflow events into SSE messages; a failure ends the stream with an `error` event."""
+    try:
+        async for event in events:
+            yield sse_event(event)
+    except Exception as e:
+        logger.error(f"Event stream failed: {e}")
+        yield sse_event({"event": "error", "detail": str(e)})
+
+
+class _Channel(object):
+    def __init__(self):
+        self.history: List[dict] = []
+        self.subscribers: List[asyncio.Queue] = []
+        self.closed = False
+
+
+class EventHub(object):
+    """
+    In-process fan-out of workflow events by key (e.g. drawing id).
+
+    The producer publishes events as a background analysis runs; any number
+    of SSE clients can subscribe, and late subscribers first receive every
+    event published so far. Closed channels are kept for `retain` seconds so
+    a client connecting just after completion still gets the full stream.
+    All methods must be called from the event loop thread.
+    """
+
+    def __init__(self, retain: float = 300.0):
+        self.retain = retain
+        self._channels: Dict[str, _Channel] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._channels
+
+    def open(self, key: str):
+        self._channels[key] = _Channel()
+
+    def publish(self, key: str, event: dict):
+        channel = self._channels.get(key)
+        if channel is None or channel.closed:
+            return
+        channel.history.append(event)
+        for subscriber in channel.subscribers:
+            subscriber.put_nowait(event)
+
+    def close(self, key: str):
+        channel = self._channels.get(key)
+        if channel is None or channel.closed:
+            return
+        channel.closed = True
+        for subscriber in channel.subscribers:
+            subscriber.put_nowait(None)
+        channel.subscribers.clear()
+        asyncio.get_running_loop().call_later(self.retain, self._drop, key, channel)
+
+    def _drop(self, key: str, channel: _Channel):
+        # a new run may have reopened the key in the meantime
+        if self._channels.get(key) is channel:
+            del self._channels[key]
+
+    async def subscribe(self, key: str) -> Optional[AsyncIterator[dict]]:
+        """Replay and follow the events of `key`; None when nothing is running or retained."""
+        channel = self._channels.get(key)
+        if channel is None:
+            return None
+        history = list(channel.history)
+        if channel.closed:
+            return self._replay(history)
+        subscriber = asyncio.Queue()
+        channel.subscribers.append(subscriber)
+        return self._follow(channel, history, subscriber)
+
+    @staticmethod
+    async def _replay(history: List[dict]):
+        for event in history:
+            yield event
+
+    @staticmethod
+    async def _follow(channel: _Channel, history: List[dict], subscriber: asyncio.Queue):
+        try:
+            for event in history:
+                yield event
+            while True:
+                event = await subscriber.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            if subscriber in channel.subscribers:
+                channel.subscribers.remove(subscriber)
@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+# the API and the job queue run against a throwaway SQLite database; set
+# before `app.database` is imported, which is also what keeps .env out of it
+TEST_DIR = tempfile.mkdtemp(prefix="pluto-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ["ANALYSIS_EMBEDDED_WORKER"] = "false"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+
+
+@compiles(JSONB, "sqlite")
+def _sqlite_jsonb(type_, compiler, **kwargs):
+    return "JSON"
+
+
+from src.fake_llm import FakeChatModel
+from src.governor import LLMGovernor
+from src.model_langchain import HTPModel
+
+
+def write_png(path: str, color=(255, 255, 255), size=(64, 64)) -> str:
+    from PIL import Image
+
+    Image.new("RGB", size, color).save(path, format="PNG")
+    return path
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    return write_png(str(tmp_path / "drawing.png"))
+
+
+@pytest.fixture
+def fake_model():
+    return FakeChatModel()
+
+
+@pytest.fixture
+def make_model(fake_model):
+    """HTPModel on the fake LLM with its own governor and no process-wide LLM cache."""
+    def make(**kwargs):
+        kwargs.setdefault("use_cache", False)
+        kwargs.setdefault("governor", LLMGovernor(max_concurrency=8))
+        return HTPModel(text_model=fake_model, multimodal_model=fake_model, **kwargs)
+    return make
+
+
+@pytest.fixture
+def db():
+    from app import models
+    from app.database import SessionLocal, engine
+
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db):
+    """API client; startup seeds the development users."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_headers():
+    from app import auth
+
+    def headers(email: str) -> dict:
+        return {"Authorization": "Bearer " + auth.create_access_token({"sub": email})}
+    return headers
@@ -0,0 +1,163 @@
+import datetime
+import uuid
+
+import pytest
+
+from app import jobs, models
+from app.database import SessionLocal
+from app.pagination import decode_cursor, encode_cursor
+
+FACILITATOR = "ananth@gmail.com"
+PSYCHOLOGIST = "ramesh@gmail.com"
+STUDENT = "harshit@gmail.com"
+START = datetime.datetime(2026, 1, 1)
+
+
+def user_id(email: str) -> uuid.UUID:
+    session = SessionLocal()
+    try:
+        return session.query(models.User).filter(models.User.email == email).one().id
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def drawings(client):
+    """Drawings of the seeded students, four per hour so submitted_at ties are broken by id."""
+    session = SessionLocal()
+    students = session.query(models.User).filter(models.User.role == models.RoleEnum.student).order_by(models.User.email).all()
+    psychologist_id = user_id(PSYCHOLOGIST)
+    rows = []
+    for i in range(60):
+        rows.append(models.Drawing(
+            student_id=students[i % 2].id,
+            file_path=f"uploads/{i}.png",
+            status=("submitted", "processing", "reviewed")[i % 3],
+            psychologist_id=psychologist_id if i % 4 == 0 else None,
+            submitted_at=START + datetime.timedelta(hours=i // 4),
+        ))
+    session.add_all(rows)
+    session.commit()
+    ids = [row.id for row in rows]
+    session.close()
+    return ids
+
+
+def walk(client, url: str, headers: dict, **params) -> list:
+    """Every item of a paginated list, following next_cursor to the end."""
+    items, cursor = [], None
+    while True:
+        response = client.get(url, params={**params, **({"cursor": cursor} if cursor else {})}, headers=headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page["items"]) <= params.get("limit", 50)
+        items += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def test_cursor_round_trip():
+    drawing_id = uuid.uuid4()
+    assert decode_cursor(encode_cursor(START, drawing_id)) == (START, drawing_id)
+    with pytest.raises(ValueError):
+        decode_cursor("garbage")
+
+
+def test_pages_cover_every_drawing_once_newest_first(client, drawings, auth_headers):
+    items = walk(client, "/api/assessments/facilitator", auth_headers(FACILITATOR), limit=7)
+    keys = [(item["submitted_at"], item["id"]) for item in items]
+    assert sorted(item["id"] for item in items) == sorted(str(d) for d in drawings)
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_filters_apply_across_pages(client, drawings, auth_headers):
+    items = walk(client, "/api/assessments/facilitator", auth_headers(FACILITATOR), limit=4,
+                 status=["submitted", "reviewed"], submitted_from="2026-01-01T03:00:00Z",
+                 submitted_to="2026-01-01T10:00:00")
+    expected = {str(drawings[i]) for i in range(12, 40) if i % 3 != 1}
+    assert {item["id"] for item in items} == expected
+
+
+def test_role_scoped_lists(client, drawings, auth_headers):
+    assigned = walk(client, "/api/assessments/psychologist", auth_headers(PSYCHOLOGIST), limit=5)
+    assert {item["id"] for item in assigned} == {str(drawings[i]) for i in range(0, 60, 4)}
+    own = walk(client, "/api/my-submissions", auth_headers(STUDENT), limit=9)
+    assert len(own) == 30
+    assert {item["student"]["email"] for item in own} == {STUDENT}
+
+
+def test_bad_list_parameters_are_rejected(client, auth_headers):
+    headers = auth_headers(FACILITATOR)
+    assert client.get("/api/assessments/facilitator", params={"cursor": "garbage"}, headers=headers).status_code == 422
+    assert client.get("/api/assessments/facilitator", params={"limit": 500}, headers=headers).status_code == 422
+
+
+def test_stats_count_by_status(client, drawings, auth_headers):
+    stats = client.get("/api/assessments/facilitator/stats", headers=auth_headers(FACILITATOR)).json()
+    assert stats == {"total": 60, "by_status": {"submitted": 20, "processing": 20, "reviewed": 20}}
+
+
+def assignment(drawing_id, psychologist_id) -> dict:
+    return {"drawing_id": str(drawing_id), "psychologist_id": str(psychologist_id)}
+
+
+def test_bulk_assignment_assigns_and_enqueues(client, drawings, auth_headers):
+    psychologist_id = user_id(PSYCHOLOGIST)
+    response = client.post("/api/drawings/assign", headers=auth_headers(FACILITATOR),
+                           json={"assignments": [assignment(d, psychologist_id) for d in drawings[:10]]})
+    assert response.status_code == 200
+    assert len(response.json()) == 10
+    assert {(item["status"], item["psychologist"]["email"]) for item in response.json()} == {("processing", PSYCHOLOGIST)}
+
+    session = SessionLocal()
+    assert {job.drawing_id for job in session.query(models.AnalysisJob)} == set(drawings[:10])
+    session.close()
+
+
+@pytest.mark.parametrize("bad", ["drawing", "psychologist"])
+def test_bulk_assignment_is_all_or_nothing(client, drawings, auth_headers, bad):
+    psychologist_id = user_id(PSYCHOLOGIST)
+    assignments = [assignment(d, psychologist_id) for d in drawings[:5]]
+    if bad == "drawing":
+        assignments.append(assignment(uuid.uuid4(), psychologist_id))
+    else:
+        # a student is not a valid psychologist
+        assignments.append(assignment(drawings[5], user_id(STUDENT)))
+
+    response = client.post("/api/drawings/assign", json={"assignments": assignments}, headers=auth_headers(FACILITATOR))
+    assert response.status_code == (404 if bad == "drawing" else 400)
+
+    session = SessionLocal()
+    before = {d: ("submitted", "processing", "reviewed")[i % 3] for i, d in enumerate(drawings[:6])}
+    assert {row.id: row.status for row in session.query(models.Drawing).filter(models.Drawing.id.in_(before))} == before
+    assert session.query(models.AnalysisJob).count() == 0
+    session.close()
+
+
+def test_single_assignment_rolls_back_without_its_job(client, drawings, auth_headers, monkeypatch):
+    psychologist_id = user_id(PSYCHOLOGIST)
+    url = f"/api/drawings/{drawings[0]}/assign/{psychologist_id}"
+
+    def unavailable(*args, **kwargs):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(jobs, "enqueue_analysis", unavailable)
+    with pytest.raises(RuntimeError):
+        client.put(url, headers=auth_headers(FACILITATOR))
+    session = SessionLocal()
+    assert session.get(models.Drawing, drawings[0]).status == "submitted"
+    session.close()
+
+    monkeypatch.undo()
+    response = client.put(url, headers=auth_headers(FACILITATOR))
+    assert response.status_code == 200 and response.json()["status"] == "processing"
+    session = SessionLocal()
+    assert session.query(models.AnalysisJob).filter(models.AnalysisJob.drawing_id == drawings[0]).count() == 1
+    session.close()
+
+
+def test_only_facilitators_assign(client, drawings, auth_headers):
+    response = client.post("/api/drawings/assign", headers=auth_headers(PSYCHOLOGIST),
+                           json={"assignments": [assignment(drawings[0], user_id(PSYCHOLOGIST))]})
+    assert response.status_code == 403
@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+
+from conftest import write_png
+from src import batch
+from src.batch_manifest import BatchManifest, image_digest, outcome
+
+
+@pytest.fixture
+def images(tmp_path):
+    folder = tmp_path / "drawings"
+    folder.mkdir()
+    return [write_png(str(folder / f"d{i}.png"), color=(i * 40, 0, 0)) for i in range(4)]
+
+
+def digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return image_digest(f.read())
+
+
+def run_batch(tmp_path, inputs, *extra) -> tuple:
+    output = str(tmp_path / "results.jsonl")
+    code = batch.main(list(inputs) + [
+        "--fake", "--fake-latency", "0", "--no-cache", "--processes", "1", "--concurrency", "2",
+        "--manifest", str(tmp_path / "manifest.db"), "--output", output, "--log-level", "ERROR",
+    ] + list(extra))
+    with open(output, encoding="utf-8") as f:
+        return code, {os.path.basename(r["file"]): r for r in map(json.loads, f)}
+
+
+def test_incomplete_results_count_as_failures():
+    assert outcome(True, {"missing": {}}) == (True, None)
+    assert outcome(True, {"missing": {"final": "failed: boom"}}) == (False, "incomplete: final")
+    assert outcome(False, None, "boom") == (False, "boom")
+
+
+def test_manifest_keeps_successes_and_retries_the_rest(tmp_path):
+    manifest = BatchManifest(str(tmp_path / "manifest.db"))
+    manifest.record("a", "workflow", "en", "a.png", True, {"final": "ok", "missing": {}})
+    manifest.record("b", "workflow", "en", "b.png", True, {"final": None, "missing": {"final": "failed"}})
+    manifest.record("c", "workflow", "en", "c.png", False, error="quota")
+    # a later failure does not overwrite a finished image
+    manifest.record("a", "workflow", "en", "a.png", False, error="quota")
+
+    assert manifest.completed(["a", "b", "c", "d"], "workflow", "en") == {"a"}
+    assert manifest.completed(["a"], "pluto", "en") == set()
+    assert manifest.get("a", "workflow", "en")["result"]["final"] == "ok"
+    assert manifest.get("b", "workflow", "en")["error"] == "incomplete: final"
+    manifest.close()
+
+
+def test_rerun_resumes_from_the_manifest(tmp_path, images):
+    manifest = BatchManifest(str(tmp_path / "manifest.db"))
+    manifest.record(digest(images[0]), "workflow", "en", "d0.png", True, {"final": "stored", "missing": {}})
+    manifest.record(digest(images[1]), "workflow", "en", "d1.png", False, error="quota")
+    manifest.close()
+
+    code, records = run_batch(tmp_path, [os.path.dirname(images[0])])
+    assert code == 0
+    assert set(records) == {"d0.png", "d1.png", "d2.png", "d3.png"}
+    assert records["d0.png"]["resumed"] and records["d0.png"]["result"]["final"] == "stored"
+    assert all(records[name]["success"] and not records[name].get("resumed") for name in ("d1.png", "d2.png", "d3.png"))
+
+    code, records = run_batch(tmp_path, [os.path.dirname(images[0])])
+    assert code == 0
+    assert all(record["resumed"] for record in records.values())
+
+
+def test_same_named_images_get_separate_reports(tmp_path):
+    first, second = tmp_path / "a", tmp_path / "b"
+    first.mkdir()
+    second.mkdir()
+    paths = [write_png(str(first / "x.png"), color=(0, 0, 0)), write_png(str(second / "x.png"), color=(0, 0, 255))]
+
+    code, _ = run_batch(tmp_path, paths, "--docx-dir", str(tmp_path / "docx"))
+    assert code == 0
+    assert sorted(os.listdir(tmp_path / "docx")) == sorted(f"x_{digest(path)[:12]}.docx" for path in paths)
@@ -0,0 +1,93 @@
+import time
+
+import pytest
+from langchain_core.globals import set_llm_cache
+
+from src.llm_cache import TieredLLMCache
+from src.result_cache import ResultCache
+from src.stage_cache import StageCache
+
+
+@pytest.fixture
+def reset_llm_cache():
+    yield
+    set_llm_cache(None)
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(max_size=2)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}
+    cache.put("c", {"v": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1} and cache.get("c") == {"v": 3}
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1}
+
+
+def test_result_cache_expires_entries_and_returns_copies():
+    cache = ResultCache(ttl=0.05)
+    cache.put("a", {"v": [1]})
+    cache.get("a")["v"].append(2)
+    assert cache.get("a") == {"v": [1]}
+    time.sleep(0.1)
+    assert cache.get("a") is None
+
+
+def test_repeated_image_is_served_from_the_result_cache(make_model, fake_model, image_path):
+    cache = ResultCache()
+    model = make_model(result_cache=cache)
+    first = model.workflow(image_path)
+    calls = fake_model.calls
+    second = model.workflow(image_path)
+
+    assert fake_model.calls == calls
+    assert cache.stats()["hits"] == 1
+    assert second["final"] == first["final"]
+    assert second["run_id"] != first["run_id"]
+    # a different workflow of the same image is not a hit
+    model.pluto_workflow(image_path)
+    assert fake_model.calls > calls
+
+
+def test_llm_cache_hits_memory_then_disk(make_model, fake_model, image_path, tmp_path, reset_llm_cache):
+    path = str(tmp_path / "llm_cache.db")
+    cache = TieredLLMCache(path)
+    make_model(use_cache=True, llm_cache=cache).workflow(image_path)
+    calls = fake_model.calls
+    assert cache.stats["misses"] == calls and cache.stats["writes"] == calls
+
+    make_model(use_cache=True, llm_cache=cache).workflow(image_path)
+    assert fake_model.calls == calls
+    assert cache.stats["memory_hits"] == calls
+
+    # a new process starts with an empty memory tier and reads the SQLite store
+    cache.store.flush()
+    reopened = TieredLLMCache(path)
+    make_model(use_cache=True, llm_cache=reopened).workflow(image_path)
+    assert fake_model.calls == calls
+    assert reopened.stats["disk_hits"] == calls and reopened.stats["misses"] == 0
+
+
+def test_stage_cache_reuses_stages_across_runs(make_model, fake_model, image_path, tmp_path):
+    cache = StageCache(str(tmp_path / "stage_cache.db"))
+    first = make_model(stage_cache=cache).workflow(image_path)
+    calls = fake_model.calls
+    second = make_model(stage_cache=cache).workflow(image_path)
+
+    assert fake_model.calls == calls
+    assert second["final"] == first["final"]
+    assert second["classification"] == first["classification"]
+
+
+def test_stage_cache_key_follows_the_classifier_mode(make_model, fake_model, image_path, tmp_path):
+    cache = StageCache(str(tmp_path / "stage_cache.db"))
+    local = make_model(stage_cache=cache, local_classification=True).workflow(image_path)
+    calls = fake_model.calls
+    llm = make_model(stage_cache=cache, local_classification=False).workflow(image_path)
+
+    assert local["classification_source"] == "local"
+    assert llm["classification_source"] == "llm"
+    # only the classification stage is recomputed, by the model this time
+    assert fake_model.calls == calls + 1
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.dag import DAGExecutor, Stage, StageGraph
+
+
+def local(name, inputs, fn):
+    return Stage(name, inputs=inputs, run=fn)
+
+
+def diamond(calls, fail=None, delay=0.0):
+    """a -> (b, c) -> d next to an independent e, counting how often each stage runs."""
+    lock = threading.Lock()
+
+    def step(name, value):
+        def run(values):
+            with lock:
+                calls[name] = calls.get(name, 0) + 1
+            time.sleep(delay)
+            if name == fail:
+                raise RuntimeError(f"{name} failed")
+            return value(values)
+        return run
+
+    return StageGraph("diamond", [
+        local("a", ["image"], step("a", lambda v: v["image"] + "-a")),
+        local("b", ["a"], step("b", lambda v: v["a"] + "-b")),
+        local("c", ["a"], step("c", lambda v: v["a"] + "-c")),
+        local("d", ["b", "c"], step("d", lambda v: v["b"] + "+" + v["c"])),
+        local("e", ["image"], step("e", lambda v: v["image"] + "-e")),
+    ])
+
+
+def executor():
+    return DAGExecutor(invoke=None, ainvoke=None)
+
+
+def test_graph_rejects_cycles_and_duplicates():
+    with pytest.raises(AssertionError):
+        StageGraph("cycle", [local("a", ["b"], dict), local("b", ["a"], dict)])
+    with pytest.raises(AssertionError):
+        StageGraph("dup", [local("a", [], dict), local("a", [], dict)])
+
+
+def test_missing_graph_input_is_rejected():
+    with pytest.raises(AssertionError):
+        executor().run(diamond({}), {})
+
+
+def test_each_stage_runs_once_and_independent_stages_overlap():
+    calls = {}
+    start = time.perf_counter()
+    run = executor().run(diamond(calls, delay=0.2), {"image": "img"})
+    elapsed = time.perf_counter() - start
+
+    assert run.complete
+    assert run.outputs["d"] == "img-a-b+img-a-c"
+    assert calls == {"a": 1, "b": 1, "c": 1, "d": 1, "e": 1}
+    # three levels deep; b, c and e run side by side
+    assert elapsed < 0.2 * 4
+    assert set(run.timings) == {"a", "b", "c", "d", "e"}
+
+
+def test_partial_run_skips_dependents_of_a_failed_stage():
+    calls = {}
+    errors = []
+    run = executor().run(diamond(calls, fail="b"), {"image": "img"}, partial=True,
+                         on_error=lambda name, error: errors.append(name))
+
+    assert not run.complete
+    assert errors == ["b"]
+    assert run.missing["b"].startswith("failed")
+    assert run.missing["d"] == "skipped: upstream stage 'b' is missing"
+    assert run.outputs["c"] == "img-a-c" and run.outputs["e"] == "img-e"
+    assert "d" not in calls
+
+
+def test_failure_raises_without_partial():
+    with pytest.raises(RuntimeError):
+        executor().run(diamond({}, fail="c"), {"image": "img"})
+
+
+def test_async_run_matches_sync_run():
+    run = asyncio.run(executor().arun(diamond({}), {"image": "img"}))
+    assert run.outputs["d"] == executor().run(diamond({}), {"image": "img"}).outputs["d"]
+
+
+@pytest.mark.parametrize("method, elements", [("workflow", 4), ("pluto_workflow", 1)])
+def test_merged_mode_sends_each_image_once(make_model, fake_model, image_path, method, elements):
+    separate_result = getattr(make_model(image_mode="separate"), method)(image_path)
+    separate_calls = fake_model.calls
+    merged_result = getattr(make_model(image_mode="merged"), method)(image_path)
+    merged_calls = fake_model.calls - separate_calls
+
+    assert not separate_result["missing"] and not merged_result["missing"]
+    # one combined call replaces each feature + analysis pair
+    assert separate_calls - merged_calls == elements
+    assert merged_result.keys() == separate_result.keys()
+    assert merged_result["person"]["feature"] == separate_result["person"]["feature"]
+    assert merged_result["person"]["analysis"] == separate_result["person"]["analysis"]
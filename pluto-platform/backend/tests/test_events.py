@@ -0,0 +1,50 @@
+import asyncio
+
+from app.events import MAX_PAYLOAD, EventRelay, MessageDecoder, encode_message
+from src.streaming import EventHub
+
+
+def test_large_events_are_split_below_the_notify_limit():
+    event = {"event": "token", "text": "é" * 20000}
+    payloads = encode_message("drawing", "publish", event)
+
+    assert len(payloads) > 1
+    assert all(len(payload.encode()) < 8000 for payload in payloads)
+    assert all(len(payload.split(" ", 3)[3]) <= MAX_PAYLOAD for payload in payloads)
+
+    decoder = MessageDecoder()
+    assert [decoder.feed(payload) for payload in payloads[:-1]] == [None] * (len(payloads) - 1)
+    assert decoder.feed(payloads[-1]) == {"key": "drawing", "kind": "publish", "event": event}
+    assert decoder._pending == {}
+
+
+def test_interleaved_messages_are_reassembled_separately():
+    first = encode_message("a", "publish", {"text": "x" * 10000})
+    second = encode_message("b", "publish", {"text": "y" * 10000})
+    decoder = MessageDecoder()
+
+    messages = [decoder.feed(payload) for pair in zip(first, second) for payload in pair]
+    assert [m["key"] for m in messages if m is not None] == ["a", "b"]
+
+
+def test_relayed_events_reach_subscribers():
+    async def scenario():
+        hub = EventHub()
+        relay = EventRelay(engine=None, hub=hub, loop=asyncio.get_running_loop())
+        events = [{"event": "start"}, {"event": "token", "text": "z" * 9000}, {"event": "status", "status": "in_review"}]
+
+        for payload in encode_message("drawing", "open"):
+            relay.receive(payload)
+        await asyncio.sleep(0)
+        stream = await hub.subscribe("drawing")
+        assert stream is not None
+
+        for event in events:
+            for payload in encode_message("drawing", "publish", event):
+                relay.receive(payload)
+        for payload in encode_message("drawing", "close"):
+            relay.receive(payload)
+        return [event async for event in stream], events
+
+    received, sent = asyncio.run(scenario())
+    assert received == sent
@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from src import benchmark
+from src.fake_llm import CLASSIFICATION_OUTPUT, FakeChatModel, PERSON_REPORT_OUTPUT
+
+
+def messages(system: str):
+    return [SystemMessage(content=system), HumanMessage(content="Here is the drawing.")]
+
+
+def test_replies_match_the_stage_prompt():
+    model = FakeChatModel()
+    assert model.invoke(messages("Classify the overall mental health screening result.")).content == CLASSIFICATION_OUTPUT
+    report = model.invoke(messages("Write the final, concise summary report.")).content
+    assert report == PERSON_REPORT_OUTPUT and "### Overall Summary" in report
+    assert json.loads(CLASSIFICATION_OUTPUT) == {"result": False}
+
+
+def test_reports_usage_and_counts_calls():
+    model = FakeChatModel()
+    response = model.invoke(messages("extract the features"))
+    usage = response.usage_metadata
+    assert usage["total_tokens"] == usage["input_tokens"] + usage["output_tokens"] > 0
+    asyncio.run(model.ainvoke(messages("extract the features")))
+    assert model.calls == 2
+
+
+def test_streaming_yields_the_full_reply_with_usage_once():
+    model = FakeChatModel()
+    chunks = list(model.stream(messages("extract the features")))
+    assert "".join(chunk.content for chunk in chunks) == model.invoke(messages("extract the features")).content
+    assert len([chunk for chunk in chunks if chunk.usage_metadata]) == 1
+
+
+def test_latency_is_seeded():
+    first = FakeChatModel(latency=0.1, latency_distribution="lognormal", seed=7)
+    second = FakeChatModel(latency=0.1, latency_distribution="lognormal", seed=7)
+    assert [first.sample_latency() for _ in range(5)] == [second.sample_latency() for _ in range(5)]
+    assert FakeChatModel(latency=0.1).sample_latency() == 0.1
+
+
+def test_injected_rate_limits():
+    with pytest.raises(RuntimeError, match="429"):
+        FakeChatModel(rate_limit_rate=1.0).invoke(messages("extract"))
+
+
+def test_benchmark_reports_latency_percentiles(tmp_path):
+    output = tmp_path / "bench.json"
+    benchmark.main(["--workflow", "pluto", "--mode", "async", "sync", "--concurrency", "1", "4",
+                    "--runs", "4", "--latency", "0", "--image-size", "32", "--json", str(output)])
+    rows = json.loads(output.read_text())
+    assert [(row["mode"], row["concurrency"]) for row in rows] == [("async", 1), ("async", 4), ("sync", 1), ("sync", 4)]
+    assert all(row["runs"] == 4 and row["p50"] <= row["p95"] <= row["p99"] for row in rows)
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.fake_llm import FakeChatModel
+from src.governor import LLMGovernor, is_rate_limit_error
+from src.model_langchain import HTPModel
+from src.resilience import StagePolicy, StageRunner
+
+
+def wait_until(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        time.sleep(0.01)
+
+
+class Flaky(object):
+    """Fails with each of `errors` in turn, then returns "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def rate_limit():
+    return RuntimeError("429 RESOURCE_EXHAUSTED: quota exceeded")
+
+
+def test_rate_limit_errors_are_recognized():
+    assert is_rate_limit_error(rate_limit())
+    assert not is_rate_limit_error(RuntimeError("connection reset"))
+
+
+def test_interactive_calls_jump_the_backfill_queue():
+    governor = LLMGovernor(max_concurrency=1)
+    governor.acquire("backfill")
+    order = []
+
+    def wait(priority):
+        governor.acquire(priority)
+        order.append(priority)
+        governor.release()
+
+    threads = []
+    for priority in ("backfill", "assigned", "interactive"):
+        threads.append(threading.Thread(target=wait, args=(priority,)))
+        threads[-1].start()
+        wait_until(lambda: governor.snapshot()["queued"] == len(threads))
+    governor.release()
+    for thread in threads:
+        thread.join(timeout=2)
+
+    assert order == ["interactive", "assigned", "backfill"]
+    assert governor.snapshot()["active"] == 0
+
+
+def test_concurrency_limit_is_enforced():
+    governor = LLMGovernor(max_concurrency=2)
+    peak, active, lock = [0], [0], threading.Lock()
+
+    def work():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+
+    threads = [threading.Thread(target=governor.call, args=(work,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert peak[0] == 2
+    assert governor.stats["calls"] == 6
+
+
+def test_rate_limit_is_retried_and_halves_concurrency():
+    governor = LLMGovernor(max_concurrency=4, base_backoff=0.01, max_backoff=0.05)
+    fn = Flaky(rate_limit())
+
+    assert governor.call(fn) == "ok"
+    assert fn.calls == 2
+    snapshot = governor.snapshot()
+    assert snapshot["rate_limited"] == 1 and snapshot["retries"] == 1
+    assert snapshot["concurrency_limit"] == 2
+
+
+def test_rate_limit_gives_up_after_max_retries():
+    governor = LLMGovernor(max_retries=2, base_backoff=0.01, max_backoff=0.05)
+    fn = Flaky(*[rate_limit() for _ in range(5)])
+
+    with pytest.raises(RuntimeError):
+        governor.call(fn)
+    assert fn.calls == 3
+    assert governor.stats["failures"] == 1
+
+
+def test_other_errors_are_not_retried_by_the_governor():
+    governor = LLMGovernor()
+    fn = Flaky(RuntimeError("boom"))
+    with pytest.raises(RuntimeError):
+        governor.call(fn)
+    assert fn.calls == 1
+    assert governor.snapshot()["concurrency_limit"] == governor.max_concurrency
+
+
+def test_async_calls_share_the_governor():
+    governor = LLMGovernor(max_concurrency=4, base_backoff=0.01, max_backoff=0.05)
+    fn = Flaky(rate_limit())
+
+    async def call():
+        return fn()
+
+    assert asyncio.run(governor.acall(call)) == "ok"
+    assert fn.calls == 2 and governor.stats["retries"] == 1
+
+
+def test_stage_retries_leave_rate_limits_to_the_governor():
+    governor = LLMGovernor(base_backoff=0.01, max_backoff=0.05, max_retries=1)
+    runner = StageRunner(default=StagePolicy(retries=2, base_backoff=0.0, hedge=False))
+    limited = Flaky(*[rate_limit() for _ in range(5)])
+    admit = lambda run: governor.call(run)
+
+    with pytest.raises(RuntimeError):
+        runner.retry("final", lambda: runner.execute("final", limited, admit=admit))
+    # the governor's two tries only; the stage retries do not multiply them
+    assert limited.calls == 2
+    assert runner.stats["retries"] == 0
+
+    failing = Flaky(RuntimeError("boom"), RuntimeError("boom"))
+    assert runner.retry("final", lambda: runner.execute("final", failing, admit=admit)) == "ok"
+    assert failing.calls == 3 and runner.stats["retries"] == 2
+
+
+def test_hedged_call_takes_its_own_slot():
+    governor = LLMGovernor(max_concurrency=4)
+    runner = StageRunner(default=StagePolicy(hedge_after=0.05, retries=0))
+    peak, lock = [0], threading.Lock()
+
+    def slow():
+        with lock:
+            peak[0] = max(peak[0], governor.snapshot()["active"])
+        time.sleep(0.2)
+        return "ok"
+
+    assert runner.execute("final", slow, admit=lambda run: governor.call(run)) == "ok"
+    assert runner.stats["hedged"] == 1
+    assert peak[0] == 2
+
+
+def test_timed_out_stage_releases_its_slot(image_path):
+    governor = LLMGovernor(max_concurrency=4)
+    model = HTPModel(text_model=FakeChatModel(latency=2.0, timeout=0.2), use_cache=False, governor=governor,
+                     stage_runner=StageRunner(default=StagePolicy(timeout=0.2, retries=0, hedge=False)))
+
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        model.workflow(image_path)
+    # the model request itself times out, so no abandoned call keeps holding a slot
+    wait_until(lambda: governor.snapshot()["active"] == 0, timeout=0.5)
+    assert time.monotonic() - start < 2.0
@@ -0,0 +1,86 @@
+import base64
+
+import pytest
+
+from src.image_input import INVALID_IMAGE, ImageInput, sniff_mime_type
+
+
+@pytest.fixture
+def png_bytes(image_path):
+    with open(image_path, "rb") as f:
+        return f.read()
+
+
+def test_every_input_form_resolves_to_the_same_image(image_path, png_bytes):
+    encoded = base64.b64encode(png_bytes).decode()
+    images = [
+        ImageInput.resolve(image_path),
+        ImageInput.resolve(png_bytes),
+        ImageInput.resolve(encoded),
+        ImageInput.resolve(f"data:image/png;base64,{encoded}"),
+    ]
+    assert [image.source for image in images] == ["path", "bytes", "base64", "data_uri"]
+    assert len({image.digest for image in images}) == 1
+    assert all(image.mime_type == "image/png" for image in images)
+    assert images[0].base64 == encoded
+    assert ImageInput.resolve(images[0]) is images[0]
+
+
+@pytest.mark.parametrize("value", [
+    "nope",
+    "/no/such/file.png",
+    base64.b64encode(b"plain text, not an image").decode(),
+    "data:image/png;base64," + base64.b64encode(b"plain text, not an image").decode(),
+    "data:image/png;base64,!!!",
+    b"notimage",
+    b"",
+])
+def test_non_images_are_rejected(value):
+    with pytest.raises(ValueError, match=INVALID_IMAGE):
+        ImageInput.resolve(value)
+
+
+def test_unsupported_types_are_rejected():
+    with pytest.raises(TypeError):
+        ImageInput.resolve(42)
+
+
+def test_sniffs_supported_formats():
+    assert sniff_mime_type(b"\xff\xd8\xff\xe0rest") == "image/jpeg"
+    assert sniff_mime_type(b"GIF89a...") == "image/gif"
+    assert sniff_mime_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "image/webp"
+    assert sniff_mime_type(b"%PDF-1.7") is None
+
+
+def test_image_input_is_immutable(png_bytes):
+    image = ImageInput(png_bytes)
+    with pytest.raises(AttributeError):
+        image.data = b""
+
+
+@pytest.fixture
+def predict_client(make_model):
+    from fastapi.testclient import TestClient
+
+    from src.app.api import create_app
+
+    with TestClient(create_app(make_model(), job_workers=1)) as client:
+        yield client
+
+
+@pytest.mark.parametrize("request_kwargs", [
+    {"json": {"image_path": "nope"}},
+    {"json": {"image_path": base64.b64encode(b"plain text").decode()}},
+    {"content": b"notimage", "headers": {"content-type": "application/octet-stream"}},
+    {"files": {"image": ("x.png", b"notimage", "image/png")}},
+])
+def test_predict_rejects_uploads_that_are_not_images(predict_client, request_kwargs):
+    response = predict_client.post("/v1/predict", **request_kwargs)
+    assert response.status_code == 400
+    assert response.json()["detail"] == INVALID_IMAGE
+
+
+def test_predict_accepts_an_uploaded_image(predict_client, png_bytes):
+    response = predict_client.post("/v1/predict", content=png_bytes, headers={"content-type": "image/png"})
+    assert response.status_code == 200
+    assert response.json()["classification"] is False
@@ -0,0 +1,47 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image, ImageDraw
+
+from src.image_input import ImageInput
+from src.image_normalize import ImageNormalizer
+
+
+def encode(img: Image.Image) -> ImageInput:
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return ImageInput(buffer.getvalue())
+
+
+def decode(image: ImageInput) -> Image.Image:
+    return Image.open(BytesIO(image.data))
+
+
+def transparent_drawing(mode: str = "RGBA") -> Image.Image:
+    """Black strokes on a fully transparent canvas, as exported by drawing apps."""
+    img = Image.new("RGBA", (2048, 1024), (0, 0, 0, 0))
+    ImageDraw.Draw(img).line([(100, 100), (1900, 900)], fill=(0, 0, 0, 255), width=20)
+    return img.convert(mode) if mode != "RGBA" else img
+
+
+@pytest.mark.parametrize("mode", ["RGBA", "LA", "P"])
+@pytest.mark.parametrize("options", [{}, {"grayscale": True}, {"palette_colors": 4}])
+def test_transparent_background_becomes_white(mode, options):
+    normalized = ImageNormalizer(**options).normalize(encode(transparent_drawing(mode)))
+    img = decode(normalized).convert("RGB")
+
+    assert img.size == (1024, 512)
+    assert min(img.getpixel((0, 0))) >= 250
+    # the stroke survives
+    assert max(img.getpixel((512, 256))) < 80
+
+
+def test_downscales_and_caches_per_image():
+    normalizer = ImageNormalizer(max_edge=256)
+    image = encode(Image.new("RGB", (1000, 500), (200, 10, 10)))
+    normalized = normalizer(image)
+
+    assert normalized.mime_type == "image/jpeg"
+    assert decode(normalized).size == (256, 128)
+    assert normalizer(image) is normalized
+    assert normalizer(normalized) is normalized
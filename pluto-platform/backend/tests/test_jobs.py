@@ -0,0 +1,203 @@
+import asyncio
+import datetime
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import jobs, models
+from app.database import SessionLocal
+from app.worker import AnalysisWorker
+
+
+@pytest.fixture
+def student(db):
+    user = models.User(email="student@example.com", hashed_password="x", role="student")
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def drawing(db, student):
+    def create(status="processing", path="uploads/d.png"):
+        row = models.Drawing(student_id=student.id, file_path=path, status=status)
+        db.add(row)
+        db.commit()
+        return row
+    return create
+
+
+def expire(db, job):
+    job.lease_expires_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    db.commit()
+
+
+def test_enqueue_keeps_one_live_job_per_drawing(db, drawing):
+    row = drawing()
+    first = jobs.enqueue_analysis(db, row.id, row.file_path)
+    second = jobs.enqueue_analysis(db, row.id, row.file_path)
+    assert first.id == second.id
+    assert jobs.enqueue_analyses(db, [(row.id, row.file_path)]) == 0
+    assert db.query(models.AnalysisJob).count() == 1
+
+
+def test_unique_index_rejects_a_second_live_job(db, drawing):
+    row = drawing()
+    db.add(models.AnalysisJob(drawing_id=row.id, image_path=row.file_path, status=jobs.SUCCEEDED))
+    db.add(models.AnalysisJob(drawing_id=row.id, image_path=row.file_path, status=jobs.QUEUED))
+    db.commit()
+
+    db.add(models.AnalysisJob(drawing_id=row.id, image_path=row.file_path, status=jobs.RUNNING))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+
+def test_claimed_jobs_are_leased_once(db, drawing):
+    for i in range(3):
+        row = drawing(path=f"uploads/{i}.png")
+        jobs.enqueue_analysis(db, row.id, row.file_path)
+
+    claimed = jobs.claim_jobs(db, "w1", 2, 60)
+    assert len(claimed) == 2
+    assert all(job.status == jobs.RUNNING and job.leased_by == "w1" and job.attempts == 1 for job in claimed)
+    assert len(jobs.claim_jobs(db, "w2", 5, 60)) == 1
+    assert jobs.claim_jobs(db, "w3", 5, 60) == []
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(db, drawing):
+    row = drawing()
+    jobs.enqueue_analysis(db, row.id, row.file_path)
+    job = jobs.claim_jobs(db, "dead-worker", 1, 60)[0]
+    expire(db, job)
+
+    reclaimed = jobs.claim_jobs(db, "w2", 1, 60)
+    assert [(j.id, j.leased_by, j.attempts) for j in reclaimed] == [(job.id, "w2", 2)]
+    # the old worker has lost its lease
+    assert not jobs.extend_lease(db, job.id, "dead-worker", 60)
+    assert not jobs.complete_job(db, job.id, "dead-worker", {"final": "late"})
+    assert jobs.complete_job(db, job.id, "w2", {"final": "ok"})
+    db.refresh(row)
+    assert row.status == "in_review" and row.ai_analysis.analysis_data == {"final": "ok"}
+
+
+def test_failures_back_off_then_dead_letter(db, drawing, monkeypatch):
+    monkeypatch.setattr(jobs, "retry_delay", lambda attempt: 0)
+    row = drawing()
+    jobs.enqueue_analysis(db, row.id, row.file_path, max_attempts=2)
+
+    job = jobs.claim_jobs(db, "w1", 1, 60)[0]
+    assert jobs.fail_job(db, job.id, "w1", "transient") == jobs.QUEUED
+    job = jobs.claim_jobs(db, "w1", 1, 60)[0]
+    assert jobs.fail_job(db, job.id, "w1", "still failing") == jobs.DEAD
+    db.refresh(row)
+    assert row.status == "failed"
+
+    requeued = jobs.requeue_dead(db, job.id)
+    assert requeued.status == jobs.QUEUED and requeued.attempts == 0
+    assert db.get(models.Drawing, row.id).status == "processing"
+
+
+def test_worker_dying_on_the_last_attempt_dead_letters_the_job(db, drawing):
+    row = drawing()
+    jobs.enqueue_analysis(db, row.id, row.file_path, max_attempts=1)
+    job = jobs.claim_jobs(db, "dead-worker", 1, 60)[0]
+    expire(db, job)
+
+    assert jobs.claim_jobs(db, "w2", 1, 60) == []
+    db.refresh(job)
+    assert job.status == jobs.DEAD
+    assert db.get(models.Drawing, row.id).status == "failed"
+
+
+def test_orphaned_processing_drawings_are_recovered(db, drawing):
+    orphan = drawing()
+    queued = drawing()
+    jobs.enqueue_analysis(db, queued.id, queued.file_path)
+    drawing(status="submitted")
+
+    assert jobs.recover_orphans(db) == 1
+    assert {job.drawing_id for job in db.query(models.AnalysisJob)} == {orphan.id, queued.id}
+    assert jobs.recover_orphans(db) == 0
+
+
+class FakeInference(object):
+    """Streams a result for every image; those in `failing` raise, those in `incomplete` lack the final report."""
+
+    def __init__(self, failing=(), incomplete=()):
+        self.failing = set(failing)
+        self.incomplete = set(incomplete)
+
+    async def astream(self, image, workflow, language, priority):
+        yield {"event": "start"}
+        if image in self.failing:
+            raise RuntimeError("model unavailable")
+        if image in self.incomplete:
+            yield {"event": "result", "result": {"final": None, "missing": {"final": "failed: boom"}}}
+            return
+        yield {"event": "result", "result": {"final": f"report of {image}", "missing": {}}}
+
+    async def aclose(self):
+        pass
+
+
+def run_worker(inference, seconds: float = 1.0, **kwargs):
+    async def main():
+        worker = AnalysisWorker(inference, concurrency=2, poll_interval=0.05, **kwargs)
+        stop = asyncio.Event()
+        task = asyncio.create_task(worker.run(stop))
+        await asyncio.sleep(seconds)
+        stop.set()
+        await task
+    asyncio.run(main())
+
+
+def test_worker_completes_and_retries_jobs(db, drawing, monkeypatch):
+    monkeypatch.setattr(jobs, "retry_delay", lambda attempt: 0)
+    good, bad = drawing(path="uploads/good.png"), drawing(path="uploads/bad.png")
+    for row in (good, bad):
+        jobs.enqueue_analysis(db, row.id, row.file_path, max_attempts=2)
+
+    run_worker(FakeInference(failing={"uploads/bad.png"}))
+
+    session = SessionLocal()
+    statuses = {job.image_path: (job.status, job.attempts) for job in session.query(models.AnalysisJob)}
+    assert statuses == {"uploads/good.png": (jobs.SUCCEEDED, 1), "uploads/bad.png": (jobs.DEAD, 2)}
+    assert session.get(models.Drawing, good.id).ai_analysis.analysis_data["final"] == "report of uploads/good.png"
+    session.close()
+
+
+def test_incomplete_results_are_retried_not_completed(db, drawing, monkeypatch):
+    monkeypatch.setattr(jobs, "retry_delay", lambda attempt: 0)
+    row = drawing(path="uploads/partial.png")
+    jobs.enqueue_analysis(db, row.id, row.file_path, max_attempts=2)
+
+    run_worker(FakeInference(incomplete={"uploads/partial.png"}))
+
+    session = SessionLocal()
+    job = session.query(models.AnalysisJob).one()
+    assert (job.status, job.attempts) == (jobs.DEAD, 2)
+    assert "incomplete: final" in job.last_error
+    assert session.get(models.Drawing, row.id).ai_analysis is None
+    session.close()
+
+
+def test_worker_keeps_polling_after_database_errors(db, drawing, monkeypatch):
+    row = drawing()
+    jobs.enqueue_analysis(db, row.id, row.file_path)
+    real_claim = jobs.claim_jobs
+    failures = []
+
+    def flaky_claim(*args):
+        if len(failures) < 2:
+            failures.append(1)
+            raise RuntimeError("connection lost")
+        return real_claim(*args)
+
+    monkeypatch.setattr(jobs, "claim_jobs", flaky_claim)
+    run_worker(FakeInference(), seconds=1.5, max_backoff=0.2)
+
+    session = SessionLocal()
+    assert len(failures) == 2
+    assert session.query(models.AnalysisJob).one().status == jobs.SUCCEEDED
+    session.close()
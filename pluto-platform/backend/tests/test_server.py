@@ -0,0 +1,25 @@
+import asyncio
+
+import httpx
+
+from src.app.server import create_server_app
+from src.inference_client import LocalInference, RemoteInference
+
+
+def test_remote_inference_streams_what_local_inference_does(make_model, image_path):
+    model = make_model()
+
+    async def collect(inference):
+        try:
+            return [event async for event in inference.astream(image_path)]
+        finally:
+            await inference.aclose()
+
+    remote = RemoteInference("http://inference")
+    remote._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_server_app(model)),
+                                       base_url="http://inference")
+    remote_events = asyncio.run(collect(remote))
+    local_events = asyncio.run(collect(LocalInference(model)))
+
+    assert [event["event"] for event in remote_events] == [event["event"] for event in local_events]
+    assert remote_events[-1]["result"]["final"] == local_events[-1]["result"]["final"]
@@ -0,0 +1,82 @@
+import pytest
+
+from src.fake_llm import DEFAULT_RESPONSES, SIGNAL_OUTPUT, FakeChatModel
+from src.governor import LLMGovernor
+from src.model_langchain import HTPModel, llm_classification, parse_classification
+from src.signal_classifier import SignalClassifier
+
+
+@pytest.fixture
+def classifier():
+    return SignalClassifier()
+
+
+@pytest.mark.parametrize("signal", [
+    "### Assessment Opinion:\nWarning\n\nSignificant emotional distress; professional evaluation is strongly recommended.",
+    "Overall level of mental health concern: **High**. Urgent clinical attention is advised.",
+    "Several drawings contain self-harm imagery and warning signs.",
+])
+def test_concerning_signals(classifier, signal):
+    assert classifier(signal) is True
+
+
+@pytest.mark.parametrize("signal", [
+    SIGNAL_OUTPUT,
+    "Risk level - **Low**. The child shows adequate emotional functioning within the normal range.",
+    "No significant concerns are evident; routine monitoring and age-appropriate support are enough.",
+])
+def test_normal_signals(classifier, signal):
+    assert classifier(signal) is False
+
+
+@pytest.mark.parametrize("signal", [
+    "",
+    None,
+    "The drawing uses a lot of blue.",
+    # conflicting evidence is left to the model
+    "Warning signs of anxiety are present, but the overall risk level: low.",
+])
+def test_ambiguous_signals_fall_through(classifier, signal):
+    assert classifier(signal) is None
+
+
+def test_negated_concerns_do_not_count(classifier):
+    decision = classifier.classify("There is no evidence of self-harm and no warning signs were found.")
+    assert decision.concern == 0
+
+
+def test_version_follows_the_thresholds():
+    assert SignalClassifier().version == SignalClassifier().version
+    assert SignalClassifier(threshold=4).version != SignalClassifier().version
+
+
+def test_workflow_reports_who_classified(make_model, fake_model, image_path):
+    local = make_model(local_classification=True).workflow(image_path)
+    calls = fake_model.calls
+    llm = make_model(local_classification=False).workflow(image_path)
+
+    assert (local["classification"], local["classification_source"]) == (False, "local")
+    assert (llm["classification"], llm["classification_source"]) == (False, "llm")
+    assert fake_model.calls - calls == calls + 1
+
+
+@pytest.mark.parametrize("parsed, expected", [
+    ({"result": True}, True),
+    ({"result": "false"}, False),
+    ("True", True),
+    ({"result": "maybe"}, None),
+    ({"verdict": True}, None),
+    ("I cannot decide.", None),
+])
+def test_llm_classification_is_not_guessed(parsed, expected):
+    assert parse_classification(parsed) is expected
+    assert llm_classification(parsed)["source"] == ("llm" if expected is not None else "llm_unparsed")
+
+
+def test_unparsed_classification_reaches_the_result(image_path):
+    responses = [(marker, '{"result": "unclear"}' if "classify" in marker else reply) for marker, reply in DEFAULT_RESPONSES]
+    model = FakeChatModel(responses=responses)
+    result = HTPModel(text_model=model, use_cache=False, governor=LLMGovernor(),
+                      local_classification=False).workflow(image_path)
+    assert (result["classification"], result["classification_source"]) == (None, "llm_unparsed")
+    assert result["fix_signal"] is None
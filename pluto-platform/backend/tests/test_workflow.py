@@ -0,0 +1,20 @@
+import asyncio
+
+
+def test_async_workflow_matches_sync_workflow(make_model, image_path):
+    model = make_model()
+    sync_result = model.workflow(image_path)
+    async_result = asyncio.run(model.aworkflow(image_path))
+    for field in ("final", "signal", "merge", "classification", "classification_source"):
+        assert async_result[field] == sync_result[field]
+
+
+def test_concurrent_async_runs_keep_their_own_usage(make_model, image_path):
+    model = make_model()
+
+    async def main():
+        return await asyncio.gather(*(model.aworkflow(image_path) for _ in range(3)))
+
+    results = asyncio.run(main())
+    assert len({result["run_id"] for result in results}) == 3
+    assert len({result["usage"]["total"] for result in results}) == 1
@@ -0,0 +1,43 @@
+# Analysis worker process: runs queued AI analyses outside the web process.
+#
+#     cd backend
+#     python worker.py
+#
+# Any number of workers can run against the same database; tune throughput with
+# ANALYSIS_WORKER_CONCURRENCY per process and the number of processes. On Postgres
+# the live stage/token events are NOTIFYed to the API processes for their SSE streams.
+import asyncio
+import signal
+import sys
+
+from dotenv import load_dotenv
+from loguru import logger
+
+load_dotenv()
+
+from app import models
+from app.database import engine
+from app.events import NotifyPublisher
+from app.inference import create_inference
+from app.worker import AnalysisWorker
+
+logger.remove()
+logger.add(sys.stderr, format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>")
+
+
+async def main():
+    models.Base.metadata.create_all(bind=engine)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    inference = create_inference()
+    events = NotifyPublisher(engine) if engine.dialect.name == "postgresql" else None
+    try:
+        await AnalysisWorker.from_env(inference, events=events).run(stop)
+    finally:
+        await inference.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,6 +3,8 @@ import axios from 'axios';
 import { useNavigate } from 'react-router-dom';
 
 const API_URL = 'http://localhost:8000';
+const PAGE_SIZE = 50;
+const EMPTY_FILTERS = { status: '', psychologist_id: '', submitted_from: '', submitted_to: '' };
 
 function FacilitatorDashboard() {
     const navigate = useNavigate();
@@ -15,17 +17,42 @@ function FacilitatorDashboard() {
     const [batchMode, setBatchMode] = useState(false);
     const [selectedDrawings, setSelectedDrawings] = useState([]);
     const [batchPsychologist, setBatchPsychologist] = useState('');
+    const [filters, setFilters] = useState(EMPTY_FILTERS);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const [stats, setStats] = useState({ total: 0, by_status: {} });
+
+    // query params of one page; the server filters and pages, so only PAGE_SIZE rows are sent at a time
+    const listParams = (cursor) => {
+        const params = { limit: PAGE_SIZE };
+        if (filters.status) params.status = filters.status;
+        if (filters.psychologist_id) params.psychologist_id = filters.psychologist_id;
+        if (filters.submitted_from) params.submitted_from = filters.submitted_from;
+        if (filters.submitted_to) {
+            // the "to" date is inclusive, the API bound is exclusive
+            const to = new Date(`${filters.submitted_to}T00:00:00Z`);
+            to.setUTCDate(to.getUTCDate() + 1);
+            params.submitted_to = to.toISOString();
+        }
+        if (cursor) params.cursor = cursor;
+        return params;
+    };
 
     const fetchData = async () => {
         setLoading(true);
         try {
             const token = localStorage.getItem('token');
-            const [subResponse, psychResponse] = await Promise.all([
-                axios.get(`${API_URL}/api/assessments/facilitator`, { headers: { Authorization: `Bearer ${token}` } }),
-                axios.get(`${API_URL}/api/psychologists`, { headers: { Authorization: `Bearer ${token}` } })
+            const headers = { Authorization: `Bearer ${token}` };
+            const [subResponse, psychResponse, statsResponse] = await Promise.all([
+                axios.get(`${API_URL}/api/assessments/facilitator`, { headers, params: listParams() }),
+                axios.get(`${API_URL}/api/psychologists`, { headers }),
+                axios.get(`${API_URL}/api/assessments/facilitator/stats`, { headers })
             ]);
-            setSubmissions(subResponse.data);
+            setSubmissions(subResponse.data.items);
+            setNextCursor(subResponse.data.next_cursor);
             setPsychologists(psychResponse.data);
+            setStats(statsResponse.data);
+            setSelectedDrawings([]);
         } catch (err) {
             setError('Failed to fetch data.');
         } finally {
@@ -33,13 +60,38 @@ function FacilitatorDashboard() {
         }
     };
 
+    const loadMore = async () => {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const token = localStorage.getItem('token');
+            const response = await axios.get(`${API_URL}/api/assessments/facilitator`, {
+                headers: { Authorization: `Bearer ${token}` },
+                params: listParams(nextCursor)
+            });
+            setSubmissions(prev => [...prev, ...response.data.items]);
+            setNextCursor(response.data.next_cursor);
+        } catch (err) {
+            alert('Failed to load more submissions.');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     useEffect(() => {
         const loggedInUser = localStorage.getItem('user');
         if (loggedInUser) {
             setUser(JSON.parse(loggedInUser));
         }
-        fetchData();
     }, []);
+
+    useEffect(() => {
+        fetchData();
+    }, [filters]);
+
+    const handleFilterChange = (name, value) => {
+        setFilters(prev => ({ ...prev, [name]: value }));
+    };
     
     const handleAssign = async (drawingId, psychologistId) => {
         if (!psychologistId) return;
@@ -62,14 +114,13 @@ function FacilitatorDashboard() {
         }
         try {
             const token = localStorage.getItem('token');
-            await Promise.all(
-                selectedDrawings.map(drawingId =>
-                    axios.put(`${API_URL}/api/drawings/${drawingId}/assign/${batchPsychologist}`, {}, {
-                        headers: { Authorization: `Bearer ${token}` }
-                    })
-                )
-            );
-            alert(`Successfully assigned ${selectedDrawings.length} drawing(s)`);
+            // one request for the whole batch; the server assigns all drawings or none
+            const response = await axios.post(`${API_URL}/api/drawings/assign`, {
+                assignments: selectedDrawings.map(drawingId => ({ drawing_id: drawingId, psychologist_id: batchPsychologist }))
+            }, {
+                headers: { Authorization: `Bearer ${token}` }
+            });
+            alert(`Successfully assigned ${response.data.length} drawing(s)`);
             setBatchMode(false);
             setSelectedDrawings([]);
             setBatchPsychologist('');
@@ -103,11 +154,11 @@ function FacilitatorDashboard() {
         navigate('/login');
     };
 
-    const stats = {
-        total: submissions.length,
-        pending: submissions.filter(s => s.status === 'submitted').length,
-        completed: submissions.filter(s => s.status === 'reviewed').length,
-        failed: submissions.filter(s => s.status === 'failed').length,
+    const counts = {
+        total: stats.total,
+        pending: stats.by_status.submitted || 0,
+        completed: stats.by_status.reviewed || 0,
+        failed: stats.by_status.failed || 0,
     };
 
     return (
@@ -125,10 +176,10 @@ function FacilitatorDashboard() {
                 <p className="page-subtitle">Monitor student progress and manage assessments.</p>
 
                 <div className="stats-grid">
-                    <div className="stat-card"><div className="stat-number">{stats.total}</div><div className="stat-label">Total Submissions</div></div>
-                    <div className="stat-card"><div className="stat-number">{stats.pending}</div><div className="stat-label">Pending Reviews</div></div>
-                    <div className="stat-card"><div className="stat-number">{stats.completed}</div><div className="stat-label">Completed Assessments</div></div>
-                    <div className="stat-card"><div className="stat-number">{stats.failed}</div><div className="stat-label">Failed Analyses</div></div>
+                    <div className="stat-card"><div className="stat-number">{counts.total}</div><div className="stat-label">Total Submissions</div></div>
+                    <div className="stat-card"><div className="stat-number">{counts.pending}</div><div className="stat-label">Pending Reviews</div></div>
+                    <div className="stat-card"><div className="stat-number">{counts.completed}</div><div className="stat-label">Completed Assessments</div></div>
+                    <div className="stat-card"><div className="stat-number">{counts.failed}</div><div className="stat-label">Failed Analyses</div></div>
                 </div>
 
                 <div className="content-section">
@@ -146,6 +197,20 @@ function FacilitatorDashboard() {
                         </button>
                     </div>
                     
+                    <div style={{display: 'flex', gap: '1rem', alignItems: 'center', flexWrap: 'wrap', marginBottom: '1rem'}}>
+                        <select value={filters.status} onChange={(e) => handleFilterChange('status', e.target.value)}>
+                            <option value="">All statuses</option>
+                            {['submitted', 'processing', 'in_review', 'reviewed', 'failed'].map(s => <option key={s} value={s}>{s}</option>)}
+                        </select>
+                        <select value={filters.psychologist_id} onChange={(e) => handleFilterChange('psychologist_id', e.target.value)}>
+                            <option value="">All psychologists</option>
+                            {psychologists.map(p => <option key={p.id} value={p.id}>{p.email}</option>)}
+                        </select>
+                        <label>From <input type="date" value={filters.submitted_from} onChange={(e) => handleFilterChange('submitted_from', e.target.value)} /></label>
+                        <label>To <input type="date" value={filters.submitted_to} onChange={(e) => handleFilterChange('submitted_to', e.target.value)} /></label>
+                        <button className="btn btn-secondary" onClick={() => setFilters(EMPTY_FILTERS)}>Clear Filters</button>
+                    </div>
+
                     {batchMode && (
                         <div style={{marginBottom: '1rem', padding: '1rem', background: '#f3f4f6', borderRadius: '8px'}}>
                             <div style={{display: 'flex', gap: '1rem', alignItems: 'center', flexWrap: 'wrap'}}>
@@ -218,6 +283,13 @@ function FacilitatorDashboard() {
                             ))}
                         </tbody>
                     </table>
+                    {nextCursor && (
+                        <div style={{textAlign: 'center', marginTop: '1rem'}}>
+                            <button className="btn btn-secondary" onClick={loadMore} disabled={loadingMore}>
+                                {loadingMore ? 'Loading...' : 'Load More'}
+                            </button>
+                        </div>
+                    )}
                 </div>
             </div>
         </div>
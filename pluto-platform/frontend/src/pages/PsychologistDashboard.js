@@ -4,6 +4,7 @@ import ReactMarkdown from 'react-markdown';
 import { useNavigate } from 'react-router-dom';
 
 const API_URL = 'http://localhost:8000';
+const PAGE_SIZE = 50;
 
 function PsychologistDashboard() {
     const navigate = useNavigate();
@@ -13,18 +14,32 @@ function PsychologistDashboard() {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
     const [user, setUser] = useState(null);
+    const [statusFilter, setStatusFilter] = useState('');
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+
+    const fetchPage = (cursor) => {
+        const token = localStorage.getItem('token');
+        const params = { limit: PAGE_SIZE };
+        if (statusFilter) params.status = statusFilter;
+        if (cursor) params.cursor = cursor;
+        return axios.get(`${API_URL}/api/assessments/psychologist`, { headers: { Authorization: `Bearer ${token}` }, params });
+    };
 
     const fetchSubmissions = async () => {
         setLoading(true);
         try {
-            const token = localStorage.getItem('token');
-            const response = await axios.get(`${API_URL}/api/assessments/psychologist`, { headers: { Authorization: `Bearer ${token}` } });
-            setSubmissions(response.data);
+            const response = await fetchPage();
+            const items = response.data.items;
+            setSubmissions(items);
+            setNextCursor(response.data.next_cursor);
 
-            if (response.data.length > 0) {
-                const firstSub = response.data.find(s => s.status === 'in_review') || response.data[0];
+            if (items.length > 0) {
+                const firstSub = items.find(s => s.status === 'in_review') || items[0];
                 setSelected(firstSub);
                 setNotes(firstSub.evaluation?.notes || '');
+            } else {
+                setSelected(null);
             }
         } catch (err) {
             setError('Failed to fetch data. Please log in again.');
@@ -34,14 +49,32 @@ function PsychologistDashboard() {
         }
     };
 
+    const loadMore = async () => {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const response = await fetchPage(nextCursor);
+            setSubmissions(prev => [...prev, ...response.data.items]);
+            setNextCursor(response.data.next_cursor);
+        } catch (err) {
+            alert('Failed to load more submissions.');
+            console.error(err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     useEffect(() => {
         const loggedInUser = localStorage.getItem('user');
         if (loggedInUser) {
             setUser(JSON.parse(loggedInUser));
         }
-        fetchSubmissions();
     }, []);
 
+    useEffect(() => {
+        fetchSubmissions();
+    }, [statusFilter]);
+
     const handleSelectSubmission = (sub) => {
         setSelected(sub);
         setNotes(sub.evaluation?.notes || '');
@@ -83,7 +116,13 @@ function PsychologistDashboard() {
             </nav>
             <div className="psychologist-dashboard-container">
                 <div className="panel submissions-panel">
-                    <div className="panel-header"><h2>Submissions for Review</h2></div>
+                    <div className="panel-header">
+                        <h2>Submissions for Review</h2>
+                        <select value={statusFilter} onChange={(e) => setStatusFilter(e.target.value)}>
+                            <option value="">All</option>
+                            {['processing', 'in_review', 'reviewed', 'failed'].map(s => <option key={s} value={s}>{s}</option>)}
+                        </select>
+                    </div>
                     <div className="panel-content">
                         {submissions.length > 0 ? submissions.map((sub) => (
                             <div key={sub.id} className={`submission-item ${selected?.id === sub.id ? 'selected' : ''}`} onClick={() => handleSelectSubmission(sub)}>
@@ -91,6 +130,11 @@ function PsychologistDashboard() {
                                 <span className={`status-badge status-${sub.status.replace('_', '-')}`}>{sub.status}</span>
                             </div>
                         )) : <p>No submissions assigned to you.</p>}
+                        {nextCursor && (
+                            <button className="btn btn-secondary" style={{width: '100%', marginTop: '0.5rem'}} onClick={loadMore} disabled={loadingMore}>
+                                {loadingMore ? 'Loading...' : 'Load More'}
+                            </button>
+                        )}
                     </div>
                 </div>
 
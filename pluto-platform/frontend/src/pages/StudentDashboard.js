@@ -4,6 +4,7 @@ import { ReactSketchCanvas } from 'react-sketch-canvas';
 import { useNavigate } from 'react-router-dom';
 
 const API_URL = 'http://localhost:8000';
+const PAGE_SIZE = 20;
 
 // Helper to convert the canvas's Data URL output to a Blob for file upload
 function dataURLtoBlob(dataurl) {
@@ -34,15 +35,21 @@ function StudentDashboard() {
     const [message, setMessage] = useState('');
     const [user, setUser] = useState(null);
     const [selectedNotes, setSelectedNotes] = useState(null);
+    const [nextCursor, setNextCursor] = useState(null);
     const canvasRef = useRef(null);
 
-    const fetchSubmissions = async () => {
+    // first page by default; with a cursor the next page is appended
+    const fetchSubmissions = async (cursor) => {
         try {
             const token = localStorage.getItem('token');
+            const params = { limit: PAGE_SIZE };
+            if (cursor) params.cursor = cursor;
             const response = await axios.get(`${API_URL}/api/my-submissions`, {
-                headers: { Authorization: `Bearer ${token}` }
+                headers: { Authorization: `Bearer ${token}` },
+                params
             });
-            setSubmissions(response.data);
+            setSubmissions(prev => cursor ? [...prev, ...response.data.items] : response.data.items);
+            setNextCursor(response.data.next_cursor);
         } catch (err) {
             console.error("Could not fetch submissions", err);
         }
@@ -148,6 +155,11 @@ function StudentDashboard() {
                     )) : <tr><td colSpan="4" style={{textAlign: 'center'}}>No submissions yet.</td></tr>}
                 </tbody>
             </table>
+            {nextCursor && (
+                <div style={{textAlign: 'center', marginTop: '10px'}}>
+                    <button className="btn btn-secondary" onClick={() => fetchSubmissions(nextCursor)}>Load More</button>
+                </div>
+            )}
         </div>
     );
     